@@ -1,7 +1,10 @@
+import os
 import sys
 import argparse
+import logging
 
 from ontoutils.RobotTemplateWrapper import RobotTemplateWrapper
+from ontoutils.watch import TemplateWatcher, WatchTarget
 
 ## PROGRAM EXECUTION --- required arguments: input and output file names, and optional dependencies
 if __name__ == '__main__':
@@ -10,6 +13,8 @@ if __name__ == '__main__':
     parser.add_argument('--inputExcel', '-i',help='Name of the input Excel spreadsheet file')
     parser.add_argument('--outputOWL', '-o', help='Name of the output OWL file')
     parser.add_argument('--dependency', '-d', help='Name(s) of OWL files that this one is dependent on')
+    parser.add_argument('--watch', '-w', action='store_true', help='Keep running and rebuild whenever the spreadsheet is saved')
+    parser.add_argument('--shards', '-s', type=int, default=1, help='Build the ontology in this many parallel ROBOT runs')
 
     args=parser.parse_args()
 
@@ -22,17 +27,22 @@ if __name__ == '__main__':
         sys.exit('Not enough arguments. Expected at least -i "Excel file name" and -o "output OWL file name"')
 
 
-    robotWrapper = RobotTemplateWrapper(robotcmd='robot')
-
-    csvFileName = robotWrapper.add_classes_from_excel(inputFileName)
-
-
 ## EXECUTE THE ROBOT COMMAND AS A SUB-PROCESS
 
     BCIO_IRI_PREFIX = 'http://humanbehaviourchange.org/ontology/'
     BCIO_ID_PREFIX = '\"BCIO: '+BCIO_IRI_PREFIX+'BCIO_\"'
     ONTOLOGY_IRI = BCIO_IRI_PREFIX+owlFileName
 
+    csvFileName = os.path.splitext(inputFileName)[0] + '.csv'
+
+    if args.watch:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+        target = WatchTarget(inputFileName, owlFileName, ONTOLOGY_IRI, dependency, csvFileName)
+        TemplateWatcher('robot', [target], BCIO_IRI_PREFIX, [BCIO_ID_PREFIX]).run()
+        sys.exit(0)
+
+    robotWrapper = RobotTemplateWrapper(robotcmd='robot')
 
-    robotWrapper.createOntologyFromTemplateFile(csvFileName, dependency, BCIO_IRI_PREFIX, BCIO_ID_PREFIX, ONTOLOGY_IRI,owlFileName)
+    robotWrapper.add_classes_from_excel(inputFileName, csvFileName)
 
+    robotWrapper.createOntologyFromTemplateFile(csvFileName, dependency, BCIO_IRI_PREFIX, [BCIO_ID_PREFIX], ONTOLOGY_IRI,owlFileName, shards=args.shards)
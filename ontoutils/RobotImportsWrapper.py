@@ -1,11 +1,23 @@
+import functools
 import logging
 import os
 import shutil
+import tempfile
+import urllib.request
+import xml.sax
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
 from multiprocessing import Pool
+from typing import ContextManager, Optional
 
 import openpyxl
 
 from ontoutils.RobotWrapper import RobotWrapper
+from ontoutils.workspace import DEFAULT_CACHE_DIR, BuildWorkspace
+from ontoutils.owl_to_obo import UnsupportedConstruct, convert_to_obo
+from ontoutils.owl_filter import NotRdfXml, read_term_file, remove_annotation_properties
+from ontoutils.compression import GZIP, ZSTD, compression_of, copy_compressed, piped_path, \
+    strip_compression_suffix
 
 
 class OntologyImport:
@@ -44,9 +56,27 @@ class RobotImportsWrapper(RobotWrapper):
 
     imports: list[OntologyImport]
 
-    def __init__(self, robotcmd, cleanup=False):
-        super().__init__(robotcmd, cleanup)
+    cache_compression: Optional[str]
+    '''
+    compression of downloaded ontologies in the cache, GZIP, ZSTD or None
+    '''
+
+    def __init__(self, robotcmd, cleanup=False, cache_compression: Optional[str] = GZIP,
+                 workspace: Optional[BuildWorkspace] = None):
+        super().__init__(robotcmd, cleanup, workspace)
         self.imports = []
+        self.cache_compression = cache_compression
+
+    def _download_path(self, download_path: Optional[str]) -> str:
+        if download_path is not None:
+            return download_path
+        return self.workspace.cache_dir if self.workspace is not None else DEFAULT_CACHE_DIR
+
+    def _slim_file_name(self, imp: OntologyImport, download_path: Optional[str]) -> str:
+        # Slims are specific to a build, with a workspace they are kept out of the shared download cache
+        if self.workspace is not None:
+            return self.workspace.path(imp.slim_file)
+        return os.path.join(self._download_path(download_path), imp.slim_file)
 
     def add_imports_from_excel(self, path):
         """
@@ -96,40 +126,119 @@ class RobotImportsWrapper(RobotWrapper):
 
             self.imports.append(ontology_import)
 
-    def download_imported_ontologies(self, download_path="temp") -> None:
+    async def add_imports_from_excel_async(self, path):
+        """
+        Async counterpart of add_imports_from_excel, parsing the workbook on the blocking executor
+        """
+        await self._run_blocking(self.add_imports_from_excel, path)
+
+    def download_imported_ontologies(self, download_path: Optional[str] = None) -> None:
         """
         Downloads previously added ontologies
 
-        :param download_path: Path to download the ontologies to
+        :param download_path: Path to download the ontologies to, the cache of the workspace, or 'temp' without one,
+            if None
         :return:
         """
+        download_path = self._download_path(download_path)
 
-        if not os.path.exists(download_path):
-            os.mkdir(download_path)
+        os.makedirs(download_path, exist_ok=True)
 
         with Pool(4) as p:
             p.starmap(self._download_ontology, [(x, download_path) for x in self.imports])
 
 
+    async def download_imported_ontologies_async(self, download_path: Optional[str] = None) -> None:
+        """
+        Async counterpart of download_imported_ontologies, downloading up to four ontologies at a time on the blocking
+        executor. A cancelled download still completes in the background, the cache is never left half written.
+        """
+        download_path = self._download_path(download_path)
+        await self._run_blocking(os.makedirs, download_path, exist_ok=True)
+        await self._gather_bounded([functools.partial(self._run_blocking, self._download_ontology, x, download_path)
+                                    for x in self.imports], 4)
+
     def _download_ontology(self, imp: OntologyImport, download_path: str) -> None:
         # Only download if we don't already have it.
         # Use cleanup=TRUE to clean up afterwards for fresh download next time.
-        out = os.path.join(download_path, imp.short_name)
-        if not os.path.exists(out):
-            get_ontology_cmd = f'curl -L "{imp.purl}" > {out}'
-            self._execute_command(get_ontology_cmd, shell_flag=True)
-
-    def extract_slim_ontologies(self, download_path='temp') -> None:
+        if self._cached_ontology(imp, download_path) is not None:
+            return
+
+        # Compressed responses (e.g. .owl.gz PURLs) are stored as they are or recompressed while streaming
+        # The cache may be shared by concurrent builds, the partial download gets a unique name
+        out = self._cache_file_name(imp, download_path)
+        fd, partial = tempfile.mkstemp(prefix=os.path.basename(out) + ".", suffix=".part", dir=download_path)
+        os.close(fd)
+        self._logger.debug(f"Downloading '{imp.purl}' to '{out}'")
+        try:
+            with urllib.request.urlopen(imp.purl) as response, open(partial, 'wb') as f:
+                copy_compressed(response, f, self.cache_compression)
+            os.replace(partial, out)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _cache_file_name(self, imp: OntologyImport, download_path: str) -> str:
+        name = strip_compression_suffix(imp.short_name)
+        if self.cache_compression is not None:
+            name = f"{name}.{self.cache_compression}"
+        return os.path.join(download_path, name)
+
+    def _cached_ontology(self, imp: OntologyImport, download_path: str) -> Optional[str]:
+        name = strip_compression_suffix(imp.short_name)
+        candidates = [self._cache_file_name(imp, download_path), os.path.join(download_path, imp.short_name),
+                      os.path.join(download_path, name), os.path.join(download_path, f"{name}.{GZIP}"),
+                      os.path.join(download_path, f"{name}.{ZSTD}")]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def extract_slim_ontologies(self, download_path: Optional[str] = None) -> None:
         """
         Extracts the imported terms from the registered imported ontologies. Requires the ontologies to be present in `download_path`
         """
+        download_path = self._download_path(download_path)
         with Pool(4) as p:
             p.starmap(self._extract_slim_ontology, [(x, download_path) for x in self.imports])
 
+    async def extract_slim_ontologies_async(self, download_path: Optional[str] = None) -> None:
+        """
+        Async counterpart of extract_slim_ontologies, running up to four ROBOT extractions at a time
+        """
+        download_path = self._download_path(download_path)
+        await self._gather_bounded([functools.partial(self._extract_slim_ontology_async, x, download_path)
+                                    for x in self.imports], 4)
+
+    async def _extract_slim_ontology_async(self, imp: OntologyImport, download_path: str) -> None:
+        source_context = self._slim_source(imp, download_path)
+        source = await self._run_blocking(source_context.__enter__)
+        try:
+            await self._execute_command_async(self._slim_command(imp, download_path, source), shell_flag=True)
+        finally:
+            await self._run_blocking(source_context.__exit__, None, None, None)
+
     def _extract_slim_ontology(self, imp: OntologyImport, download_path: str) -> None:
-        filename = os.path.join(download_path, imp.slim_file)
+        with self._slim_source(imp, download_path) as source:
+            self._execute_command(self._slim_command(imp, download_path, source), shell_flag=True)
+
+    def _slim_source(self, imp: OntologyImport, download_path: str) -> ContextManager[str]:
+        """
+        :return: A context giving the path ROBOT reads the cached ontology of an import from
+        """
+        source = self._cached_ontology(imp, download_path) or os.path.join(download_path, imp.short_name)
+        # ROBOT reads gzipped ontologies itself, in one pass, zstd is recompressed to gzip while ROBOT reads it
+        if compression_of(source) == ZSTD:
+            return piped_path(source, self.workspace.root if self.workspace is not None else download_path, GZIP)
+        return nullcontext(source)
+
+    def _slim_command(self, imp: OntologyImport, download_path: str, source: str) -> str:
+        """
+        :return: The ROBOT command extracting the slim of an import from `source`
+        """
+        filename = self._slim_file_name(imp, download_path)
         slim_cmd = [self.robotcmd, 'merge',
-                    '--input', f'"{os.path.join(download_path, imp.short_name)}"',
+                    '--input', f'"{source}"',
                     'extract', '--method', 'MIREOT',
                     '--annotate-with-source', 'true',
                     '--upper-term', imp.root_id,
@@ -143,89 +252,179 @@ class RobotImportsWrapper(RobotWrapper):
             slim_cmd.append('--lower-term')
             slim_cmd.append(term_id)
 
-        slim_cmd = " ".join(slim_cmd)
-        self._execute_command(slim_cmd, shell_flag=True)
+        return " ".join(slim_cmd)
 
-    def merge_ontologies(self, merged_iri: str, merged_file: str, merged_ontology_name: str):
+    def merge_ontologies(self, merged_iri: str, merged_file: str, merged_ontology_name: str,
+                         download_path: Optional[str] = None):
         """
         Merges previously added, downloaded, and extracted ontology terms into one merged ontology
 
         :param merged_iri: IRI of the new, merged ontology
         :param merged_file: Output filename
         :param merged_ontology_name: Name of the merged ontology
-        :return:
+        :param download_path: Path the ontologies were downloaded to, as for extract_slim_ontologies
+        :return: The return code of ROBOT merging the ontologies
+        """
+        merge_cmd = self._merge_command(merged_iri, merged_file, merged_ontology_name, download_path)
+        returncode = self._publish(merged_file, self._execute_command(merge_cmd, shell_flag=True))
+        self._cleanup_downloads(download_path)
+        return returncode
+
+    async def merge_ontologies_async(self, merged_iri: str, merged_file: str, merged_ontology_name: str,
+                                     download_path: Optional[str] = None):
         """
+        Async counterpart of merge_ontologies
+        """
+        merge_cmd = self._merge_command(merged_iri, merged_file, merged_ontology_name, download_path)
+        returncode = await self._execute_command_async(merge_cmd)
+        await self._run_blocking(self._publish, merged_file, returncode)
+        await self._run_blocking(self._cleanup_downloads, download_path)
+        return returncode
+
+    def _cleanup_downloads(self, download_path: Optional[str]) -> None:
+        # Now delete the temp directory. The cache of a workspace is shared with other builds and is kept, the slims
+        # are removed with the workspace.
+        if self.cleanup and self.workspace is None:
+            shutil.rmtree(self._download_path(download_path), ignore_errors=True)
+
+    def _merge_command(self, merged_iri: str, merged_file: str, merged_ontology_name: str,
+                       download_path: Optional[str] = None) -> str:
         # Now merge all the imports into a single file
         merge_cmd = [self.robotcmd, 'merge']
 
         for imp in self.imports:
             merge_cmd.append('--input')
-            merge_cmd.append(imp.slim_file)
+            merge_cmd.append(self._slim_file_name(imp, download_path))
 
         merge_cmd.extend(
             ['annotate', '--ontology-iri', merged_iri, '--version-iri', merged_iri, '--annotation rdfs:comment ',
              '"This file contains externally imported content for the ' + merged_ontology_name + '. It was prepared using ROBOT and a custom script from a spreadsheet of imported terms."',
-             '--output', merged_file])
-
-        merge_cmd = " ".join(merge_cmd)
-
-        self._execute_command(merge_cmd, shell_flag=True)
+             '--output', self._output_path(merged_file)])
 
-        # Now delete the temp directory
-        if self.cleanup:
-            shutil.rmtree('temp')
+        return " ".join(merge_cmd)
 
     # Handle externally imported content
     def process_imports_from_excel(self, excel_file, merged_iri: str, merged_file: str, merged_ontology_name: str):
-
+        """
+        :return: The return code of ROBOT merging the imports into `merged_file`
+        """
         self.add_imports_from_excel(excel_file)
         self.download_imported_ontologies()
         self.extract_slim_ontologies()
-        self.merge_ontologies(merged_iri, merged_file, merged_ontology_name)
+        return self.merge_ontologies(merged_iri, merged_file, merged_ontology_name)
+
+    async def process_imports_from_excel_async(self, excel_file, merged_iri: str, merged_file: str,
+                                               merged_ontology_name: str):
+        """
+        Async counterpart of process_imports_from_excel. Cancelling it kills the running ROBOT processes.
+        """
+        await self.add_imports_from_excel_async(excel_file)
+        await self.download_imported_ontologies_async()
+        await self.extract_slim_ontologies_async()
+        return await self.merge_ontologies_async(merged_iri, merged_file, merged_ontology_name)
 
     def addAdditionalContent(self, extraContentTemplate: str, importsOWLURI: str):
-        owlFileName = importsOWLURI[(importsOWLURI.rindex('/') + 1):]
-        owlTempFileName = owlFileName.replace(".owl", "-temp.owl")
+        returncode = 0
+        for robot_cmd in self._additional_content_commands(extraContentTemplate, importsOWLURI):
+            returncode = self._execute_command(command_str=robot_cmd)
+        self._publish(self._imports_file_name(importsOWLURI), returncode)
 
-        robot_cmd = [self.robotcmd, 'template', '--template', extraContentTemplate,
-                     '--ontology-iri', importsOWLURI,
-                     '--output', owlTempFileName
-                     ]
+    async def addAdditionalContent_async(self, extraContentTemplate: str, importsOWLURI: str):
+        returncode = 0
+        for robot_cmd in self._additional_content_commands(extraContentTemplate, importsOWLURI):
+            returncode = await self._execute_command_async(robot_cmd)
+        await self._run_blocking(self._publish, self._imports_file_name(importsOWLURI), returncode)
 
-        robot_cmd = " ".join(robot_cmd)
+    @staticmethod
+    def _imports_file_name(importsOWLURI: str) -> str:
+        return importsOWLURI[(importsOWLURI.rindex('/') + 1):]
 
-        self._execute_command(command_str=robot_cmd)
+    def _additional_content_commands(self, extraContentTemplate: str, importsOWLURI: str) -> list[str]:
+        owlFileName = self._imports_file_name(importsOWLURI)
+        owlTempFileName = self._intermediate_path(os.path.basename(owlFileName.replace(".owl", "-temp.owl")))
 
-        robot_cmd = [self.robotcmd, 'merge', '--input', owlFileName, '--input', owlTempFileName, '--output',
-                     owlFileName]
+        template_cmd = [self.robotcmd, 'template', '--template', extraContentTemplate,
+                        '--ontology-iri', importsOWLURI,
+                        '--output', owlTempFileName
+                        ]
 
-        robot_cmd = " ".join(robot_cmd)
+        merge_cmd = [self.robotcmd, 'merge', '--input', owlFileName, '--input', owlTempFileName, '--output',
+                     self._output_path(owlFileName)]
 
-        self._execute_command(command_str=robot_cmd)
+        return [" ".join(template_cmd), " ".join(merge_cmd)]
 
     # Remove metadata that causes a problem in Pronto
-    # Overwrites original file so be careful
+    # Overwrites original file, atomically
     def removeProblemMetadata(self, importsOWLURI, importsOWLFileName, metadataURIFile):
+        if not self._remove_metadata_in_process(importsOWLFileName, metadataURIFile):
+            robot_cmd = self._remove_metadata_command(importsOWLFileName, metadataURIFile)
+            self._publish(importsOWLFileName, self._execute_command(command_str=robot_cmd))
+
+    async def removeProblemMetadata_async(self, importsOWLURI, importsOWLFileName, metadataURIFile):
+        if not await self._run_blocking(self._remove_metadata_in_process, importsOWLFileName, metadataURIFile):
+            robot_cmd = self._remove_metadata_command(importsOWLFileName, metadataURIFile)
+            returncode = await self._execute_command_async(robot_cmd)
+            await self._run_blocking(self._publish, importsOWLFileName, returncode)
 
+    def _remove_metadata_in_process(self, importsOWLFileName, metadataURIFile) -> bool:
+        try:
+            remove_annotation_properties(importsOWLFileName, read_term_file(metadataURIFile))
+            return True
+        except (xml.sax.SAXParseException, NotRdfXml) as e:
+            self._logger.info(f"'{importsOWLFileName}' is not RDF/XML ({e}), removing metadata with ROBOT")
+            return False
+
+    def _remove_metadata_command(self, importsOWLFileName, metadataURIFile) -> str:
         robot_cmd = [self.robotcmd, 'remove', '--input', importsOWLFileName,
                      '--term-file', metadataURIFile,
                      '--axioms', 'annotation',
-                     '--output', importsOWLFileName
+                     '--output', self._output_path(importsOWLFileName)
                      ]
 
-        robot_cmd = " ".join(robot_cmd)
+        return " ".join(robot_cmd)
+
+    # Also save an OBO (For Pronto), and optionally OBO Graphs JSON
+    # Converted in-process when the content is simple enough, with ROBOT otherwise
+    def createOBOFile(self, importsOWLURI, importsOWLFileName, createJSON=False):
+        robot_cmd = self._convert_to_obo_in_process(importsOWLURI, createJSON)
+        if robot_cmd is not None:
+            self._publish_obo_files(importsOWLURI, createJSON, self._execute_command(command_str=robot_cmd))
 
-        self._execute_command(command_str=robot_cmd)
+    async def createOBOFile_async(self, importsOWLURI, importsOWLFileName, createJSON=False):
+        robot_cmd = await self._run_blocking(self._convert_to_obo_in_process, importsOWLURI, createJSON)
+        if robot_cmd is not None:
+            returncode = await self._execute_command_async(robot_cmd)
+            await self._run_blocking(self._publish_obo_files, importsOWLURI, createJSON, returncode)
 
-    # Also save an OBO (For Pronto)
-    def createOBOFile(self, importsOWLURI, importsOWLFileName):
-        owlFileName = importsOWLURI[(importsOWLURI.rindex('/') + 1):]
+    def _obo_file_names(self, importsOWLURI, createJSON: bool) -> tuple[str, str, Optional[str]]:
+        owlFileName = self._imports_file_name(importsOWLURI)
 
         oboFileName = owlFileName.replace(".owl", ".obo")
+        jsonFileName = owlFileName.replace(".owl", ".json") if createJSON else None
+        return owlFileName, oboFileName, jsonFileName
 
-        robot_cmd = [self.robotcmd, 'merge', '--input', owlFileName, 'convert', '--output', oboFileName, '--check',
-                     'false']
+    def _publish_obo_files(self, importsOWLURI, createJSON: bool, returncode: int) -> None:
+        _, oboFileName, jsonFileName = self._obo_file_names(importsOWLURI, createJSON)
+        self._publish(oboFileName, returncode)
+        if jsonFileName is not None:
+            self._publish(jsonFileName, returncode)
+
+    def _convert_to_obo_in_process(self, importsOWLURI, createJSON: bool) -> Optional[str]:
+        """
+        :return: None if the ontology was converted, the ROBOT command converting it otherwise
+        """
+        owlFileName, oboFileName, jsonFileName = self._obo_file_names(importsOWLURI, createJSON)
+
+        # Written atomically already, no need to stage
+        try:
+            convert_to_obo(owlFileName, oboFileName, jsonFileName)
+            return None
+        except (UnsupportedConstruct, ET.ParseError) as e:
+            self._logger.info(f"Unable to convert '{owlFileName}' in-process ({e}), converting with ROBOT")
 
-        robot_cmd = " ".join(robot_cmd)
+        robot_cmd = [self.robotcmd, 'merge', '--input', owlFileName, 'convert', '--output',
+                     self._output_path(oboFileName), '--check', 'false']
+        if jsonFileName is not None:
+            robot_cmd.extend(['convert', '--output', self._output_path(jsonFileName)])
 
-        self._execute_command(command_str=robot_cmd)
+        return " ".join(robot_cmd)
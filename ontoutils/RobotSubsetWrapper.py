@@ -1,17 +1,62 @@
+import functools
 import logging
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
 from ontoutils.RobotWrapper import RobotWrapper
+from ontoutils.workspace import BuildWorkspace
+from ontoutils.core import OntologyEntity, RobotType
+from ontoutils.owl_reader import OwlDocument, PrefixMap, read_ontology, OWL_NS
+from ontoutils.subset_export import EXPORT_SPLIT, ENTITY_ANNOTATION_FIELDS, ENTITY_ANNOTATION_LABELS, split_headers, \
+    write_export, is_table_export
+from ontoutils.label_resolver import normalise_label
+from ontoutils.utils import quoteIfNeeded
+
+
+class SubsetSpec:
+    root_id: str
+    output_file_name: str
+    export_csv_headers: Optional[str]
+    export_sort: Optional[str]
+
+    def __init__(self, root_id: str, output_file_name: str, export_csv_headers: Optional[str] = None,
+                 export_sort: Optional[str] = None):
+        self.root_id = root_id
+        self.output_file_name = output_file_name
+        self.export_csv_headers = export_csv_headers
+        self.export_sort = export_sort
 
 
 class RobotSubsetWrapper(RobotWrapper):
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, robotcmd):
-        super().__init__(robotcmd)
+    def __init__(self, robotcmd, workspace: Optional[BuildWorkspace] = None):
+        super().__init__(robotcmd, workspace=workspace)
 
     def create_subset_from(self, input_ontology_file_name: str, output_file_name: str, root_id: str, id_prefix: str, export_csv_headers: str=None,
                            export_sort: Optional[str]=None):
+        robot_cmd = self._subset_command(input_ontology_file_name, output_file_name, root_id, id_prefix,
+                                         export_csv_headers, export_sort)
+
+        self._logger.debug(f"Executing Robot command: {robot_cmd}")
+
+        return self._publish(output_file_name, self._execute_command(command_str=robot_cmd))
+
+    async def create_subset_from_async(self, input_ontology_file_name: str, output_file_name: str, root_id: str,
+                                       id_prefix: str, export_csv_headers: str = None,
+                                       export_sort: Optional[str] = None) -> int:
+        """
+        Async counterpart of create_subset_from, ROBOT is killed if the awaiting task is cancelled
+
+        :return: The exit code of ROBOT
+        """
+        robot_cmd = self._subset_command(input_ontology_file_name, output_file_name, root_id, id_prefix,
+                                         export_csv_headers, export_sort)
+        returncode = await self._execute_command_async(robot_cmd)
+        return await self._run_blocking(self._publish, output_file_name, returncode)
+
+    def _subset_command(self, input_ontology_file_name: str, output_file_name: str, root_id: str, id_prefix: str,
+                        export_csv_headers: Optional[str] = None, export_sort: Optional[str] = None) -> str:
         robot_cmd = [self.robotcmd, 'merge',
                      '--input', input_ontology_file_name,
                      'extract',
@@ -25,14 +70,239 @@ class RobotSubsetWrapper(RobotWrapper):
             robot_cmd.extend(['export', '--header', '"' + export_csv_headers + '"',
                               '--prefix', id_prefix,
                               '--split', '"; "',
-                              '--export', output_file_name])
+                              '--export', self._output_path(output_file_name)])
             if export_sort:
                 robot_cmd.extend(['--sort', '"' + export_sort + '"'])
         else:
-            robot_cmd.extend(['--output', output_file_name])
+            robot_cmd.extend(['--output', self._output_path(output_file_name)])
 
-        robot_cmd = " ".join(robot_cmd)
+        return " ".join(robot_cmd)
 
-        self._logger.debug(f"Executing Robot command: {robot_cmd}")
+    def create_subsets_from(self, input_ontology_file_name: str, specs: list[SubsetSpec], id_prefix: str,
+                            max_workers: Optional[int] = None) -> None:
+        """
+        Creates many branch subsets of the same ontology, loading the input only once.
+
+        The input is read in-process and the CSV/TSV exports are rendered from it and written concurrently. Subsets
+        that need ROBOT, i.e. OWL outputs, other export formats or headers not understood in-process, are extracted by
+        ROBOT as in create_subset_from, also concurrently. If the input cannot be read in-process (it is not RDF/XML or
+        it has imports) all subsets are extracted by ROBOT.
+
+        :param input_ontology_file_name: Path to the ontology to extract the subsets from
+        :param specs: The subsets to create
+        :param id_prefix: Prefix declaration for IDs as for create_subset_from, e.g. '"BCIO: http://.../BCIO_"'
+        :param max_workers: Maximum number of subsets written at the same time
+        """
+        document = self._read_for_subsets(input_ontology_file_name)
+        prefixes = PrefixMap([id_prefix])
+
+        tasks: list[Callable[[], None]] = []
+        for spec in specs:
+            task = self._native_subset_task(document, prefixes, spec) if document is not None else None
+            if task is None:
+                self._logger.info(f"Extracting subset '{spec.output_file_name}' with ROBOT")
+                task = self._robot_subset_task(input_ontology_file_name, id_prefix, spec)
+            tasks.append(task)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(t) for t in tasks]:
+                future.result()
+
+    async def create_subsets_from_async(self, input_ontology_file_name: str, specs: list[SubsetSpec], id_prefix: str,
+                                        max_workers: Optional[int] = None) -> None:
+        """
+        Async counterpart of create_subsets_from. The input is read and the in-process exports are rendered on the
+        blocking executor, ROBOT extractions run as asyncio subprocesses.
+        """
+        document = await self._run_blocking(self._read_for_subsets, input_ontology_file_name)
+        prefixes = PrefixMap([id_prefix])
+
+        factories = []
+        for spec in specs:
+            task = self._native_subset_task(document, prefixes, spec) if document is not None else None
+            if task is None:
+                self._logger.info(f"Extracting subset '{spec.output_file_name}' with ROBOT")
+                factories.append(functools.partial(self.create_subset_from_async, input_ontology_file_name,
+                                                   spec.output_file_name, spec.root_id, id_prefix,
+                                                   spec.export_csv_headers, spec.export_sort))
+            else:
+                factories.append(functools.partial(self._run_blocking, task))
+
+        await self._gather_bounded(factories, max_workers)
+
+    def _read_for_subsets(self, input_ontology_file_name: str) -> Optional[OwlDocument]:
+        try:
+            document = read_ontology(input_ontology_file_name)
+        except Exception as e:
+            self._logger.info(f"Unable to read '{input_ontology_file_name}' in-process, falling back to ROBOT: {e}")
+            return None
+        if len(document.imports) > 0:
+            self._logger.info(f"'{input_ontology_file_name}' has imports, falling back to ROBOT")
+            return None
+        return document
+
+    def _robot_subset_task(self, input_ontology_file_name: str, id_prefix: str, spec: SubsetSpec) -> Callable[[], None]:
+        return lambda: self.create_subset_from(input_ontology_file_name, spec.output_file_name, spec.root_id,
+                                               id_prefix, spec.export_csv_headers, spec.export_sort)
+
+    def _native_subset_task(self, document: OwlDocument, prefixes: PrefixMap,
+                            spec: SubsetSpec) -> Optional[Callable[[], None]]:
+        if not spec.export_csv_headers or not is_table_export(spec.output_file_name):
+            return None
+
+        root_iri = prefixes.expand(spec.root_id)
+        if root_iri not in document.resources:
+            self._logger.warning(f"Root '{spec.root_id}' of subset '{spec.output_file_name}' not found in-process")
+            return None
+
+        headers = split_headers(spec.export_csv_headers)
+        columns = [self._owl_export_column(document, prefixes, h) for h in headers]
+        if any(c is None for c in columns):
+            return None
+
+        def task():
+            branch = document.descendants(root_iri)
+            in_branch = set(branch)
+            rows = [[column(iri, in_branch) for column in columns] for iri in branch]
+            write_export(self._output_path(spec.output_file_name), headers, rows, spec.export_sort)
+            self._publish(spec.output_file_name)
+
+        return task
+
+    @staticmethod
+    def _owl_export_column(document: OwlDocument, prefixes: PrefixMap,
+                           header: str) -> Optional[Callable[[str, set[str]], str]]:
+        if header == "ID":
+            return lambda iri, branch: prefixes.shorten(iri)
+        if header == "IRI":
+            return lambda iri, branch: iri
+        if header == "LABEL":
+            return lambda iri, branch: document.label_of(iri) or ""
+        if header == "SubClass Of":
+            # Parents outside the branch are left out, as ROBOT's MIREOT extract of the branch does not copy them
+            return lambda iri, branch: EXPORT_SPLIT.join(
+                document.label_of(p) or prefixes.shorten(p) for p in document.resources[iri].parents if p in branch)
+
+        # Any other header names an annotation property, by label or by CURIE
+        property_iri = None
+        for resource in document.resources.values():
+            if resource.is_a(f"{OWL_NS}AnnotationProperty") and resource.label == header:
+                property_iri = resource.iri
+                break
+        if property_iri is None and ":" in header:
+            property_iri = prefixes.expand(header)
+        if property_iri is None:
+            return None
+        return lambda iri, branch: EXPORT_SPLIT.join(document.resources[iri].annotations.get(property_iri, []))
+
+    def create_subset_from_entities(self, template_wrapper, output_file_name: str, root: str, export_csv_headers: str,
+                                    export_sort: Optional[str] = None, intermediates: str = 'all',
+                                    id_prefix: Optional[str] = None) -> None:
+        """
+        Exports a branch of the classes loaded in a RobotTemplateWrapper, without building OWL or running ROBOT.
+
+        The export has the same columns, '; ' split and sort order as create_subset_from. Columns can be ID, IRI,
+        LABEL, 'SubClass Of', an annotation property (by CURIE, label or spreadsheet column name) or a relation name.
+        As with create_subset_from, 'SubClass Of' is empty for the root, whose parent is outside the branch.
+
+        :param template_wrapper: RobotTemplateWrapper with the classes loaded
+        :param output_file_name: Path of the CSV/TSV export
+        :param root: ID, label or synonym of the root of the branch
+        :param export_csv_headers: '|' separated export columns
+        :param export_sort: Column(s) to sort by, as for create_subset_from
+        :param intermediates: 'all' keeps every class of the branch, 'minimal' only those with more than one subclass,
+            and 'none' none at all. Leaves and the root are always kept, each class is placed under its nearest kept
+            ancestor.
+        :param id_prefix: Prefix declaration for IDs, only needed for an IRI column
+        """
+        if intermediates not in ('all', 'minimal', 'none'):
+            raise Exception(f"Unknown intermediates option: '{intermediates}'")
+
+        root_entity = template_wrapper.get_entity(root)
+        branch = [root_entity] + [e for e in template_wrapper.get_descendants(root)
+                                  if e.curation_status != 'Obsolete']
+
+        def parent_of(entity: OntologyEntity) -> Optional[OntologyEntity]:
+            if entity is root_entity or not entity.parent:
+                return None
+            return template_wrapper.all_entity_names.get(normalise_label(entity.parent))
+
+        child_counts: dict[int, int] = {}
+        for entity in branch:
+            parent = parent_of(entity)
+            if parent is not None:
+                child_counts[id(parent)] = child_counts.get(id(parent), 0) + 1
+
+        def kept(entity: OntologyEntity) -> bool:
+            children = child_counts.get(id(entity), 0)
+            if entity is root_entity or children == 0 or intermediates == 'all':
+                return True
+            return intermediates == 'minimal' and children > 1
+
+        subset = [e for e in branch if kept(e)]
+        kept_ids = {id(e) for e in subset}
+
+        def kept_parent(entity: OntologyEntity) -> Optional[OntologyEntity]:
+            parent = parent_of(entity)
+            while parent is not None and id(parent) not in kept_ids:
+                parent = parent_of(parent)
+            return parent
+
+        headers = split_headers(export_csv_headers)
+        prefixes = PrefixMap([id_prefix]) if id_prefix is not None else None
+        columns = [self._entity_export_column(template_wrapper, prefixes, h, kept_parent) for h in headers]
+        rows = [[column(entity) for column in columns] for entity in subset]
+        write_export(self._output_path(output_file_name), headers, rows, export_sort)
+        self._publish(output_file_name)
+
+    async def create_subset_from_entities_async(self, template_wrapper, output_file_name: str, root: str,
+                                                export_csv_headers: str, export_sort: Optional[str] = None,
+                                                intermediates: str = 'all', id_prefix: Optional[str] = None) -> None:
+        """
+        Async counterpart of create_subset_from_entities, rendering the export on the blocking executor
+        """
+        await self._run_blocking(self.create_subset_from_entities, template_wrapper, output_file_name, root,
+                                 export_csv_headers, export_sort, intermediates, id_prefix)
+
+    @staticmethod
+    def _entity_export_column(template_wrapper, prefixes: Optional[PrefixMap], header: str,
+                              kept_parent: Callable[[OntologyEntity], Optional[OntologyEntity]]) \
+            -> Callable[[OntologyEntity], str]:
+        if header == "ID":
+            return lambda e: e.id or ""
+        if header == "IRI":
+            if prefixes is None:
+                raise Exception("An id_prefix is needed to export the IRI column")
+            return lambda e: prefixes.expand(e.id) if e.id else ""
+        if header == "LABEL":
+            return lambda e: e.name or ""
+        if header == "SubClass Of":
+            return lambda e: kept_parent(e).name if kept_parent(e) is not None else ""
+
+        curie = ENTITY_ANNOTATION_LABELS.get(header, header)
+        mapping = template_wrapper.header_mapping.get(header)
+        if mapping is not None and mapping.robotType == RobotType.ROBOT_TYPE_ANNOTATION:
+            curie = mapping.mappingId
+        field = ENTITY_ANNOTATION_FIELDS.get(curie)
+        if field is not None:
+            def annotation(e: OntologyEntity) -> str:
+                value = getattr(e, field)
+                if isinstance(value, list):
+                    return EXPORT_SPLIT.join(v.strip() for v in value)
+                return value or ""
+            return annotation
+
+        relation = template_wrapper.all_rel_names.get(header.lower())
+        if relation is not None:
+            def related(e: OntologyEntity) -> str:
+                targets = [t.name for t in (e.relations or {}).get(relation.name, [])]
+                for key in (relation.id, quoteIfNeeded(relation.name)):
+                    targets.extend((e.relation_targets or {}).get(key, []))
+                # A target given both in the sheet and by a LucidChart merge is listed once, as first spelt
+                unique: dict[str, str] = {}
+                for target in targets:
+                    unique.setdefault(normalise_label(target), target)
+                return EXPORT_SPLIT.join(unique.values())
+            return related
 
-        self._execute_command(command_str=robot_cmd)
+        raise Exception(f"Unable to export column '{header}' from the loaded classes")
@@ -1,7 +1,12 @@
 import csv
+import functools
 import logging
+import os
 import re
-from typing import Optional
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
 import openpyxl
 from openpyxl import Workbook
@@ -9,7 +14,11 @@ from openpyxl import Workbook
 from .core import ColumnMapping, get_relationship_mapping, DEFAULT_HEADER_MAPPINGS, \
     DEFAULT_HEADERS_TO_IGNORE, RobotType
 from .RobotWrapper import RobotWrapper
-from .core import OntologyEntity, OntologyRelation
+from .workspace import BuildWorkspace
+from .workbook_patch import WorkbookPatch, WorkbookPatchResult, patch_workbook, read_sheet_headers
+from .hierarchy import HierarchyIndex
+from .label_resolver import LabelResolver, LabelSuggestion, normalise_label
+from .core import OntologyEntity, OntologyRelation, IssueType, Severity, ValidationReport
 from .utils import quoteIfNeeded, quoted
 
 
@@ -18,7 +27,7 @@ class RobotTemplateWrapper(RobotWrapper):
 
     all_entity_names: dict[str, OntologyEntity]
     '''
-    index of names to ontology entities
+    index of labels and synonyms, normalised by normalise_label, to ontology entities
     '''
 
     all_entity_ids: dict[str, OntologyEntity]
@@ -36,24 +45,34 @@ class RobotTemplateWrapper(RobotWrapper):
     index of ids to relations
     '''
 
+    entities: list[OntologyEntity]
+    '''
+    all parsed class rows in sheet order, including rows shadowed in the indexes by duplicate ids or labels
+    '''
+
     parents_to_children: dict[str, list[str]]
 
+    _hierarchy: Optional[HierarchyIndex]
+
     header_mapping: dict[str, ColumnMapping]
 
     ignored_headers: list[str]
 
-    def __init__(self, robotcmd):
-        super().__init__(robotcmd, True)
+    def __init__(self, robotcmd, workspace: Optional[BuildWorkspace] = None):
+        super().__init__(robotcmd, True, workspace)
         self.all_entity_names = {}
         self.all_entity_ids = {}
         self.all_rel_names = {}
         self.all_rel_ids = {}
+        self.entities = []
         self.parents_to_children = {}
-        self.header_mapping = DEFAULT_HEADER_MAPPINGS
-        self.ignored_headers = DEFAULT_HEADERS_TO_IGNORE
+        self._hierarchy = None
+        # Copies, as unknown REL and other headers are added while reading a sheet
+        self.header_mapping = dict(DEFAULT_HEADER_MAPPINGS)
+        self.ignored_headers = list(DEFAULT_HEADERS_TO_IGNORE)
 
     def __dfs__(self, order, node):
-        if node not in order.keys() and node.lower() in self.all_entity_names.keys():
+        if node not in order.keys() and normalise_label(node) in self.all_entity_names.keys():
             order[node] = ''
             if node in self.parents_to_children.keys():
                 for child in self.parents_to_children[node]:
@@ -98,6 +117,8 @@ class RobotTemplateWrapper(RobotWrapper):
         for raw_row in data:
             row: list[Optional[str]] = [raw_row[i].value for i in
                                         header_indices]  # just those headers that are mapped
+            if all(v is None for v in row):
+                continue
             row_with_header: list[tuple[Optional[str], ColumnMapping]] = list(zip(row, headers_mapped))
             new_row: list[str] = [mapping.parse_value(i) for (i, mapping) in row_with_header]
 
@@ -110,11 +131,7 @@ class RobotTemplateWrapper(RobotWrapper):
                 value = value.strip()
                 self._patch_entity_from_excel_col(entity, value, mapping)
 
-            self.all_entity_ids[entity.id] = entity
-            self.all_entity_names[entity.name.lower()] = entity
-            self.all_entity_names[entity.name.lower()] = entity
-            for synonym in entity.synonyms:
-                self.all_entity_names[synonym.lower()] = entity
+            self.add_entity(entity)
 
             if write_csv:
                 if entity.curation_status not in ['Obsolete']:
@@ -128,6 +145,82 @@ class RobotTemplateWrapper(RobotWrapper):
         self._logger.debug('FINISHED PARSING ALL ROWS IN SPREADSHEET')
         wb.close()
 
+    async def add_classes_from_excel_async(self, excel_file_name: str, csv_file_name: Optional[str] = None) -> None:
+        """
+        Async counterpart of add_classes_from_excel, parsing the workbook on the blocking executor
+        """
+        await self._run_blocking(self.add_classes_from_excel, excel_file_name, csv_file_name)
+
+    def add_entity(self, entity: OntologyEntity) -> None:
+        """
+        Adds a class to the entity indexes, by ID and by normalised label and synonyms.
+
+        :param entity: The class to add
+        """
+        if self._hierarchy is not None:
+            self._hierarchy.add(entity)
+        self.entities.append(entity)
+        if entity.id is not None:
+            self.all_entity_ids[entity.id] = entity
+        if entity.name is not None:
+            self.all_entity_names[normalise_label(entity.name)] = entity
+        for synonym in entity.synonyms or []:
+            self.all_entity_names[normalise_label(synonym)] = entity
+
+    def clear_entities(self) -> None:
+        """
+        Removes all classes from the entity indexes. Relations are kept.
+        """
+        self.entities = []
+        self.all_entity_ids = {}
+        self.all_entity_names = {}
+        self.parents_to_children = {}
+        self._hierarchy = None
+
+    @property
+    def hierarchy(self) -> HierarchyIndex:
+        """
+        The is_a closure index over the loaded classes, built on first use and kept up to date by add_entity
+        """
+        if self._hierarchy is None:
+            self._hierarchy = HierarchyIndex(self.entities, lambda label: self.all_entity_names.get(normalise_label(label)))
+        return self._hierarchy
+
+    def get_entity(self, term: str) -> OntologyEntity:
+        """
+        :param term: ID, label or synonym of a class
+        :return: The class
+        """
+        entity = self.all_entity_ids.get(term)
+        if entity is None:
+            entity = self.all_entity_names.get(normalise_label(term))
+        if entity is None:
+            raise Exception(f"Unknown class: '{term}'")
+        return entity
+
+    def is_descendant_of(self, term: str, ancestor: str) -> bool:
+        """
+        Checks whether `ancestor` is a direct or indirect parent of `term`, in constant time.
+
+        :param term: ID, label or synonym of the class
+        :param ancestor: ID, label or synonym of the potential ancestor
+        """
+        return self.hierarchy.is_descendant(self.get_entity(term), self.get_entity(ancestor))
+
+    def get_descendants(self, term: str) -> list[OntologyEntity]:
+        """
+        :param term: ID, label or synonym of a class
+        :return: All direct and indirect subclasses of the class
+        """
+        return self.hierarchy.descendants(self.get_entity(term))
+
+    def get_ancestors(self, term: str) -> list[OntologyEntity]:
+        """
+        :param term: ID, label or synonym of a class
+        :return: All direct and indirect parents of the class that are loaded, nearest first
+        """
+        return self.hierarchy.ancestors(self.get_entity(term))
+
     def _extract_headers_for_class_def(self, data, excel_file_name: str):
         header: list[str] = [i.value for i in next(data)]
         self._logger.debug(f"Headers for '{excel_file_name}': {header}")
@@ -173,6 +266,8 @@ class RobotTemplateWrapper(RobotWrapper):
 
         if header_val.excelColName == "Synonyms":
             more_synonyms = col_val.split(";")
+            if entity.synonyms is None:
+                entity.synonyms = []
             entity.synonyms.extend(more_synonyms)
             patched = True
 
@@ -181,13 +276,14 @@ class RobotTemplateWrapper(RobotWrapper):
             patched = True
 
         if header_val.excelColName == "Parent":
-            parents = col_val
-            parent = parents.split("/")[0]
-            if '(' in parent:
-                parent = parent[:parent.index("(")].strip()
-            if '[' in parent:
-                parent = parent[:parent.index("[")].strip()
-            entity.parent = parent
+            entity.parent = self._clean_label_reference(col_val.split("/")[0])
+            patched = True
+
+        if header_val.robotType == RobotType.ROBOT_TYPE_RELATION:
+            targets = [self._clean_label_reference(t) for t in col_val.split(";")]
+            if entity.relation_targets is None:
+                entity.relation_targets = {}
+            entity.relation_targets[header_val.mappingId] = [t for t in targets if len(t) > 0]
             patched = True
 
         if header_val.excelColName == "Examples":
@@ -218,6 +314,15 @@ class RobotTemplateWrapper(RobotWrapper):
             self._logger.warning(
                 f"Mapped column '{header_val.excelColName}' value was not handled for entity {entity.name}: {col_val}")
 
+    @staticmethod
+    def _clean_label_reference(value: str) -> str:
+        # References to other classes may carry an ID or a synonym: "label (synonym) [ID]"
+        if '(' in value:
+            value = value[:value.index("(")]
+        if '[' in value:
+            value = value[:value.index("[")]
+        return value.strip()
+
     def add_rel_info_from_excel(self, excel_file_name: str) -> None:
         """
         Adds relation
@@ -258,6 +363,12 @@ class RobotTemplateWrapper(RobotWrapper):
 
         wb.close()
 
+    async def add_rel_info_from_excel_async(self, excel_file_name: str) -> None:
+        """
+        Async counterpart of add_rel_info_from_excel, parsing the workbook on the blocking executor
+        """
+        await self._run_blocking(self.add_rel_info_from_excel, excel_file_name)
+
     def create_csv_relation_template_file(self, csv_file_name: str):
         # Create ROBOT template for NEW properties (parent is not None)
 
@@ -290,14 +401,159 @@ class RobotTemplateWrapper(RobotWrapper):
                 print(self.all_rel_names.keys())
                 continue
             onto_rel = self.all_rel_names[rel_name.lower()]
-            onto_entity1 = self.all_entity_names[rel.entity1.name.replace('\n', ' ').lower().strip()]
-            onto_entity2 = self.all_entity_names[rel.entity2.name.replace('\n', ' ').lower().strip()]
+            onto_entity1 = self.all_entity_names.get(normalise_label(rel.entity1.name))
+            onto_entity2 = self.all_entity_names.get(normalise_label(rel.entity2.name))
+            if onto_entity1 is None or onto_entity2 is None:
+                missing = rel.entity1.name if onto_entity1 is None else rel.entity2.name
+                self._logger.error(f"Entity '{missing}' of relation '{rel_name}' not found. Skipping relation.")
+                continue
             if onto_entity1.relations is None:
                 onto_entity1.relations = {}
             if onto_rel.name not in onto_entity1.relations.keys():
                 onto_entity1.relations[onto_rel.name] = []
             onto_entity1.relations[onto_rel.name].append(onto_entity2)
 
+    def validate(self, lucid_relations=None) -> ValidationReport:
+        """
+        Checks the parsed classes and relations for consistency without invoking ROBOT.
+
+        Detects missing and duplicate IDs and labels, collisions between labels and synonyms, parents and relation
+        targets which cannot be resolved, is_a cycles and obsolete classes used as parents. All checks are linear in
+        the number of parsed rows.
+
+        :param lucid_relations: Optional relations parsed from a LucidChart csv, checked as by mergeRelInfoFromLucidChart
+        :return: The report of all issues found
+        """
+        report = ValidationReport()
+
+        ids: dict[str, OntologyEntity] = {}
+        labels: dict[str, OntologyEntity] = {}
+        synonyms: dict[str, OntologyEntity] = {}
+        for entity in self.entities:
+            if entity.id is None:
+                report.add(IssueType.MISSING_ID, Severity.ERROR, f"Class '{entity.name}' has no ID",
+                           label=entity.name)
+            elif entity.id in ids:
+                report.add(IssueType.DUPLICATE_ID, Severity.ERROR,
+                           f"ID '{entity.id}' is used by '{ids[entity.id].name}' and '{entity.name}'",
+                           entity_id=entity.id, label=entity.name, value=entity.id, related=[ids[entity.id].name])
+            else:
+                ids[entity.id] = entity
+
+            if entity.name is None:
+                report.add(IssueType.MISSING_LABEL, Severity.ERROR, f"Class '{entity.id}' has no label",
+                           entity_id=entity.id)
+                continue
+
+            key = normalise_label(entity.name)
+            if key in labels:
+                report.add(IssueType.DUPLICATE_LABEL, Severity.ERROR,
+                           f"Label '{entity.name}' is used by '{labels[key].id}' and '{entity.id}'",
+                           entity_id=entity.id, label=entity.name, value=entity.name, related=[labels[key].id])
+            else:
+                labels[key] = entity
+
+            for synonym in entity.synonyms or []:
+                syn_key = normalise_label(synonym)
+                other = synonyms.get(syn_key)
+                if other is not None and other is not entity:
+                    report.add(IssueType.LABEL_SYNONYM_COLLISION, Severity.WARNING,
+                               f"Synonym '{synonym}' of '{entity.id}' is also a synonym of '{other.id}'",
+                               entity_id=entity.id, label=entity.name, value=synonym, related=[other.id])
+                else:
+                    synonyms[syn_key] = entity
+
+        for key, entity in synonyms.items():
+            other = labels.get(key)
+            if other is not None and other is not entity:
+                report.add(IssueType.LABEL_SYNONYM_COLLISION, Severity.WARNING,
+                           f"Synonym '{key}' of '{entity.id}' is the label of '{other.id}'",
+                           entity_id=entity.id, label=entity.name, value=key, related=[other.id])
+
+        # is_a links between parsed classes, keyed by python object id to be safe against duplicate ids
+        parent_of: dict[int, OntologyEntity] = {}
+        for entity in self.entities:
+            if entity.parent is None or len(entity.parent) == 0:
+                report.add(IssueType.MISSING_PARENT, Severity.ERROR, f"Class '{entity.id}' ('{entity.name}') has no parent",
+                           entity_id=entity.id, label=entity.name)
+            else:
+                parent = self.all_entity_names.get(normalise_label(entity.parent))
+                if parent is None:
+                    report.add(IssueType.DANGLING_PARENT, Severity.WARNING,
+                               f"Parent '{entity.parent}' of '{entity.id}' is not defined and will be treated as imported",
+                               entity_id=entity.id, label=entity.name, value=entity.parent)
+                else:
+                    parent_of[id(entity)] = parent
+                    if parent.curation_status == 'Obsolete' and entity.curation_status != 'Obsolete':
+                        report.add(IssueType.OBSOLETE_PARENT, Severity.ERROR,
+                                   f"Parent '{parent.name}' of '{entity.id}' is obsolete",
+                                   entity_id=entity.id, label=entity.name, value=entity.parent, related=[parent.id])
+
+            for rel_id, targets in (entity.relation_targets or {}).items():
+                for target in targets:
+                    if normalise_label(target) not in self.all_entity_names:
+                        report.add(IssueType.DANGLING_RELATION_TARGET, Severity.WARNING,
+                                   f"Target '{target}' of relation {rel_id} on '{entity.id}' is not defined",
+                                   entity_id=entity.id, label=entity.name, value=target, related=[rel_id])
+
+        # Each class has at most one parent, so every walk up the hierarchy either ends or runs into a cycle
+        walk_of: dict[int, int] = {}
+        for walk, entity in enumerate(self.entities):
+            node = entity
+            while node is not None and id(node) not in walk_of:
+                walk_of[id(node)] = walk
+                node = parent_of.get(id(node))
+            if node is None or walk_of[id(node)] != walk:
+                continue
+            cycle = [node]
+            member = parent_of[id(node)]
+            while member is not node:
+                cycle.append(member)
+                member = parent_of[id(member)]
+            report.add(IssueType.CYCLE, Severity.ERROR,
+                       "is_a cycle: " + " -> ".join(f"'{c.name}'" for c in cycle + [node]),
+                       entity_id=node.id, label=node.name, related=[c.id for c in cycle])
+
+        for rel in lucid_relations or []:
+            rel_name = rel.relType
+            if '(' in rel_name:
+                rel_name = rel_name[0:rel_name.rindex('(')].strip()
+            if rel_name.lower() not in self.all_rel_names:
+                report.add(IssueType.UNKNOWN_RELATION, Severity.ERROR, f"Relation '{rel_name}' is not defined",
+                           value=rel_name)
+            for lucid_entity in (rel.entity1, rel.entity2):
+                name = normalise_label(lucid_entity.name)
+                if name not in self.all_entity_names:
+                    report.add(IssueType.DANGLING_RELATION_TARGET, Severity.ERROR,
+                               f"Entity '{lucid_entity.name}' of relation '{rel_name}' is not defined",
+                               value=lucid_entity.name, related=[rel_name])
+
+        self._logger.debug(f"Validation finished with {len(report.errors)} errors and {len(report.warnings)} warnings")
+        return report
+
+    async def validate_async(self, lucid_relations=None) -> ValidationReport:
+        """
+        Async counterpart of validate, running the checks on the blocking executor
+        """
+        return await self._run_blocking(self.validate, lucid_relations)
+
+    def suggest_unresolved_references(self, limit: int = 5, min_score: float = 0.3) -> dict[str, list[LabelSuggestion]]:
+        """
+        Suggests known labels or synonyms for every parent and relation target that does not resolve exactly.
+
+        :param limit: Maximum number of suggestions per reference
+        :param min_score: Minimum trigram similarity between 0 and 1 for a suggestion
+        :return: Suggestions, best first, for each unresolved reference
+        """
+        references = []
+        for entity in self.entities:
+            if entity.parent:
+                references.append(entity.parent)
+            for targets in (entity.relation_targets or {}).values():
+                references.extend(targets)
+
+        return LabelResolver.from_wrapper(self).suggest_many(references, limit, min_score)
+
     def write_spreadsheet(self, excel_file_name, id_col_name: str) -> None:
         book = Workbook()
         sheet = book.active
@@ -312,8 +568,8 @@ class RobotTemplateWrapper(RobotWrapper):
         top_level = []
         for entity in self.all_entity_names.values():
             parent = entity.parent
-            if parent.lower() not in self.all_entity_names.keys() and parent.lower() not in import_classes:
-                import_classes.append(parent.lower())
+            if normalise_label(parent) not in self.all_entity_names.keys() and normalise_label(parent) not in import_classes:
+                import_classes.append(normalise_label(parent))
                 top_level.append(entity.name)
             if parent not in self.parents_to_children:
                 self.parents_to_children[parent] = []
@@ -335,9 +591,9 @@ class RobotTemplateWrapper(RobotWrapper):
             if entity_name is None:
                 continue
 
-            entity = self.all_entity_names[entity_name.lower()]
-            parent_name = entity.parent.lower() if entity.parent.lower() in import_classes else self.all_entity_names[
-                entity.parent.lower()].name
+            entity = self.all_entity_names[normalise_label(entity_name)]
+            parent_name = normalise_label(entity.parent) if normalise_label(entity.parent) in import_classes else \
+                self.all_entity_names[normalise_label(entity.parent)].name
             rel_vals = [";".join([z.name for z in x]) if len(x) > 0 else '' for x in
                         [entity.relations[y.name] if entity.relations is not None and y.name in entity.relations else []
                          for y in self.all_rel_names.values()]]
@@ -360,25 +616,261 @@ class RobotTemplateWrapper(RobotWrapper):
 
         book.save(excel_file_name)
 
+    async def write_spreadsheet_async(self, excel_file_name, id_col_name: str) -> None:
+        """
+        Async counterpart of write_spreadsheet, serialising the workbook on the blocking executor
+        """
+        await self._run_blocking(self.write_spreadsheet, excel_file_name, id_col_name)
+
+    # OntologyEntity attributes held by annotation and parent columns, by the excelColName of their mapping
+    _entity_fields = {"Parent": "parent",
+                      "Definition": "definition",
+                      "Definition source": "definition_source",
+                      "Definition_source": "definition_source",
+                      "Logical definition": "logical_definition",
+                      "Synonyms": "synonyms",
+                      "Examples": "examples",
+                      "Comment": "comment",
+                      "Curation status": "curation_status",
+                      "Curator note": "curator_note"}
+
+    def _entity_field(self, mapping: ColumnMapping) -> Optional[str]:
+        if mapping.robotType == RobotType.ROBOT_TYPE_ID:
+            return "id"
+        if mapping.robotType == RobotType.ROBOT_TYPE_LABEL:
+            return "name"
+        if mapping.robotType == RobotType.ROBOT_TYPE_RELATION:
+            return "relation_targets"
+        return self._entity_fields.get(mapping.excelColName)
+
+    # Fields add_classes_from_excel does not read, so a loaded class has None whatever the sheet holds
+    _unparsed_fields = {"logical_definition", "definition_source"}
+
+    def _parse_row(self, values: dict[str, str], columns: dict[str, tuple[str, ColumnMapping]]) -> OntologyEntity:
+        """
+        :return: A class as add_classes_from_excel reads it from the given cell values by header
+        """
+        entity = OntologyEntity()
+        for header, (field, mapping) in columns.items():
+            value = values.get(header)
+            if value is None:
+                continue
+            if field in self._unparsed_fields:
+                setattr(entity, field, value.strip())
+            else:
+                self._patch_entity_from_excel_col(entity, value.strip(), mapping)
+        return entity
+
+    @staticmethod
+    def _field_value(entity: OntologyEntity, field: str, mapping: ColumnMapping):
+        value = getattr(entity, field)
+        if field == "relation_targets":
+            value = (value or {}).get(mapping.mappingId)
+        return value if value not in (None, "", []) else None
+
+    def _changed_cells(self, entity: OntologyEntity, values: dict[str, str],
+                       columns: dict[str, tuple[str, ColumnMapping]], fields: list[str]) -> dict[str, Optional[str]]:
+        """
+        Compares a class with the class read from its current row and returns the cells of the fields that differ.
+        Cells of unchanged fields are left alone, as the parsed values drop parts of the cell text, e.g. IDs after
+        labels.
+        """
+        original = self._parse_row(values, columns)
+        label_columns = {h: c for h, c in columns.items() if c[0] == "name"}
+        label_synonyms = self._parse_row(values, label_columns).synonyms or []
+
+        edits = {}
+        for header, (field, mapping) in columns.items():
+            if field not in fields:
+                continue
+            value = self._field_value(entity, field, mapping)
+            if value == self._field_value(original, field, mapping):
+                continue
+            if value is None and field in self._unparsed_fields:
+                continue
+
+            if value is None:
+                edits[header] = None
+            elif field == "name":
+                # Keep the synonym of the label cell, "label (synonym)"
+                current = values.get(header, "")
+                synonym = current[current.index("("):] if "(" in current and ")" in current else ""
+                edits[header] = f"{value} {synonym}".strip()
+            elif field == "synonyms":
+                # Synonyms given in the label cell stay there
+                edits[header] = ";".join(v for v in value if v not in label_synonyms) or None
+            elif isinstance(value, (list, tuple)):
+                edits[header] = ";".join(value)
+            else:
+                edits[header] = value
+        return edits
+
+    def patch_spreadsheet(self, excel_file_name: str, entities: Iterable[OntologyEntity], fields: list[str],
+                          key_column: Optional[str] = None, output_file_name: Optional[str] = None,
+                          sheet_name: Optional[str] = None) -> WorkbookPatchResult:
+        """
+        Writes changed classes back into an existing class sheet, e.g. after normalising parents or assigning IDs.
+
+        Unlike write_spreadsheet, which creates a new workbook, only cells in the rows of the given classes are
+        rewritten, and only those of the given fields whose value differs from the one read from the cell. Formatting,
+        other sheets and columns that are not mapped are kept as they are. See patch_workbook.
+
+        :param excel_file_name: Path of the class sheet
+        :param entities: The changed classes
+        :param fields: Attributes of OntologyEntity to write, e.g. ["parent", "definition"]. "relation_targets" writes
+            all REL columns
+        :param key_column: Header of the column identifying the rows, the ID column if None. Use the label column to
+            write IDs of classes that have none yet
+        :param output_file_name: Path of the patched workbook, the input if None
+        :param sheet_name: Name of the sheet, the active sheet if None
+        """
+        columns: dict[str, tuple[str, ColumnMapping]] = {}
+        for header in read_sheet_headers(excel_file_name, sheet_name):
+            mapping = self.header_mapping.get(header)
+            if mapping is None and header.strip().startswith('REL'):
+                values = quoted.findall(header)
+                if len(values) == 1:
+                    mapping = get_relationship_mapping(header, rel_id=quoteIfNeeded(values[0]))
+            field = self._entity_field(mapping) if mapping is not None else None
+            if field is not None:
+                columns[header] = (field, mapping)
+
+        if key_column is None:
+            key_column = next((h for h, (f, _) in columns.items() if f == "id"), None)
+            if key_column is None:
+                raise Exception(f"No ID column in '{excel_file_name}'")
+        if key_column not in columns:
+            raise Exception(f"Key column '{key_column}' of '{excel_file_name}' does not hold ids or labels")
+        key_field, key_mapping = columns[key_column]
+        if key_field == "name":
+            # Label cells may carry a synonym, "label (synonym)"
+            patch = WorkbookPatch(key_column, lambda v: normalise_label(self._clean_label_reference(v)))
+        else:
+            patch = WorkbookPatch(key_column)
+
+        unmapped = [f for f in fields if f not in {f for f, _ in columns.values()}]
+        if unmapped:
+            self._logger.warning(f"No columns for fields {unmapped} in '{excel_file_name}'")
+        fields = [f for f in fields if f != key_field]
+
+        for entity in entities:
+            key = self._field_value(entity, key_field, key_mapping)
+            if key is None:
+                self._logger.warning(f"Not patching entity without {key_field}: {entity}")
+                continue
+            patch.edit_row(key, functools.partial(self._changed_cells, entity, columns=columns, fields=fields))
+
+        return patch_workbook(excel_file_name, patch, output_file_name, sheet_name)
+
+    async def patch_spreadsheet_async(self, excel_file_name: str, entities: Iterable[OntologyEntity],
+                                      fields: list[str], key_column: Optional[str] = None,
+                                      output_file_name: Optional[str] = None,
+                                      sheet_name: Optional[str] = None) -> WorkbookPatchResult:
+        """
+        Async counterpart of patch_spreadsheet, rewriting the workbook on the blocking executor
+        """
+        return await self._run_blocking(self.patch_spreadsheet, excel_file_name, list(entities), fields, key_column,
+                                        output_file_name, sheet_name)
+
     # Executes ROBOT from a template file as created
     def createOntologyFromTemplateFile(self, csvFileName, dependency, iri_prefix, id_prefixes, ontology_iri,
-                                       owlFileName):
-        robot_cmd = [self.robotcmd, 'template', '--template', csvFileName]
-        for p in id_prefixes:
-            robot_cmd.append('--prefix')
-            robot_cmd.append(p)
+                                       owlFileName, shards: int = 1, dependencyFileName=None):
+        """
+        Builds an ontology from a ROBOT template, e.g. as written by add_classes_from_excel.
+
+        With more than one shard the template rows are split into that many parts which are built by parallel ROBOT
+        runs and merged, see _plan_template_shards.
+
+        Dependencies are imported through a generated ontology, written to `dependencyFileName` if given. Otherwise
+        it is imports.owl in the workspace, or in the current directory without a workspace, where it is shared by
+        all builds. With a workspace the ontology is only written to `owlFileName` once it was built successfully.
+        """
+        if shards > 1:
+            plan = self._plan_template_shards(csvFileName, dependency, iri_prefix, id_prefixes, ontology_iri,
+                                              owlFileName, shards)
+            if plan is not None:
+                work_dir, label_command, shard_commands, merge_command = plan
+                try:
+                    failed = self._failed_shards(owlFileName, [self._execute_command(command_str=label_command)])
+                    if failed != 0:
+                        return failed
+                    with ThreadPoolExecutor(max_workers=len(shard_commands)) as executor:
+                        returncodes = list(executor.map(self._execute_command, shard_commands))
+                    failed = self._failed_shards(owlFileName, returncodes)
+                    if failed != 0:
+                        return failed
+                    return self._publish(owlFileName, self._execute_command(command_str=merge_command))
+                finally:
+                    if self.cleanup:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+
+        robot_cmd = self._template_command(csvFileName, dependency, iri_prefix, id_prefixes, ontology_iri,
+                                           owlFileName, dependencyFileName)
+        return self._publish(owlFileName, self._execute_command(command_str=robot_cmd))
+
+    async def createOntologyFromTemplateFile_async(self, csvFileName, dependency, iri_prefix, id_prefixes,
+                                                   ontology_iri, owlFileName, shards: int = 1,
+                                                   dependencyFileName=None) -> int:
+        """
+        Async counterpart of createOntologyFromTemplateFile, the ROBOT runs do not block the event loop and are
+        killed if the build is cancelled.
+        """
+        if shards > 1:
+            plan = await self._run_blocking(self._plan_template_shards, csvFileName, dependency, iri_prefix,
+                                            id_prefixes, ontology_iri, owlFileName, shards)
+            if plan is not None:
+                work_dir, label_command, shard_commands, merge_command = plan
+                try:
+                    failed = self._failed_shards(owlFileName, [await self._execute_command_async(label_command)])
+                    if failed != 0:
+                        return failed
+                    returncodes = await self._gather_bounded(
+                        [functools.partial(self._execute_command_async, c) for c in shard_commands])
+                    failed = self._failed_shards(owlFileName, returncodes)
+                    if failed != 0:
+                        return failed
+                    returncode = await self._execute_command_async(merge_command)
+                    return await self._run_blocking(self._publish, owlFileName, returncode)
+                finally:
+                    if self.cleanup:
+                        await self._run_blocking(shutil.rmtree, work_dir, ignore_errors=True)
+
+        robot_cmd = await self._run_blocking(self._template_command, csvFileName, dependency, iri_prefix,
+                                             id_prefixes, ontology_iri, owlFileName, dependencyFileName)
+        returncode = await self._execute_command_async(robot_cmd)
+        return await self._run_blocking(self._publish, owlFileName, returncode)
+
+    def _template_command(self, csvFileName, dependency, iri_prefix, id_prefixes, ontology_iri, owlFileName,
+                          dependencyFileName) -> str:
+        robot_cmd = [self.robotcmd, 'template', '--template', csvFileName, *self._prefix_options(id_prefixes)]
         robot_cmd.extend(['--ontology-iri', ontology_iri,
-                          '--output', owlFileName
+                          '--output', self._output_path(owlFileName)
                           ])
 
         # A bit of hacking to deal appropriately with external dependency files:
         if dependency is not None:
-            # Allow multiple dependencies. These will become OWL imports.
-            dependencyFileNames = dependency.split(',')
-            print(dependencyFileNames)
-            dependencyFileName = "imports.owl"
-            with open(dependencyFileName, 'w') as outFile:
-                outFile.write("""<?xml version=\"1.0\"?>
+            if dependencyFileName is None:
+                dependencyFileName = self._intermediate_path("imports.owl")
+            self._write_dependency_file(dependencyFileName, dependency, iri_prefix, ontology_iri)
+
+            robot_cmd.extend(['--input', dependencyFileName, "--merge-before", "--collapse-import-closure", "false",
+                              *self._catalog_options()])
+
+        return " ".join(robot_cmd)
+
+    @staticmethod
+    def _prefix_options(id_prefixes) -> list[str]:
+        options = []
+        for p in id_prefixes:
+            options.extend(['--prefix', p])
+        return options
+
+    def _write_dependency_file(self, dependencyFileName, dependency, iri_prefix, ontology_iri):
+        # Allow multiple dependencies. These will become OWL imports.
+        dependencyFileNames = dependency.split(',')
+        self._logger.debug(f"Importing {dependencyFileNames} into '{ontology_iri}'")
+        with open(dependencyFileName, 'w') as outFile:
+            outFile.write("""<?xml version=\"1.0\"?>
     <rdf:RDF xmlns="http://www.semanticweb.org/ontologies/temporary#"
         xml:base="http://www.semanticweb.org/ontologies/temporary"
         xmlns:dc="http://purl.org/dc/elements/1.1/"
@@ -390,12 +882,92 @@ class RobotTemplateWrapper(RobotWrapper):
         xmlns:foaf="http://xmlns.com/foaf/0.1/"
         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
         <owl:Ontology rdf:about=\"""" + ontology_iri + "\">\n")
-                for d in dependencyFileNames:
-                    outFile.write("<owl:imports rdf:resource=\"" + iri_prefix + d + "\"/> \n")
-                outFile.write(" </owl:Ontology> \n</rdf:RDF> ")
+            for d in dependencyFileNames:
+                outFile.write("<owl:imports rdf:resource=\"" + iri_prefix + d + "\"/> \n")
+            outFile.write(" </owl:Ontology> \n</rdf:RDF> ")
 
-        robot_cmd.extend(['--input', dependencyFileName, "--merge-before", "--collapse-import-closure", "false"])
+    def _plan_template_shards(self, csvFileName, dependency, iri_prefix, id_prefixes, ontology_iri, owlFileName,
+                              shards: int) -> Optional[tuple[str, str, list[str], str]]:
+        """
+        Prepares building an ontology from a ROBOT template in parallel shards.
 
-        robot_cmd = " ".join(robot_cmd)
+        Rows of one shard may refer to classes defined in another one by label. So that every shard resolves the same
+        labels as a single build would, each shard is built against a shared label table: an ontology declaring
+        the ID and label of every row of the template. The table is built by ROBOT from the ID and label columns with
+        the same prefixes, so its IRIs are expanded exactly as in the unsharded build. The shard outputs only contain
+        the axioms generated from their own rows, and merging them with the dependencies gives the axioms of the
+        unsharded build.
 
-        self._execute_command(command_str=robot_cmd)
+        :return: The working directory holding the shards, the ROBOT command building the label table, the commands
+            building the shards and the command merging them, or None if the template is too small to be sharded
+        """
+        with open(csvFileName, newline='') as f:
+            reader = csv.reader(f, delimiter=',', quotechar='\"')
+            headers = [next(reader), next(reader)]
+            rows = list(reader)
+
+        shards = min(shards, len(rows))
+        if shards <= 1:
+            return None
+
+        if self.workspace is not None:
+            work_dir = self.workspace.make_dir(os.path.basename(owlFileName) + ".shards")
+        else:
+            work_dir = tempfile.mkdtemp(prefix=os.path.basename(owlFileName) + ".shards.",
+                                        dir=os.path.dirname(os.path.abspath(owlFileName)))
+        try:
+            labels_csv = os.path.join(work_dir, "labels.csv")
+            labels_file_name = os.path.join(work_dir, "labels.owl")
+            self._write_label_template(labels_csv, headers, rows)
+            label_command = " ".join([self.robotcmd, 'template', '--template', labels_csv,
+                                      *self._prefix_options(id_prefixes), '--output', labels_file_name])
+
+            inputs = [*self._catalog_options(), '--input', labels_file_name]
+            merge_inputs = [*self._catalog_options()]
+            if dependency is not None:
+                dependency_file_name = os.path.join(work_dir, "imports.owl")
+                self._write_dependency_file(dependency_file_name, dependency, iri_prefix, ontology_iri)
+                inputs.extend(['--input', dependency_file_name])
+                merge_inputs.extend(['--input', dependency_file_name])
+
+            shard_commands = []
+            size = -(-len(rows) // shards)
+            for shard in range(shards):
+                shard_csv = os.path.join(work_dir, f"shard-{shard}.csv")
+                shard_owl = os.path.join(work_dir, f"shard-{shard}.owl")
+                with open(shard_csv, 'w', newline='') as f:
+                    writer = csv.writer(f, delimiter=',', quotechar='\"', quoting=csv.QUOTE_MINIMAL)
+                    writer.writerows(headers)
+                    writer.writerows(rows[shard * size:(shard + 1) * size])
+
+                robot_cmd = [self.robotcmd, 'merge', *inputs, 'template', '--template', shard_csv,
+                             *self._prefix_options(id_prefixes), '--output', shard_owl]
+                shard_commands.append(" ".join(robot_cmd))
+                merge_inputs.extend(['--input', shard_owl])
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        self._logger.debug(f"Building '{owlFileName}' from {len(rows)} template rows in {shards} shards")
+        merge_command = [self.robotcmd, 'merge', *merge_inputs, '--collapse-import-closure', 'false',
+                         'annotate', '--ontology-iri', ontology_iri, '--output', self._output_path(owlFileName)]
+        return work_dir, label_command, shard_commands, " ".join(merge_command)
+
+    def _failed_shards(self, owlFileName, returncodes: list[int]) -> int:
+        failed = [c for c in returncodes if c != 0]
+        if failed:
+            self._logger.error(f"{len(failed)} of {len(returncodes)} template shards failed for '{owlFileName}'")
+            return failed[0]
+        return 0
+
+    @staticmethod
+    def _write_label_template(file_name: str, headers: list[list[str]], rows: list[list[str]]) -> None:
+        robot_codes = headers[1]
+        columns = [robot_codes.index("ID"), robot_codes.index("LABEL")]
+        with open(file_name, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=',', quotechar='\"', quoting=csv.QUOTE_MINIMAL)
+            for row in headers:
+                writer.writerow([row[i] for i in columns])
+            for row in rows:
+                if len(row) > max(columns) and all(row[i] for i in columns):
+                    writer.writerow([row[i] for i in columns])
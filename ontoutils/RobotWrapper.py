@@ -1,15 +1,95 @@
+import asyncio
+import functools
 import logging
+import os
+import shlex
+import signal
 import subprocess
+import threading
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+from ontoutils.workspace import BuildWorkspace
+
+T = TypeVar('T')
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+# One semaphore per event loop, asyncio primitives can not be shared between loops
+_robot_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_shared_executor() -> ThreadPoolExecutor:
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                                  thread_name_prefix="ontoutils")
+        return _shared_executor
+
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    # ROBOT is usually a shell script starting a JVM, killing only the shell would leave the JVM running
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
 
 
 class RobotWrapper:
     _logger = logging.getLogger(__name__)
 
-    def __init__(self,robotcmd,cleanup=True):
+    blocking_executor: Optional[Executor] = None
+    '''
+    executor running the blocking work of the async methods, e.g. spreadsheet parsing. A bounded thread pool shared
+    by all wrappers if None
+    '''
+
+    max_robot_processes: Optional[int] = os.cpu_count()
+    '''
+    maximum number of ROBOT processes started by the async methods that run at the same time per event loop,
+    unbounded if None
+    '''
+
+    workspace: Optional[BuildWorkspace]
+    '''
+    workspace for intermediate files and staged outputs. Without one they are written to the current directory and
+    outputs are written in place
+    '''
+
+    def __init__(self,robotcmd,cleanup=True,workspace: Optional[BuildWorkspace] = None):
         self.cleanup = cleanup
         self.robotcmd = robotcmd
+        self.workspace = workspace
+
+    def _intermediate_path(self, name: str) -> str:
+        return self.workspace.path(name) if self.workspace is not None else name
+
+    def _output_path(self, file_name: str) -> str:
+        """
+        :return: The path ROBOT should write a final output to, see _publish
+        """
+        return self.workspace.stage(file_name) if self.workspace is not None else file_name
+
+    def _publish(self, file_name: str, returncode: int = 0) -> int:
+        """
+        Moves an output written to _output_path(file_name) to its destination if the command writing it succeeded.
+
+        :return: The return code
+        """
+        if self.workspace is not None and returncode == 0:
+            self.workspace.publish(file_name)
+        return returncode
 
-    def _execute_command(self, command_str, shell_flag=True):
+    def _catalog_options(self) -> list[str]:
+        return self.workspace.catalog_options() if self.workspace is not None else []
+
+    def _execute_command(self, command_str, shell_flag=True) -> int:
         self._logger.debug(f"Executing command: {command_str}")
         Output = subprocess.Popen(command_str,
                 shell=shell_flag,
@@ -20,3 +100,87 @@ class RobotWrapper:
             print(stdout)
         if stderr is not None:
             print(stderr)
+        return Output.returncode
+
+    def _robot_process_slots(self) -> Optional[asyncio.Semaphore]:
+        if self.max_robot_processes is None:
+            return None
+        loop = asyncio.get_running_loop()
+        slots = _robot_slots.get(loop)
+        if slots is None:
+            slots = _robot_slots[loop] = asyncio.Semaphore(self.max_robot_processes)
+        return slots
+
+    async def _execute_command_async(self, command_str, shell_flag=True) -> int:
+        """
+        Runs a command like _execute_command without blocking the event loop.
+
+        If the awaiting task is cancelled the process, and everything it started, is killed before the cancellation
+        propagates.
+
+        :return: The exit code of the command
+        """
+        slots = self._robot_process_slots()
+        if slots is not None:
+            await slots.acquire()
+        try:
+            self._logger.debug(f"Executing command: {command_str}")
+            if shell_flag:
+                process = await asyncio.create_subprocess_shell(command_str, stdout=asyncio.subprocess.PIPE,
+                                                                stderr=asyncio.subprocess.STDOUT,
+                                                                start_new_session=True)
+            else:
+                args = shlex.split(command_str) if isinstance(command_str, str) else command_str
+                process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                               stderr=asyncio.subprocess.STDOUT,
+                                                               start_new_session=True)
+            try:
+                stdout, _ = await process.communicate()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    self._logger.info(f"Cancelled, killing command: {command_str}")
+                    _kill_process_group(process)
+                    await process.wait()
+                raise
+        finally:
+            if slots is not None:
+                slots.release()
+
+        if stdout is not None and len(stdout) > 0:
+            print(stdout)
+        return process.returncode
+
+    async def _run_blocking(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs blocking or CPU bound work, e.g. parsing a spreadsheet, on the blocking executor.
+
+        Cancelling the awaiting task does not interrupt the work, which still runs to completion in the background.
+        The wrapper must not be used otherwise while work mutating it runs.
+        """
+        executor = self.blocking_executor if self.blocking_executor is not None else _get_shared_executor()
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    async def _gather_bounded(factories: Iterable[Callable[[], Awaitable[T]]], limit: Optional[int] = None) -> list[T]:
+        """
+        Awaits the awaitables created by the factories, at most `limit` at a time. If one of them fails, or the
+        awaiting task is cancelled, the others are cancelled too.
+
+        :return: The results in the order of the factories
+        """
+        slots = asyncio.Semaphore(limit) if limit else None
+
+        async def bounded(factory):
+            if slots is None:
+                return await factory()
+            async with slots:
+                return await factory()
+
+        tasks = [asyncio.ensure_future(bounded(f)) for f in factories]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from .RobotImportsWrapper import RobotImportsWrapper
+from .RobotTemplateWrapper import RobotTemplateWrapper
+from .workspace import CATALOG_FILE_NAME, DEFAULT_CACHE_DIR, BuildWorkspace
+
+STAMP_FILE_NAME = ".ontoutils-build.json"
+
+
+class BuildTarget:
+    """
+    One ontology of a build manifest: either built from a class sheet ('workbook') or merged from the external terms
+    listed in an imports sheet ('imports_sheet').
+    """
+    name: str
+    output: str
+    depends_on: list[str]
+    workbook: Optional[str]
+    imports_sheet: Optional[str]
+
+    def __init__(self, name: str, spec: dict, base_dir: str):
+        self.name = name
+        self.spec = spec
+        self.output = os.path.join(base_dir, spec["output"])
+        self.depends_on = list(spec.get("depends_on", []))
+        self.workbook = os.path.join(base_dir, spec["workbook"]) if "workbook" in spec else None
+        self.imports_sheet = os.path.join(base_dir, spec["imports_sheet"]) if "imports_sheet" in spec else None
+        self.shards = spec.get("shards", 1)
+        self.ontology_name = spec.get("ontology_name", name)
+
+        if (self.workbook is None) == (self.imports_sheet is None):
+            raise Exception(f"Target '{name}' needs exactly one of 'workbook' or 'imports_sheet'")
+
+    @property
+    def inputs(self) -> list[str]:
+        return [self.workbook if self.workbook is not None else self.imports_sheet]
+
+
+class BuildManifest:
+    """
+    Declares the ontologies of a project and their dependencies, read from a JSON file:
+
+    {"iri_prefix": "http://humanbehaviourchange.org/ontology/",
+     "id_prefixes": ["BCIO: http://humanbehaviourchange.org/ontology/BCIO_"],
+     "targets": {"external": {"imports_sheet": "External.xlsx", "output": "bcio_external.owl"},
+                 "upper": {"workbook": "Upper.xlsx", "output": "bcio_upper.owl", "depends_on": ["external"]}}}
+
+    Paths are relative to the manifest. The outputs of the dependencies of a class sheet target become owl:imports
+    of its ontology. Optional keys are "robot", the ROBOT command, "cache", the download cache shared by the builds
+    (default 'temp'), and "catalog", the XML catalog resolving imports (default catalog-v001.xml if it exists).
+    """
+    _logger = logging.getLogger(__name__)
+
+    targets: dict[str, BuildTarget]
+
+    def __init__(self, spec: dict, base_dir: str = "."):
+        self.base_dir = base_dir
+        self.robotcmd = spec.get("robot", "robot")
+        self.iri_prefix = spec["iri_prefix"]
+        self.id_prefixes = [f'"{p}"' for p in spec.get("id_prefixes", [])]
+        self.cache_dir = os.path.join(base_dir, spec.get("cache", DEFAULT_CACHE_DIR))
+        self.catalog = os.path.join(base_dir, spec.get("catalog", CATALOG_FILE_NAME))
+        if "catalog" not in spec and not os.path.exists(self.catalog):
+            self.catalog = None
+        self.targets = {name: BuildTarget(name, t, base_dir) for name, t in spec["targets"].items()}
+
+        for target in self.targets.values():
+            for dependency in target.depends_on:
+                if dependency not in self.targets:
+                    raise Exception(f"Target '{target.name}' depends on unknown target '{dependency}'")
+        self.order = self._topological_order()
+
+    @classmethod
+    def load(cls, file_name: str) -> "BuildManifest":
+        with open(file_name) as f:
+            return cls(json.load(f), os.path.dirname(os.path.abspath(file_name)))
+
+    def _topological_order(self) -> list[str]:
+        dependents: dict[str, list[str]] = {name: [] for name in self.targets}
+        missing = {name: len(t.depends_on) for name, t in self.targets.items()}
+        for target in self.targets.values():
+            for dependency in target.depends_on:
+                dependents[dependency].append(target.name)
+
+        order = []
+        ready = [name for name, count in missing.items() if count == 0]
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in dependents[name]:
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(self.targets):
+            cyclic = sorted(name for name, count in missing.items() if count > 0)
+            raise Exception(f"Dependency cycle between targets: {cyclic}")
+        return order
+
+    def ontology_iri(self, target: BuildTarget) -> str:
+        return self.iri_prefix + os.path.basename(target.output)
+
+    def closure(self, names: list[str]) -> set[str]:
+        """
+        :return: The given targets with all their direct and indirect dependencies
+        """
+        result = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in result:
+                result.add(name)
+                stack.extend(self.targets[name].depends_on)
+        return result
+
+
+def _file_digest(file_name: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OntologyBuilder:
+    """
+    Builds the targets of a manifest in dependency order, running independent targets in parallel.
+
+    A target is rebuilt only if its output is missing or if its declaration, its input sheet or the output of one of
+    its dependencies changed since it was last built successfully. The state is kept in a stamp file next to the
+    manifest.
+    """
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, manifest: BuildManifest, max_workers: Optional[int] = None, force: bool = False):
+        self.manifest = manifest
+        self.max_workers = max_workers
+        self.force = force
+        self._stamp_file_name = os.path.join(manifest.base_dir, STAMP_FILE_NAME)
+        self._stamps: dict[str, str] = {}
+        self._stamps_lock = threading.Lock()
+        if os.path.exists(self._stamp_file_name):
+            with open(self._stamp_file_name) as f:
+                self._stamps = json.load(f)
+
+    def _fingerprint(self, target: BuildTarget) -> str:
+        digest = hashlib.sha256(json.dumps(target.spec, sort_keys=True).encode("utf-8"))
+        for file_name in target.inputs:
+            digest.update(_file_digest(file_name).encode("ascii"))
+        for dependency in sorted(target.depends_on):
+            output = self.manifest.targets[dependency].output
+            digest.update(_file_digest(output).encode("ascii") if os.path.exists(output) else b"missing")
+        return digest.hexdigest()
+
+    def is_up_to_date(self, target: BuildTarget) -> bool:
+        return not self.force and os.path.exists(target.output) and \
+            self._stamps.get(target.name) == self._fingerprint(target)
+
+    def _build(self, target: BuildTarget) -> bool:
+        if self.is_up_to_date(target):
+            self._logger.info(f"Target '{target.name}' is up to date")
+            return True
+
+        start = time.perf_counter()
+        if target.workbook is not None:
+            success = self._build_template(target)
+        else:
+            success = self._build_imports(target)
+        self._logger.info(f"Target '{target.name}' {'built' if success else 'FAILED'} "
+                          f"in {time.perf_counter() - start:.2f}s")
+        if success:
+            fingerprint = self._fingerprint(target)
+            with self._stamps_lock:
+                self._stamps[target.name] = fingerprint
+        return success
+
+    def _workspace(self) -> BuildWorkspace:
+        return BuildWorkspace(cache_dir=self.manifest.cache_dir, catalog=self.manifest.catalog)
+
+    def _build_template(self, target: BuildTarget) -> bool:
+        manifest = self.manifest
+        with self._workspace() as workspace:
+            wrapper = RobotTemplateWrapper(manifest.robotcmd, workspace)
+            csv_file_name = workspace.path(os.path.splitext(os.path.basename(target.output))[0] + ".csv")
+            wrapper.add_classes_from_excel(target.workbook, csv_file_name)
+
+            dependency = None
+            if target.depends_on:
+                dependency = ",".join(os.path.basename(manifest.targets[d].output) for d in target.depends_on)
+            returncode = wrapper.createOntologyFromTemplateFile(csv_file_name, dependency, manifest.iri_prefix,
+                                                                manifest.id_prefixes, manifest.ontology_iri(target),
+                                                                target.output, shards=target.shards)
+        return returncode == 0
+
+    def _build_imports(self, target: BuildTarget) -> bool:
+        with self._workspace() as workspace:
+            wrapper = RobotImportsWrapper(self.manifest.robotcmd, workspace=workspace)
+            returncode = wrapper.process_imports_from_excel(target.imports_sheet, self.manifest.ontology_iri(target),
+                                                            target.output, target.ontology_name)
+        return returncode == 0
+
+    def _save_stamps(self) -> None:
+        with self._stamps_lock:
+            stamps = dict(self._stamps)
+        fd, partial = tempfile.mkstemp(prefix=STAMP_FILE_NAME + ".", suffix=".part",
+                                       dir=os.path.dirname(self._stamp_file_name))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(stamps, f, indent=1, sort_keys=True)
+            os.replace(partial, self._stamp_file_name)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def build(self, names: Optional[list[str]] = None) -> dict[str, bool]:
+        """
+        Builds the given targets, with their dependencies, or all targets.
+
+        :return: Whether each target involved is now up to date; targets whose dependencies failed are not built
+        """
+        selected = self.manifest.closure(names) if names else set(self.manifest.targets)
+        waiting = {name: {d for d in self.manifest.targets[name].depends_on} for name in selected}
+        results: dict[str, bool] = {}
+        running: dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit_ready():
+                for name in [n for n, deps in waiting.items() if not deps]:
+                    del waiting[name]
+                    running[executor.submit(self._build, self.manifest.targets[name])] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        self._logger.error(f"Target '{name}' failed: {e}")
+                        results[name] = False
+                    for other, deps in list(waiting.items()):
+                        if name in deps:
+                            if results[name]:
+                                deps.discard(name)
+                            else:
+                                self._logger.error(f"Skipping target '{other}' as its dependency '{name}' failed")
+                                del waiting[other]
+                                results[other] = False
+                submit_ready()
+                self._save_stamps()
+
+        # Targets skipped because of a failure may have dependents still waiting
+        for name in waiting:
+            results[name] = False
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Builds the ontologies declared in a build manifest")
+    parser.add_argument('manifest', help='Build manifest (JSON)')
+    parser.add_argument('targets', nargs='*', help='Targets to build, with their dependencies. All if omitted.')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Maximum number of targets built in parallel')
+    parser.add_argument('--force', '-f', action='store_true', help='Rebuild targets even if they are up to date')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    build_results = OntologyBuilder(BuildManifest.load(args.manifest), args.jobs, args.force).build(args.targets)
+    failed_targets = [n for n, ok in build_results.items() if not ok]
+    if failed_targets:
+        raise SystemExit(f"Failed targets: {failed_targets}")
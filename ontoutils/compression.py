@@ -0,0 +1,168 @@
+import gzip
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+_logger = logging.getLogger(__name__)
+
+GZIP = "gz"
+ZSTD = "zst"
+
+_MAGIC = {GZIP: b"\x1f\x8b", ZSTD: b"\x28\xb5\x2f\xfd"}
+
+
+def compression_of(file_name: str) -> Optional[str]:
+    """
+    :return: The compression implied by the file extension (GZIP, ZSTD), or None
+    """
+    if file_name.endswith("." + GZIP):
+        return GZIP
+    if file_name.endswith("." + ZSTD):
+        return ZSTD
+    return None
+
+
+def partial_file(file_name: str) -> str:
+    """
+    Creates an empty temporary file next to `file_name`, to write it to before it atomically replaces `file_name`.
+    It ends with the compression extension of `file_name`, so that open_compressed writes it alike.
+
+    :return: Path of the temporary file
+    """
+    compression = compression_of(file_name)
+    fd, partial = tempfile.mkstemp(prefix=os.path.basename(file_name) + ".",
+                                   suffix=".part" + (f".{compression}" if compression else ""),
+                                   dir=os.path.dirname(os.path.abspath(file_name)))
+    os.close(fd)
+    return partial
+
+
+def strip_compression_suffix(file_name: str) -> str:
+    compression = compression_of(file_name)
+    return file_name[:-(len(compression) + 1)] if compression is not None else file_name
+
+
+def sniff_compression(head: bytes) -> Optional[str]:
+    """
+    :return: The compression detected from the first bytes of a stream, or None
+    """
+    for compression, magic in _MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("Zstandard compression requires the 'zstandard' package: pip install zstandard")
+    return zstandard
+
+
+def open_compressed(file_name: str, mode: str = "rb", **text_args) -> IO:
+    """
+    Opens a possibly compressed file. When reading, the compression is detected from the content, so a plain file
+    with a compressed extension is still read correctly; when writing, it follows the file extension.
+
+    Data is (de)compressed as it is streamed, the file is never expanded on disk.
+
+    :param file_name: Path of the file
+    :param mode: 'rb', 'wb', 'rt' or 'wt'
+    :param text_args: Passed on in text mode, e.g. encoding or newline
+    """
+    if mode[0] == "r":
+        with open(file_name, "rb") as f:
+            compression = sniff_compression(f.read(4))
+    else:
+        compression = compression_of(file_name)
+
+    if compression == GZIP:
+        return gzip.open(file_name, mode, **text_args)
+    if compression == ZSTD:
+        return _zstandard().open(file_name, mode, **text_args)
+    return open(file_name, mode, **text_args)
+
+
+def copy_compressed(source: IO[bytes], target: IO[bytes], compression: Optional[str]) -> None:
+    """
+    Streams `source` into `target`, compressing it with `compression` unless it is already compressed that way.
+    Sources compressed another way are decompressed on the fly. `target` is left open.
+    """
+    source = source if hasattr(source, "peek") else io.BufferedReader(source)
+    source_compression = sniff_compression(source.peek(4)[:4])
+
+    if source_compression == compression:
+        shutil.copyfileobj(source, target)
+        return
+
+    if source_compression == GZIP:
+        source = gzip.GzipFile(fileobj=source, mode="rb")
+    elif source_compression == ZSTD:
+        source = _zstandard().ZstdDecompressor().stream_reader(source, closefd=False)
+
+    if compression == GZIP:
+        with gzip.GzipFile(fileobj=target, mode="wb") as writer:
+            shutil.copyfileobj(source, writer)
+    elif compression == ZSTD:
+        with _zstandard().ZstdCompressor().stream_writer(target, closefd=False) as writer:
+            shutil.copyfileobj(source, writer)
+    else:
+        shutil.copyfileobj(source, target)
+
+
+def _feed_pipe(file_name: str, pipe: str, compression: Optional[str], stop: threading.Event) -> None:
+    try:
+        # Blocks until a reader opens the pipe
+        with open(pipe, "wb") as out:
+            if stop.is_set():
+                return
+            with open(file_name, "rb") as f:
+                copy_compressed(f, out, compression)
+    except BrokenPipeError:
+        # The reader stopped early
+        pass
+
+
+@contextmanager
+def piped_path(file_name: str, directory: str, compression: Optional[str] = None) -> Iterator[str]:
+    """
+    Makes the content of a file readable with another compression at a path, without writing it to disk. E.g. ROBOT
+    reads gzip but not zstd.
+
+    The path is a named pipe in `directory`, named after the file with the extension of `compression`, into which a
+    thread streams the recompressed content once. The reader must read it in one pass, as ROBOT does for gzipped
+    input. Where named pipes are not available the content is written to a temporary file instead. Either is removed
+    on exit.
+
+    :param compression: Compression of the content at the path, GZIP, ZSTD or None
+    """
+    work_dir = tempfile.mkdtemp(prefix=".piped.", dir=directory)
+    name = os.path.basename(strip_compression_suffix(file_name))
+    path = os.path.join(work_dir, f"{name}.{compression}" if compression is not None else name)
+    try:
+        if not hasattr(os, "mkfifo"):
+            with open(file_name, "rb") as f_in, open(path, "wb") as f_out:
+                copy_compressed(f_in, f_out, compression)
+            yield path
+            return
+
+        os.mkfifo(path)
+        stop = threading.Event()
+        feeder = threading.Thread(target=_feed_pipe, args=(file_name, path, compression, stop), daemon=True)
+        feeder.start()
+        try:
+            yield path
+        finally:
+            stop.set()
+            while feeder.is_alive():
+                # Opening the pipe releases the feeder if it waits for a reader
+                os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+                feeder.join(0.1)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -9,6 +9,7 @@ class OntologyEntity:
         self.comment = None
         self.axioms = None  # May include equivalence axioms
         self.relations = None
+        self.relation_targets = None  # relation id -> target labels as written in REL columns
         self.curation_status = None
         self.logical_definition = None
         self.definition_source = None
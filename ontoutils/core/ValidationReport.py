@@ -0,0 +1,84 @@
+from enum import Enum
+from typing import Iterator, Optional
+
+
+class IssueType(Enum):
+    MISSING_ID = 1
+    MISSING_LABEL = 2
+    MISSING_PARENT = 3
+    DUPLICATE_ID = 4
+    DUPLICATE_LABEL = 5
+    LABEL_SYNONYM_COLLISION = 6
+    DANGLING_PARENT = 7
+    DANGLING_RELATION_TARGET = 8
+    UNKNOWN_RELATION = 9
+    CYCLE = 10
+    OBSOLETE_PARENT = 11
+
+
+class Severity(Enum):
+    ERROR = 1
+    WARNING = 2
+
+
+class ValidationIssue:
+    def __init__(self, issue_type: IssueType, severity: Severity, message: str, entity_id: Optional[str] = None,
+                 label: Optional[str] = None, value: Optional[str] = None, related: Optional[list[str]] = None):
+        self.issue_type = issue_type
+        self.severity = severity
+        self.message = message
+        self.entity_id = entity_id
+        self.label = label
+        self.value = value  # the offending value, e.g. an unresolved parent label
+        self.related = related if related is not None else []
+
+    def to_dict(self) -> dict:
+        return {"type": self.issue_type.name,
+                "severity": self.severity.name,
+                "message": self.message,
+                "entity_id": self.entity_id,
+                "label": self.label,
+                "value": self.value,
+                "related": self.related}
+
+    def __str__(self):
+        return f"{self.severity.name} {self.issue_type.name}: {self.message}"
+
+
+class ValidationReport:
+    issues: list[ValidationIssue]
+
+    def __init__(self):
+        self.issues = []
+
+    def add(self, issue_type: IssueType, severity: Severity, message: str, **kwargs) -> None:
+        self.issues.append(ValidationIssue(issue_type, severity, message, **kwargs))
+
+    @property
+    def errors(self) -> list[ValidationIssue]:
+        return [i for i in self.issues if i.severity == Severity.ERROR]
+
+    @property
+    def warnings(self) -> list[ValidationIssue]:
+        return [i for i in self.issues if i.severity == Severity.WARNING]
+
+    @property
+    def has_errors(self) -> bool:
+        return any(i.severity == Severity.ERROR for i in self.issues)
+
+    def by_type(self, issue_type: IssueType) -> list[ValidationIssue]:
+        return [i for i in self.issues if i.issue_type == issue_type]
+
+    def to_dict(self) -> dict:
+        return {"errors": len(self.errors),
+                "warnings": len(self.warnings),
+                "issues": [i.to_dict() for i in self.issues]}
+
+    def __len__(self):
+        return len(self.issues)
+
+    def __iter__(self) -> Iterator[ValidationIssue]:
+        return iter(self.issues)
+
+    def __str__(self):
+        return "\n".join(str(i) for i in self.issues)
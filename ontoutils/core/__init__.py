@@ -1,7 +1,9 @@
 from .ColumnMapping import *
 from .OntologyEntity import OntologyEntity
 from .OntologyRelation import OntologyRelation
+from .ValidationReport import IssueType, Severity, ValidationIssue, ValidationReport
 
 __all__ = ["ColumnMapping", "OntologyRelation", "OntologyEntity", "get_relationship_mapping", "get_id_mapping",
            "get_parent_mapping", "get_disjoint_mapping", "get_label_mapping", "get_equivalence_mapping",
-           "get_annotation_mapping", "RobotType", "DEFAULT_HEADER_MAPPINGS", "DEFAULT_HEADERS_TO_IGNORE"]
+           "get_annotation_mapping", "RobotType", "DEFAULT_HEADER_MAPPINGS", "DEFAULT_HEADERS_TO_IGNORE",
+           "IssueType", "Severity", "ValidationIssue", "ValidationReport"]
@@ -0,0 +1,178 @@
+import logging
+from array import array
+from typing import Callable, Optional
+
+from .core import OntologyEntity
+from .label_resolver import normalise_label
+
+
+class HierarchyIndex:
+    """
+    Ancestor/descendant closure of the is_a hierarchy, using interval labelling.
+
+    Every class has a single parent, so the hierarchy is a forest. Numbering the classes in depth-first preorder
+    makes each subtree a contiguous range of that order: Y subsumes X iff start[Y] < start[X] < end[Y], and the
+    descendants of Y are order[start[Y] + 1:end[Y]].
+
+    Classes added after the index was built are not numbered but kept as pending leaves under their parent, so adding
+    one is O(1). Queries pay for them instead: is_descendant climbs from a pending class to its first numbered
+    ancestor and descendants tests every pending class, O(p) for p pending classes. The query that finds more than
+    max(64, n / 16) pending classes, or follows an addition that changed the existing structure, first relabels the
+    whole index in O(n). Over a run of additions this amortises to O(16) per added class, but it falls on a read.
+    """
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, entities: list[OntologyEntity], resolve: Callable[[str], Optional[OntologyEntity]]):
+        """
+        :param entities: The classes of the hierarchy
+        :param resolve: Looks up a class by a parent reference, e.g. a label
+        """
+        self._resolve = resolve
+        self.entities: list[OntologyEntity] = []
+        self._handles: dict[int, int] = {}
+        self._parent = array('l')
+        self._unresolved: set[str] = set()  # lowercase parent references that did not resolve
+        for entity in entities:
+            self._append(entity)
+        self._dirty = True
+        self._pending: list[int] = []
+
+    def _append(self, entity: OntologyEntity) -> int:
+        handle = len(self.entities)
+        self.entities.append(entity)
+        self._handles[id(entity)] = handle
+        self._parent.append(-1)
+        return handle
+
+    def _resolve_parents(self) -> None:
+        self._unresolved = set()
+        for handle, entity in enumerate(self.entities):
+            self._parent[handle] = self._parent_handle(entity)
+
+    def _parent_handle(self, entity: OntologyEntity) -> int:
+        if not entity.parent:
+            return -1
+        parent = self._resolve(entity.parent)
+        if parent is None or id(parent) not in self._handles:
+            self._unresolved.add(normalise_label(entity.parent))
+            return -1
+        return self._handles[id(parent)]
+
+    def _rebuild(self) -> None:
+        self._resolve_parents()
+        count = len(self.entities)
+        first_child = array('l', [-1]) * count
+        next_sibling = array('l', [-1]) * count
+        for handle in range(count - 1, -1, -1):
+            parent = self._parent[handle]
+            if parent != -1:
+                next_sibling[handle] = first_child[parent]
+                first_child[parent] = handle
+
+        self._start = array('l', [-1]) * count
+        self._end = array('l', [0]) * count
+        self._order = array('l')
+        roots = [h for h in range(count) if self._parent[h] == -1]
+        # Classes on an is_a cycle are not below any root, they are numbered from an arbitrary member instead
+        for root in roots + list(range(count)):
+            if self._start[root] != -1:
+                continue
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                if node < 0:
+                    self._end[~node] = len(self._order)
+                    continue
+                self._start[node] = len(self._order)
+                self._order.append(node)
+                stack.append(~node)
+                child = first_child[node]
+                while child != -1:
+                    if self._start[child] == -1:
+                        stack.append(child)
+                    child = next_sibling[child]
+
+        self._pending = []
+        self._dirty = False
+        self._logger.debug(f"Built is_a closure index over {count} classes")
+
+    def _ensure_built(self) -> None:
+        if self._dirty or len(self._pending) > max(64, len(self.entities) // 16):
+            self._rebuild()
+
+    def add(self, entity: OntologyEntity) -> None:
+        """
+        Adds a class. A new leaf is attached to the index directly; an addition that can change existing
+        subsumptions, e.g. a class that some existing class named as its parent, invalidates the index.
+        Must be called before the class is added to the lookup used to resolve parents.
+        """
+        if id(entity) in self._handles:
+            return
+        names = [normalise_label(entity.name)] if entity.name is not None else []
+        names.extend(normalise_label(s) for s in entity.synonyms or [])
+        handle = self._append(entity)
+        shadowing = any(self._resolve(n) is not None for n in names)
+        if self._dirty or shadowing or any(n in self._unresolved for n in names):
+            self._dirty = True
+            return
+        self._parent[handle] = self._parent_handle(entity)
+        self._start.append(-1)
+        self._end.append(-1)
+        self._pending.append(handle)
+
+    def handle_of(self, entity: OntologyEntity) -> int:
+        return self._handles[id(entity)]
+
+    def _is_below(self, node: int, ancestor: int) -> bool:
+        # Pending leaves are not numbered, climb to the first numbered ancestor
+        while self._start[node] == -1:
+            node = self._parent[node]
+            if node == ancestor:
+                return True
+            if node == -1:
+                return False
+        if self._start[ancestor] == -1:
+            return False
+        return self._start[ancestor] < self._start[node] < self._end[ancestor]
+
+    def is_descendant(self, entity: OntologyEntity, ancestor: OntologyEntity) -> bool:
+        """
+        :return: Whether `ancestor` is a proper ancestor of `entity`
+        """
+        self._ensure_built()
+        node = self._handles[id(entity)]
+        other = self._handles[id(ancestor)]
+        return node != other and self._is_below(node, other)
+
+    def descendants(self, entity: OntologyEntity) -> list[OntologyEntity]:
+        """
+        :return: All proper descendants of `entity`, in depth-first order
+        """
+        self._ensure_built()
+        node = self._handles[id(entity)]
+        result = []
+        if self._start[node] != -1:
+            result = [self.entities[h] for h in self._order[self._start[node] + 1:self._end[node]]]
+        result.extend(self.entities[h] for h in self._pending if h != node and self._is_below(h, node))
+        return result
+
+    def ancestors(self, entity: OntologyEntity) -> list[OntologyEntity]:
+        """
+        :return: All proper ancestors of `entity`, nearest first, each once even on an is_a cycle
+        """
+        self._ensure_built()
+        result = []
+        seen = {self._handles[id(entity)]}
+        node = self._parent[self._handles[id(entity)]]
+        while node != -1 and node not in seen:
+            seen.add(node)
+            result.append(self.entities[node])
+            node = self._parent[node]
+        return result
+
+    def children(self, entity: OntologyEntity) -> list[OntologyEntity]:
+        """
+        :return: The direct subclasses of `entity`
+        """
+        node = self._handles[id(entity)]
+        return [d for d in self.descendants(entity) if self._parent[self._handles[id(d)]] == node]
@@ -0,0 +1,120 @@
+import logging
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from .core import OntologyEntity
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalise_label(label: str) -> str:
+    """
+    :return: The key of a label or synonym in the label indexes, e.g. RobotTemplateWrapper.all_entity_names
+    """
+    return _whitespace.sub(" ", label.strip().lower())
+
+
+def trigrams(label: str) -> set[str]:
+    padded = f"  {label} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LabelSuggestion:
+    def __init__(self, label: str, entity: OntologyEntity, score: float):
+        self.label = label  # the matched label or synonym
+        self.entity = entity
+        self.score = score
+
+    def __str__(self):
+        return f"{self.label} [{self.entity.id}] ({self.score:.2f})"
+
+
+class LabelResolver:
+    """
+    Resolves free-text references to labels and synonyms, suggesting near-misses for references which do not match
+    exactly.
+
+    Suggestions are looked up in an inverted trigram index, so only names sharing at least one trigram with the
+    reference are ever scored.
+    """
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, names: dict[str, OntologyEntity]):
+        """
+        :param names: Index of normalised labels and synonyms to entities, e.g. RobotTemplateWrapper.all_entity_names
+        """
+        self._names: list[str] = []
+        self._entities: list[OntologyEntity] = []
+        self._gram_counts: list[int] = []
+        self._exact: dict[str, OntologyEntity] = {}
+        self._postings: dict[str, list[int]] = defaultdict(list)
+
+        for name, entity in names.items():
+            key = normalise_label(name)
+            if len(key) == 0 or key in self._exact:
+                continue
+            self._exact[key] = entity
+            handle = len(self._names)
+            self._names.append(key)
+            self._entities.append(entity)
+            grams = trigrams(key)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(handle)
+
+        self._logger.debug(f"Indexed {len(self._names)} names with {len(self._postings)} distinct trigrams")
+
+    @classmethod
+    def from_wrapper(cls, wrapper) -> "LabelResolver":
+        """
+        :param wrapper: A RobotTemplateWrapper with classes loaded
+        """
+        return cls(wrapper.all_entity_names)
+
+    def resolve(self, label: str) -> Optional[OntologyEntity]:
+        return self._exact.get(normalise_label(label))
+
+    def suggest(self, label: str, limit: int = 5, min_score: float = 0.3) -> list[LabelSuggestion]:
+        """
+        Ranks indexed names by trigram similarity (Dice coefficient) to `label`.
+
+        :param label: The reference to look up
+        :param limit: Maximum number of suggestions, at most one per entity
+        :param min_score: Minimum similarity between 0 and 1 for a name to be suggested
+        :return: The suggestions, best first
+        """
+        key = normalise_label(label)
+        if len(key) == 0:
+            return []
+        grams = trigrams(key)
+
+        shared: dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for handle in self._postings.get(gram, ()):
+                shared[handle] += 1
+
+        best: dict[int, tuple[float, int]] = {}
+        for handle, count in shared.items():
+            score = 2 * count / (len(grams) + self._gram_counts[handle])
+            if score < min_score:
+                continue
+            entity_key = id(self._entities[handle])
+            if entity_key not in best or best[entity_key][0] < score:
+                best[entity_key] = (score, handle)
+
+        ranked = sorted(best.values(), key=lambda s: (-s[0], self._names[s[1]]))[:limit]
+        return [LabelSuggestion(self._names[handle], self._entities[handle], score) for score, handle in ranked]
+
+    def suggest_many(self, labels: Iterable[str], limit: int = 5, min_score: float = 0.3) \
+            -> dict[str, list[LabelSuggestion]]:
+        """
+        Suggests names for every reference in `labels` which does not resolve exactly. Each distinct reference is only
+        looked up once.
+        """
+        suggestions = {}
+        for label in labels:
+            if label in suggestions or self.resolve(label) is not None:
+                continue
+            suggestions[label] = self.suggest(label, limit, min_score)
+        return suggestions
@@ -0,0 +1,328 @@
+import logging
+from array import array
+from collections import deque
+from typing import Iterable, Optional
+
+from .lucid_chart import Entity, Relation
+
+
+class _Csr:
+    """
+    Adjacency of one relation type in compressed sparse row form: the targets of node n are
+    targets[offsets[n]:offsets[n + 1]].
+    """
+
+    def __init__(self, node_count: int, edges: list[tuple[int, int]]):
+        counts = array('l', [0]) * (node_count + 1)
+        for source, _ in edges:
+            counts[source + 1] += 1
+        for n in range(node_count):
+            counts[n + 1] += counts[n]
+        self.offsets = counts
+
+        fill = array('l', counts)
+        self.targets = array('l', [0]) * len(edges)
+        for source, target in edges:
+            self.targets[fill[source]] = target
+            fill[source] += 1
+
+    def neighbours(self, node: int):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+
+class CausalGraph:
+    """
+    Compact index of the relations parsed from a LucidChart diagram by ParseLucidChartCsv.
+
+    Entities are numbered 0..n-1, and every relation type keeps its edges as forward and reverse CSR arrays, so
+    traversals never scan the relation list.
+    """
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, entities: dict[str, Entity], relations: list[Relation]):
+        """
+        :param entities: Entities by LucidChart ID as returned by ParseLucidChartCsv.parseCsvEntityData
+        :param relations: Relations as returned by ParseLucidChartCsv.parseCsvEntityData
+        """
+        self.entities: list[Entity] = []
+        self._handles: dict[str, int] = {}
+        for entity in entities.values():
+            self._add_node(entity)
+
+        edges: dict[str, list[tuple[int, int]]] = {}
+        for rel in relations:
+            source = self._add_node(rel.entity1)
+            target = self._add_node(rel.entity2)
+            edges.setdefault(rel.relType, []).append((source, target))
+
+        self.forward: dict[str, _Csr] = {}
+        self.reverse: dict[str, _Csr] = {}
+        for rel_type, rel_edges in edges.items():
+            self.forward[rel_type] = _Csr(len(self.entities), rel_edges)
+            self.reverse[rel_type] = _Csr(len(self.entities), [(t, s) for s, t in rel_edges])
+
+        self._logger.debug(f"Indexed {len(self.entities)} entities and {len(relations)} relations "
+                           f"of {len(edges)} types")
+
+    def _add_node(self, entity: Entity) -> int:
+        handle = self._handles.get(entity.id)
+        if handle is None:
+            handle = len(self.entities)
+            self._handles[entity.id] = handle
+            self.entities.append(entity)
+        return handle
+
+    @property
+    def relation_types(self) -> list[str]:
+        return list(self.forward.keys())
+
+    def handle_of(self, entity_id: str) -> int:
+        return self._handles[entity_id]
+
+    def _adjacency(self, rel_types: Optional[Iterable[str]], reverse: bool) -> list[_Csr]:
+        index = self.reverse if reverse else self.forward
+        if rel_types is None:
+            return list(index.values())
+        return [index[t] for t in rel_types if t in index]
+
+    def _successors(self, adjacency: list[_Csr], node: int):
+        for csr in adjacency:
+            yield from csr.neighbours(node)
+
+    def reachable(self, entity_ids: Iterable[str], rel_types: Optional[Iterable[str]] = None,
+                  reverse: bool = False) -> list[Entity]:
+        """
+        Breadth-first search from several entities at once.
+
+        :param entity_ids: LucidChart IDs of the start entities
+        :param rel_types: Relation types to follow, all if None
+        :param reverse: Follow relations backwards, i.e. find what influences the start entities
+        :return: The entities reachable over at least one relation from a start entity, in breadth-first order. A start
+            entity is only included if it is reachable itself, i.e. from another start entity or over a cycle
+        """
+        adjacency = self._adjacency(rel_types, reverse)
+        seen = bytearray(len(self.entities))
+        queued = bytearray(len(self.entities))
+        queue = deque()
+        for entity_id in entity_ids:
+            start = self._handles[entity_id]
+            if not queued[start]:
+                queued[start] = 1
+                queue.append(start)
+        found = []
+        while queue:
+            node = queue.popleft()
+            for successor in self._successors(adjacency, node):
+                if not seen[successor]:
+                    seen[successor] = 1
+                    found.append(successor)
+                    if not queued[successor]:
+                        queued[successor] = 1
+                        queue.append(successor)
+        return [self.entities[n] for n in found]
+
+    def upstream(self, entity_id: str, rel_types: Optional[Iterable[str]] = None) -> list[Entity]:
+        """
+        :return: All entities that directly or indirectly influence `entity_id`
+        """
+        return self.reachable([entity_id], rel_types, reverse=True)
+
+    def downstream(self, entity_id: str, rel_types: Optional[Iterable[str]] = None) -> list[Entity]:
+        """
+        :return: All entities directly or indirectly influenced by `entity_id`
+        """
+        return self.reachable([entity_id], rel_types)
+
+    def shortest_path(self, from_id: str, to_id: str, rel_types: Optional[Iterable[str]] = None) \
+            -> Optional[list[Entity]]:
+        """
+        :return: The entities on a shortest path from `from_id` to `to_id`, both included, or None if there is none
+        """
+        adjacency = self._adjacency(rel_types, False)
+        start = self._handles[from_id]
+        goal = self._handles[to_id]
+        previous = array('l', [-1]) * len(self.entities)
+        previous[start] = start
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == goal:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(previous[path[-1]])
+                return [self.entities[n] for n in reversed(path)]
+            for successor in self._successors(adjacency, node):
+                if previous[successor] == -1:
+                    previous[successor] = node
+                    queue.append(successor)
+        return None
+
+    def strongly_connected_components(self, rel_types: Optional[Iterable[str]] = None) -> list[list[Entity]]:
+        """
+        Iterative Tarjan's algorithm.
+
+        :return: The strongly connected components, in reverse topological order
+        """
+        adjacency = self._adjacency(rel_types, False)
+        count = len(self.entities)
+        index = array('l', [-1]) * count
+        low = array('l', [0]) * count
+        on_stack = bytearray(count)
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(count):
+            if index[root] != -1:
+                continue
+            work = [(root, self._successors(adjacency, root))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if index[successor] == -1:
+                        index[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = 1
+                        work.append((successor, self._successors(adjacency, successor)))
+                        break
+                    if on_stack[successor]:
+                        low[node] = min(low[node], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component.append(self.entities[member])
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    def cycles(self, rel_types: Optional[Iterable[str]] = None) -> list[list[Entity]]:
+        """
+        :return: The groups of entities lying on a cycle, one per strongly connected component
+        """
+        adjacency = self._adjacency(rel_types, False)
+        result = []
+        for component in self.strongly_connected_components(rel_types):
+            if len(component) > 1:
+                result.append(component)
+            else:
+                node = self._handles[component[0].id]
+                if node in self._successors(adjacency, node):
+                    result.append(component)
+        return result
+
+    def has_cycle(self, rel_types: Optional[Iterable[str]] = None) -> bool:
+        return len(self.cycles(rel_types)) > 0
+
+    def is_reachable(self, from_id: str, to_id: str, rel_types: Optional[Iterable[str]] = None) -> bool:
+        """
+        Breadth-first search from `from_id` that stops as soon as it finds `to_id`.
+
+        :return: Whether `to_id` can be reached over at least one relation from `from_id`
+        """
+        adjacency = self._adjacency(rel_types, False)
+        goal = self._handles[to_id]
+        seen = bytearray(len(self.entities))
+        queue = deque([self._handles[from_id]])
+        while queue:
+            node = queue.popleft()
+            for successor in self._successors(adjacency, node):
+                if successor == goal:
+                    return True
+                if not seen[successor]:
+                    seen[successor] = 1
+                    queue.append(successor)
+        return False
+
+    def transitive_closure(self, rel_types: Optional[Iterable[str]] = None) -> "TransitiveClosure":
+        """
+        :return: The reachability between all entities, for many queries over the same relation types. It is only
+            computed for the entities asked about.
+        """
+        return TransitiveClosure(self, rel_types)
+
+
+class TransitiveClosure:
+    """
+    Reachability over the condensation of a CausalGraph, the DAG of its strongly connected components.
+
+    All entities of a component reach the same components, so reachability is kept once per component, as a bitset
+    (an int) of component numbers. It is computed for a component, and those it reaches, when one of its entities is
+    first asked about.
+    """
+
+    def __init__(self, graph: CausalGraph, rel_types: Optional[Iterable[str]] = None):
+        rel_types = list(rel_types) if rel_types is not None else None
+        adjacency = graph._adjacency(rel_types, False)
+        self._graph = graph
+        self._components = graph.strongly_connected_components(rel_types)
+        self._component_of = array('l', [0]) * len(graph.entities)
+        for c, component in enumerate(self._components):
+            for entity in component:
+                self._component_of[graph.handle_of(entity.id)] = c
+
+        # Components come in reverse topological order, so successor components have lower numbers
+        self._successors: list[list[int]] = []
+        self._cyclic = bytearray(len(self._components))
+        for c, component in enumerate(self._components):
+            successors = set()
+            for entity in component:
+                for successor in graph._successors(adjacency, graph.handle_of(entity.id)):
+                    successors.add(self._component_of[successor])
+            if c in successors:
+                successors.discard(c)
+                self._cyclic[c] = 1
+            self._successors.append(sorted(successors))
+        self._reach: dict[int, int] = {}
+
+    def _component_reach(self, component: int) -> int:
+        reach = self._reach.get(component)
+        if reach is not None:
+            return reach
+
+        # Collect the components reachable from here that are not computed yet, then compute them in topological
+        # order from the bottom
+        pending = {component}
+        stack = [component]
+        while stack:
+            for successor in self._successors[stack.pop()]:
+                if successor not in pending and successor not in self._reach:
+                    pending.add(successor)
+                    stack.append(successor)
+        for c in sorted(pending):
+            reach = 1 << c if self._cyclic[c] else 0
+            for successor in self._successors[c]:
+                reach |= self._reach[successor] | (1 << successor)
+            self._reach[c] = reach
+        return self._reach[component]
+
+    def is_reachable(self, from_id: str, to_id: str) -> bool:
+        """
+        :return: Whether `to_id` can be reached over at least one relation from `from_id`
+        """
+        component = self._component_of[self._graph.handle_of(from_id)]
+        return bool(self._component_reach(component) >> self._component_of[self._graph.handle_of(to_id)] & 1)
+
+    def reachable(self, entity_id: str) -> list[Entity]:
+        """
+        :return: The entities reachable over at least one relation from `entity_id`, by component in topological
+            order. The entity itself is only included if it lies on a cycle.
+        """
+        bits = self._component_reach(self._component_of[self._graph.handle_of(entity_id)])
+        result = []
+        for c in range(len(self._components) - 1, -1, -1):
+            if bits >> c & 1:
+                result.extend(self._components[c])
+        return result
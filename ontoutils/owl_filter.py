@@ -0,0 +1,173 @@
+import logging
+import os
+import xml.sax
+from typing import Iterable, Optional
+from xml.sax.saxutils import XMLGenerator
+
+from .compression import open_compressed, partial_file
+from .owl_reader import OWL_NS, RDF_NS, PrefixMap
+
+_logger = logging.getLogger(__name__)
+
+_RDF = (RDF_NS, "RDF")
+_AXIOM = (OWL_NS, "Axiom")
+_ANNOTATED_SOURCE = (OWL_NS, "annotatedSource")
+_ANNOTATED_PROPERTY = (OWL_NS, "annotatedProperty")
+_RDF_ABOUT = (RDF_NS, "about")
+_RDF_RESOURCE = (RDF_NS, "resource")
+_RDF_TYPE = (RDF_NS, "type")
+
+
+def read_term_file(file_name: str, prefixes: Optional[PrefixMap] = None) -> set[str]:
+    """
+    Reads a ROBOT term file: one IRI or CURIE per line, optionally followed by a comment. Lines starting with '#'
+    are ignored.
+
+    :return: The expanded IRIs
+    """
+    prefixes = prefixes if prefixes is not None else PrefixMap()
+    terms = set()
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+            terms.add(prefixes.expand(line.split()[0]))
+    return terms
+
+
+class NotRdfXml(Exception):
+    """
+    Raised when a well-formed XML document is not RDF/XML, e.g. OWL/XML
+    """
+
+
+class _AnnotationFilter(XMLGenerator):
+    """
+    Copies RDF/XML, dropping every annotation that uses one of the given properties, all annotation axioms about the
+    properties themselves and reified axioms (owl:Axiom) annotating such annotations.
+
+    Only one owl:Axiom element at a time is buffered, everything else is written as it is read.
+    """
+
+    def __init__(self, out, property_iris: set[str]):
+        super().__init__(out, encoding="UTF-8", short_empty_elements=True)
+        self._properties = property_iris
+        self._depth = 0
+        self._skip_depth: Optional[int] = None
+        self._whitespace = ""
+        self._subject_removed = False
+        self._axiom_events: Optional[list] = None
+        self._axiom_removed = False
+        self._axiom_children_removed = 0
+        self.removed = 0
+
+    def _emit(self, method, *args):
+        if self._axiom_events is not None:
+            self._axiom_events.append((method, args))
+        else:
+            method(*args)
+
+    def _flush_whitespace(self):
+        if self._whitespace:
+            self._emit(super().characters, self._whitespace)
+            self._whitespace = ""
+
+    def startElementNS(self, name, qname, attrs):
+        self._depth += 1
+        if self._skip_depth is not None:
+            return
+
+        iri = (name[0] or "") + name[1]
+        if self._depth == 1 and name != _RDF:
+            raise NotRdfXml(f"The root element is {qname}, not rdf:RDF")
+        if self._depth == 2:
+            self._subject_removed = attrs.get(_RDF_ABOUT) in self._properties
+            if name == _AXIOM:
+                # Buffered with its leading whitespace until it is known whether the axiom is kept
+                self._axiom_events = []
+                self._axiom_removed = False
+                self._axiom_children_removed = 0
+        elif self._depth == 3:
+            if iri in self._properties or (self._subject_removed and name != _RDF_TYPE):
+                self._skip_depth = self._depth
+                self._whitespace = ""
+                if self._axiom_events is not None:
+                    # Only counted if the axiom itself is kept
+                    self._axiom_children_removed += 1
+                else:
+                    self.removed += 1
+                return
+            if name in (_ANNOTATED_SOURCE, _ANNOTATED_PROPERTY) and attrs.get(_RDF_RESOURCE) in self._properties:
+                self._axiom_removed = True
+
+        self._flush_whitespace()
+        self._emit(super().startElementNS, name, qname, attrs)
+
+    def endElementNS(self, name, qname):
+        self._depth -= 1
+        if self._skip_depth is not None:
+            if self._depth < self._skip_depth:
+                self._skip_depth = None
+            return
+
+        self._flush_whitespace()
+        self._emit(super().endElementNS, name, qname)
+        if self._depth == 1 and self._axiom_events is not None:
+            events = self._axiom_events
+            self._axiom_events = None
+            if self._axiom_removed:
+                self.removed += 1
+            else:
+                self.removed += self._axiom_children_removed
+                for method, args in events:
+                    method(*args)
+
+    def characters(self, content):
+        if self._skip_depth is not None:
+            return
+        if content.isspace():
+            self._whitespace += content
+            return
+        self._flush_whitespace()
+        self._emit(super().characters, content)
+
+    def ignorableWhitespace(self, content):
+        self.characters(content)
+
+    def endDocument(self):
+        self._flush_whitespace()
+        super().endDocument()
+
+
+def remove_annotation_properties(input_file_name: str, property_iris: Iterable[str],
+                                 output_file_name: Optional[str] = None) -> int:
+    """
+    Removes the annotations using the given properties from an RDF/XML ontology in a single streaming pass.
+
+    The result is written to a temporary file next to the output which then atomically replaces it, so the output is
+    never left half written and may be the input itself. Gzip and zstd compressed files are supported.
+
+    :param input_file_name: Path of the RDF/XML ontology
+    :param property_iris: IRIs of the annotation properties to remove
+    :param output_file_name: Path of the filtered ontology, the input file if None
+    :return: Number of annotations and annotation axioms removed, not counting annotations of removed axioms
+    :raises NotRdfXml: If the root element is not rdf:RDF. The output is left untouched.
+    """
+    output_file_name = output_file_name if output_file_name is not None else input_file_name
+    parser = xml.sax.make_parser()
+    parser.setFeature(xml.sax.handler.feature_namespaces, True)
+    parser.setFeature(xml.sax.handler.feature_external_ges, False)
+    partial = partial_file(output_file_name)
+    try:
+        with open_compressed(input_file_name) as f_in, open_compressed(partial, "wb") as f_out:
+            handler = _AnnotationFilter(f_out, set(property_iris))
+            parser.setContentHandler(handler)
+            parser.parse(f_in)
+        os.replace(partial, output_file_name)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    _logger.debug(f"Removed {handler.removed} annotations from '{input_file_name}'")
+    return handler.removed
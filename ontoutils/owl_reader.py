@@ -0,0 +1,273 @@
+import logging
+import xml.etree.ElementTree as ET
+from typing import Iterator, Optional
+
+from ontoutils.compression import open_compressed
+
+_logger = logging.getLogger(__name__)
+
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS_NS = "http://www.w3.org/2000/01/rdf-schema#"
+OWL_NS = "http://www.w3.org/2002/07/owl#"
+OBO_NS = "http://purl.obolibrary.org/obo/"
+
+RDF_ABOUT = f"{{{RDF_NS}}}about"
+RDF_RESOURCE = f"{{{RDF_NS}}}resource"
+RDF_TYPE = f"{RDF_NS}type"
+RDFS_LABEL = f"{RDFS_NS}label"
+RDFS_SUBCLASS_OF = f"{RDFS_NS}subClassOf"
+
+KNOWN_PREFIXES = {"rdf": RDF_NS, "rdfs": RDFS_NS, "owl": OWL_NS, "obo": OBO_NS,
+                  "oboInOwl": "http://www.geneontology.org/formats/oboInOwl#",
+                  "dc": "http://purl.org/dc/elements/1.1/", "dcterms": "http://purl.org/dc/terms/",
+                  "skos": "http://www.w3.org/2004/02/skos/core#"}
+
+
+def _iri_of_tag(tag: str) -> str:
+    # ElementTree writes qualified names as {namespace}local
+    return tag[1:].replace("}", "", 1) if tag.startswith("{") else tag
+
+
+class OwlResource:
+    """
+    A named resource described at the top level of an RDF/XML ontology, e.g. an owl:Class.
+    """
+
+    def __init__(self, iri: Optional[str], types: list[str]):
+        self.iri = iri
+        self.types = types
+        self.annotations: dict[str, list[str]] = {}  # property IRI -> literal or IRI values
+        self.iri_values: set[tuple[str, str]] = set()  # (property IRI, value) of the annotations with IRI values
+        self.parents: list[str] = []  # named superclasses
+        self.restrictions: list[tuple[str, str]] = []  # (property IRI, filler IRI) of 'some' superclasses
+        self.unsupported: list[str] = []  # IRIs of constructs not captured above
+
+    @property
+    def label(self) -> Optional[str]:
+        labels = self.annotations.get(RDFS_LABEL)
+        return labels[0] if labels else None
+
+    def is_a(self, type_iri: str) -> bool:
+        return type_iri in self.types
+
+    def merge(self, other: "OwlResource") -> None:
+        """
+        Adds what another description of the same resource says about it, e.g. an rdf:Description elsewhere
+        """
+        self.types.extend(t for t in other.types if t not in self.types)
+        for prop, values in other.annotations.items():
+            existing = self.annotations.setdefault(prop, [])
+            existing.extend(v for v in values if v not in existing)
+        self.iri_values.update(other.iri_values)
+        self.parents.extend(p for p in other.parents if p not in self.parents)
+        self.restrictions.extend(r for r in other.restrictions if r not in self.restrictions)
+        self.unsupported.extend(other.unsupported)
+
+
+class OwlDocument:
+    """
+    The named resources of an RDF/XML ontology, indexed by IRI.
+    """
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        self.ontology_iri: Optional[str] = None
+        self.imports: list[str] = []
+        self.resources: dict[str, OwlResource] = {}
+        self._children: Optional[dict[str, list[str]]] = None
+
+    def add(self, resource: OwlResource) -> None:
+        if resource.is_a(f"{OWL_NS}Ontology"):
+            self.ontology_iri = resource.iri
+            self.imports.extend(resource.annotations.get(f"{OWL_NS}imports", []))
+            return
+        if resource.iri is None:
+            return
+        existing = self.resources.get(resource.iri)
+        if existing is None:
+            self.resources[resource.iri] = resource
+        else:
+            # The same resource may be described in several places, e.g. by rdf:Description
+            existing.merge(resource)
+        self._children = None
+
+    def children(self, iri: str) -> list[str]:
+        if self._children is None:
+            self._children = {}
+            for resource in self.resources.values():
+                for parent in resource.parents:
+                    self._children.setdefault(parent, []).append(resource.iri)
+        return self._children.get(iri, [])
+
+    def descendants(self, iri: str) -> list[str]:
+        """
+        :return: `iri` followed by all its named subclasses, each once
+        """
+        seen = {iri}
+        result = [iri]
+        stack = [iri]
+        while stack:
+            for child in self.children(stack.pop()):
+                if child not in seen:
+                    seen.add(child)
+                    result.append(child)
+                    stack.append(child)
+        return result
+
+    def label_of(self, iri: str) -> Optional[str]:
+        resource = self.resources.get(iri)
+        return resource.label if resource is not None else None
+
+
+def _parse_resource(elem: ET.Element) -> OwlResource:
+    types = [] if elem.tag == f"{{{RDF_NS}}}Description" else [_iri_of_tag(elem.tag)]
+    resource = OwlResource(elem.get(RDF_ABOUT), types)
+
+    for child in elem:
+        prop = _iri_of_tag(child.tag)
+        target = child.get(RDF_RESOURCE)
+
+        if prop == RDF_TYPE and target is not None:
+            resource.types.append(target)
+        elif prop == RDFS_SUBCLASS_OF:
+            if target is not None:
+                resource.parents.append(target)
+                continue
+            restriction = _parse_some_restriction(child)
+            if restriction is not None:
+                resource.restrictions.append(restriction)
+            else:
+                resource.unsupported.append(prop)
+        elif len(child) > 0:
+            # Nested descriptions such as class expressions
+            resource.unsupported.append(prop)
+        elif target is not None:
+            resource.annotations.setdefault(prop, []).append(target)
+            resource.iri_values.add((prop, target))
+        else:
+            resource.annotations.setdefault(prop, []).append(child.text or "")
+
+    return resource
+
+
+def _parse_some_restriction(elem: ET.Element) -> Optional[tuple[str, str]]:
+    if len(elem) != 1 or elem[0].tag != f"{{{OWL_NS}}}Restriction":
+        return None
+    on_property = None
+    filler = None
+    for part in elem[0]:
+        if part.tag == f"{{{OWL_NS}}}onProperty":
+            on_property = part.get(RDF_RESOURCE)
+        elif part.tag == f"{{{OWL_NS}}}someValuesFrom":
+            filler = part.get(RDF_RESOURCE)
+        else:
+            return None
+    if on_property is None or filler is None:
+        return None
+    return on_property, filler
+
+
+def iter_resources(source) -> Iterator[OwlResource]:
+    """
+    Streams the top-level resources of an RDF/XML ontology, holding only one resource in memory at a time.
+
+    :param source: File name, possibly of a gzip or zstd compressed file, or binary file object
+    """
+    if isinstance(source, str):
+        with open_compressed(source) as f:
+            yield from iter_resources(f)
+        return
+
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if depth == 0:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            yield _parse_resource(elem)
+            root.clear()
+
+
+def repeated_resources(source) -> dict[str, int]:
+    """
+    Finds the resources described by more than one top-level element, without parsing the descriptions.
+
+    :param source: File name, possibly of a gzip or zstd compressed file, or binary file object
+    :return: The IRIs of these resources and the number of elements describing each
+    """
+    if isinstance(source, str):
+        with open_compressed(source) as f:
+            return repeated_resources(f)
+
+    counts: dict[str, int] = {}
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if depth == 0:
+                root = elem
+            elif depth == 1 and elem.tag != f"{{{OWL_NS}}}Ontology" and elem.get(RDF_ABOUT) is not None:
+                counts[elem.get(RDF_ABOUT)] = counts.get(elem.get(RDF_ABOUT), 0) + 1
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1:
+            root.clear()
+    return {iri: count for iri, count in counts.items() if count > 1}
+
+
+def read_ontology(source) -> OwlDocument:
+    """
+    Reads the named resources of an RDF/XML ontology.
+
+    :param source: File name, possibly of a gzip or zstd compressed file, or binary file object
+    """
+    document = OwlDocument()
+    for resource in iter_resources(source):
+        document.add(resource)
+    _logger.debug(f"Read {len(document.resources)} resources from '{source}'")
+    return document
+
+
+class PrefixMap:
+    """
+    Converts between IRIs and CURIEs using ROBOT style prefix declarations ("BCIO: http://...").
+    """
+
+    def __init__(self, prefixes: Optional[list[str]] = None):
+        self._prefixes: dict[str, str] = dict(KNOWN_PREFIXES)
+        for declaration in prefixes or []:
+            self.add(declaration)
+
+    def add(self, declaration: str) -> None:
+        declaration = declaration.strip().strip('"').strip("'")
+        prefix, iri = declaration.split(":", 1)
+        self._prefixes[prefix.strip()] = iri.strip()
+
+    def expand(self, curie: str) -> str:
+        if curie.startswith("<") and curie.endswith(">"):
+            return curie[1:-1]
+        if ":" in curie:
+            prefix, local = curie.split(":", 1)
+            if prefix in self._prefixes:
+                return self._prefixes[prefix] + local
+            if not local.startswith("//"):
+                return OBO_NS + prefix + "_" + local
+        return curie
+
+    def shorten(self, iri: str) -> str:
+        best = None
+        for prefix, namespace in self._prefixes.items():
+            if iri.startswith(namespace) and prefix != "obo" and (best is None or len(namespace) > len(best[1])):
+                best = (prefix, namespace)
+        if best is not None:
+            return best[0] + ":" + iri[len(best[1]):]
+        if iri.startswith(OBO_NS) and "_" in iri[len(OBO_NS):]:
+            return iri[len(OBO_NS):].replace("_", ":", 1)
+        return iri
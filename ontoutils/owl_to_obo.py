@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import tempfile
+from contextlib import nullcontext
+from typing import IO, Optional
+
+from .compression import open_compressed, partial_file
+from .owl_reader import OBO_NS, OWL_NS, RDF_NS, RDFS_NS, RDFS_LABEL, OwlResource, PrefixMap, iter_resources, \
+    repeated_resources
+
+_logger = logging.getLogger(__name__)
+
+OBO_IN_OWL_NS = "http://www.geneontology.org/formats/oboInOwl#"
+
+_DEFINITION = OBO_NS + "IAO_0000115"
+_COMMENT = RDFS_NS + "comment"
+_DEPRECATED = OWL_NS + "deprecated"
+_XREF = OBO_IN_OWL_NS + "hasDbXref"
+_SUBPROPERTY_OF = RDFS_NS + "subPropertyOf"
+_DOMAIN = RDFS_NS + "domain"
+_RANGE = RDFS_NS + "range"
+_INVERSE_OF = OWL_NS + "inverseOf"
+_TRANSITIVE = OWL_NS + "TransitiveProperty"
+
+# Synonym annotation properties and their OBO scope
+_SYNONYMS = {OBO_NS + "IAO_0000118": "RELATED",
+             OBO_IN_OWL_NS + "hasExactSynonym": "EXACT",
+             OBO_IN_OWL_NS + "hasRelatedSynonym": "RELATED",
+             OBO_IN_OWL_NS + "hasBroadSynonym": "BROAD",
+             OBO_IN_OWL_NS + "hasNarrowSynonym": "NARROW"}
+_JSON_SYNONYM_PREDICATES = {"EXACT": "hasExactSynonym", "RELATED": "hasRelatedSynonym",
+                            "BROAD": "hasBroadSynonym", "NARROW": "hasNarrowSynonym"}
+
+# Annotations written by the tags of a stanza rather than as property_value
+_MAPPED = {RDFS_LABEL, _DEFINITION, _COMMENT, _DEPRECATED, _XREF, *_SYNONYMS}
+_TYPEDEF_STRUCTURE = {_SUBPROPERTY_OF, _DOMAIN, _RANGE, _INVERSE_OF}
+
+
+class UnsupportedConstruct(Exception):
+    """
+    Raised when the ontology contains something the streaming converter cannot express in OBO
+    """
+
+
+def _escape(value: str, special: str = "!{") -> str:
+    """
+    Escapes a tag value, which would otherwise end at a line break, or for unquoted values at a '!' comment or at
+    '{' trailing qualifiers.
+    """
+    value = value.replace("\\", "\\\\").replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+    for c in special:
+        value = value.replace(c, "\\" + c)
+    return value
+
+
+def _quote(value: str) -> str:
+    return '"' + _escape(value, '"') + '"'
+
+
+def _obo_ontology_id(iri: str) -> str:
+    name = iri.rstrip("/").rsplit("/", 1)[-1]
+    return name[:-4] if name.endswith(".owl") else name
+
+
+class _Converter:
+    def __init__(self, obo: IO[str], graph: Optional[IO[str]], edges: Optional[IO[str]], prefixes: PrefixMap,
+                 repeated: dict[str, int]):
+        self._obo = obo
+        self._graph = graph
+        self._edges = edges
+        self._prefixes = prefixes
+        self._header_written = False
+        self._first_node = True
+        self._first_edge = True
+        self.stanzas = 0
+        # Resources described in several places are merged and written once their last description is read
+        self._repeated = dict(repeated)
+        self._pending: dict[str, OwlResource] = {}
+
+    def _id(self, iri: str) -> str:
+        return self._prefixes.shorten(iri)
+
+    def _write_header(self, ontology_iri: Optional[str]) -> None:
+        self._obo.write("format-version: 1.2\n")
+        if ontology_iri is not None:
+            self._obo.write(f"ontology: {_obo_ontology_id(ontology_iri)}\n")
+        if self._graph is not None:
+            self._graph.write('{"graphs": [{"id": ' + json.dumps(ontology_iri or "") + ', "nodes": [')
+        self._header_written = True
+
+    def add(self, resource: OwlResource) -> None:
+        if resource.iri in self._repeated and not resource.is_a(OWL_NS + "Ontology"):
+            pending = self._pending.setdefault(resource.iri, resource)
+            if pending is not resource:
+                pending.merge(resource)
+            self._repeated[resource.iri] -= 1
+            if self._repeated[resource.iri] > 0:
+                return
+            resource = self._pending.pop(resource.iri)
+
+        if resource.is_a(OWL_NS + "Ontology"):
+            if self._header_written:
+                raise UnsupportedConstruct("ontology header after the first term")
+            if resource.annotations.get(OWL_NS + "imports"):
+                raise UnsupportedConstruct("owl:imports")
+            self._write_header(resource.iri)
+            return
+        if not self._header_written:
+            self._write_header(None)
+
+        if resource.unsupported:
+            raise UnsupportedConstruct(f"{resource.unsupported[0]} on {resource.iri}")
+        if resource.is_a(OWL_NS + "Class"):
+            self._term(resource)
+        elif resource.is_a(OWL_NS + "ObjectProperty"):
+            self._typedef(resource, metadata=False)
+        elif resource.is_a(OWL_NS + "AnnotationProperty"):
+            self._typedef(resource, metadata=True)
+        else:
+            raise UnsupportedConstruct(f"{resource.types} {resource.iri}")
+
+    def _common_tags(self, resource: OwlResource, lines: list[str], meta: dict) -> None:
+        annotations = resource.annotations
+        for definition in annotations.get(_DEFINITION, [])[:1]:
+            lines.append(f"def: {_quote(definition)} []")
+            meta["definition"] = {"val": definition}
+        for comment in annotations.get(_COMMENT, [])[:1]:
+            lines.append(f"comment: {_escape(comment)}")
+            meta["comments"] = [comment]
+        for prop, scope in _SYNONYMS.items():
+            for synonym in annotations.get(prop, []):
+                lines.append(f"synonym: {_quote(synonym)} {scope} []")
+                meta.setdefault("synonyms", []).append({"pred": _JSON_SYNONYM_PREDICATES[scope], "val": synonym})
+        for xref in annotations.get(_XREF, []):
+            lines.append(f"xref: {_escape(xref)}")
+            meta.setdefault("xrefs", []).append({"val": xref})
+        for prop, values in annotations.items():
+            if prop in _MAPPED or prop in _TYPEDEF_STRUCTURE:
+                continue
+            if prop.startswith(OWL_NS) or prop.startswith(RDF_NS):
+                raise UnsupportedConstruct(f"{prop} on {resource.iri}")
+            for value in values:
+                if (prop, value) in resource.iri_values:
+                    lines.append(f"property_value: {self._id(prop)} {self._id(value)}")
+                else:
+                    lines.append(f"property_value: {self._id(prop)} {_quote(value)} xsd:string")
+                meta.setdefault("basicPropertyValues", []).append({"pred": prop, "val": value})
+        if "true" in annotations.get(_DEPRECATED, []):
+            lines.append("is_obsolete: true")
+            meta["deprecated"] = True
+
+    def _term(self, resource: OwlResource) -> None:
+        lines = ["[Term]", f"id: {self._id(resource.iri)}"]
+        if resource.label is not None:
+            lines.append(f"name: {_escape(resource.label)}")
+        meta = {}
+        self._common_tags(resource, lines, meta)
+        for parent in resource.parents:
+            lines.append(f"is_a: {self._id(parent)}")
+            self._edge(resource.iri, "is_a", parent)
+        for prop, filler in resource.restrictions:
+            lines.append(f"relationship: {self._id(prop)} {self._id(filler)}")
+            self._edge(resource.iri, prop, filler)
+        self._stanza(lines, resource, "CLASS", meta)
+
+    def _typedef(self, resource: OwlResource, metadata: bool) -> None:
+        if resource.parents or resource.restrictions:
+            raise UnsupportedConstruct(f"subClassOf on property {resource.iri}")
+        lines = ["[Typedef]", f"id: {self._id(resource.iri)}"]
+        if resource.label is not None:
+            lines.append(f"name: {_escape(resource.label)}")
+        meta = {}
+        self._common_tags(resource, lines, meta)
+        annotations = resource.annotations
+        for domain in annotations.get(_DOMAIN, []):
+            lines.append(f"domain: {self._id(domain)}")
+        for range_ in annotations.get(_RANGE, []):
+            lines.append(f"range: {self._id(range_)}")
+        for inverse in annotations.get(_INVERSE_OF, []):
+            lines.append(f"inverse_of: {self._id(inverse)}")
+        for parent in annotations.get(_SUBPROPERTY_OF, []):
+            lines.append(f"is_a: {self._id(parent)}")
+            self._edge(resource.iri, "is_a", parent)
+        if resource.is_a(_TRANSITIVE):
+            lines.append("is_transitive: true")
+        if metadata:
+            lines.append("is_metadata_tag: true")
+        self._stanza(lines, resource, "PROPERTY", meta)
+
+    def _stanza(self, lines: list[str], resource: OwlResource, node_type: str, meta: dict) -> None:
+        self._obo.write("\n" + "\n".join(lines) + "\n")
+        self.stanzas += 1
+        if self._graph is not None:
+            node = {"id": resource.iri, "type": node_type}
+            if resource.label is not None:
+                node["lbl"] = resource.label
+            if meta:
+                node["meta"] = meta
+            self._graph.write(("" if self._first_node else ",") + "\n" + json.dumps(node))
+            self._first_node = False
+
+    def _edge(self, subject: str, predicate: str, obj: str) -> None:
+        if self._edges is not None:
+            self._edges.write(("" if self._first_edge else ",") + "\n" +
+                              json.dumps({"sub": subject, "pred": predicate, "obj": obj}))
+            self._first_edge = False
+
+    def finish(self) -> None:
+        if not self._header_written:
+            self._write_header(None)
+        if self._graph is not None:
+            self._graph.write('], "edges": [')
+            self._edges.seek(0)
+            for chunk in iter(lambda: self._edges.read(1 << 16), ""):
+                self._graph.write(chunk)
+            self._graph.write("]}]}\n")
+
+
+def convert_to_obo(owl_file_name: str, obo_file_name: str, json_file_name: Optional[str] = None,
+                   prefixes: Optional[PrefixMap] = None) -> int:
+    """
+    Converts a simple RDF/XML ontology - classes with annotations, named superclasses and existential restrictions,
+    object and annotation properties - to OBO, and optionally OBO Graphs JSON, in one streaming pass.
+
+    Stanzas are written as the resources are read, in document order, so memory use does not grow with the size of
+    the ontology. A resource described in several places is written once, at its last description, which takes a
+    first pass over the file to find these. Outputs are only replaced once the conversion succeeded.
+
+    :param owl_file_name: Path of the RDF/XML ontology, possibly compressed
+    :param obo_file_name: Path of the OBO output
+    :param json_file_name: Optional path of an OBO Graphs JSON output
+    :param prefixes: Prefixes used to shorten IRIs to OBO IDs, OBO PURLs are always shortened
+    :return: The number of stanzas written
+    :raises UnsupportedConstruct: If the ontology contains anything else, e.g. owl:Axiom annotations or equivalences
+    """
+    outputs = [obo_file_name] + ([json_file_name] if json_file_name is not None else [])
+    partials = []
+    try:
+        partials.extend(partial_file(f) for f in outputs)
+        with open_compressed(partials[0], "wt", encoding="utf-8") as obo, \
+                (open_compressed(partials[1], "wt", encoding="utf-8") if json_file_name else nullcontext()) as graph, \
+                (tempfile.TemporaryFile("w+", encoding="utf-8") if json_file_name else nullcontext()) as edges:
+            converter = _Converter(obo, graph, edges, prefixes if prefixes is not None else PrefixMap(),
+                                   repeated_resources(owl_file_name))
+            for resource in iter_resources(owl_file_name):
+                converter.add(resource)
+            converter.finish()
+        for partial, output in zip(partials, outputs):
+            os.replace(partial, output)
+    finally:
+        for partial in partials:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    _logger.debug(f"Converted {converter.stanzas} stanzas of '{owl_file_name}' to OBO")
+    return converter.stanzas
+
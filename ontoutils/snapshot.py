@@ -0,0 +1,171 @@
+import io
+import json
+import logging
+import os
+import pickle
+import struct
+import tempfile
+from typing import Optional
+
+from .RobotTemplateWrapper import RobotTemplateWrapper
+from .core import OntologyEntity
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"ONTOSNAP"
+SNAPSHOT_FORMAT_VERSION = 3
+
+_STATE_ATTRIBUTES = ("entities", "all_rel_names", "all_rel_ids", "header_mapping", "ignored_headers")
+
+# Derived from the classes, unpickled on first access
+_INDEX_ATTRIBUTES = ("all_entity_names", "all_entity_ids", "parents_to_children")
+
+# magic, format version, length of the JSON header that follows
+_PREAMBLE = struct.Struct(f"<{len(SNAPSHOT_MAGIC)}sHI")
+
+
+def _source_stamps(source_files: list[str]) -> list[dict]:
+    stamps = []
+    for file_name in source_files:
+        stat = os.stat(file_name)
+        stamps.append({"path": os.path.abspath(file_name), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+    return stamps
+
+
+class _IndexPickler(pickle.Pickler):
+    """
+    Pickles classes in the indexes as their position in the class list, which is pickled separately
+    """
+
+    def __init__(self, file, entities: list[OntologyEntity]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._positions = {id(entity): i for i, entity in enumerate(entities)}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, OntologyEntity):
+            return self._positions.get(id(obj))
+        return None
+
+
+class _IndexUnpickler(pickle.Unpickler):
+    def __init__(self, file, entities: list[OntologyEntity]):
+        super().__init__(file)
+        self._entities = entities
+
+    def persistent_load(self, pid):
+        return self._entities[pid]
+
+
+class _RestoredTemplateWrapper(RobotTemplateWrapper):
+    """
+    A wrapper restored from a snapshot, which unpickles the indexes of its classes when one is first used
+    """
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet
+        pickled_indexes = self.__dict__.get("_pickled_indexes")
+        if name not in _INDEX_ATTRIBUTES or pickled_indexes is None:
+            raise AttributeError(name)
+        indexes = _IndexUnpickler(io.BytesIO(pickled_indexes), self.entities).load()
+        del self._pickled_indexes
+        for attribute in _INDEX_ATTRIBUTES:
+            setattr(self, attribute, indexes[attribute])
+        return indexes[name]
+
+
+def save_snapshot(wrapper: RobotTemplateWrapper, file_name: str, source_files: Optional[list[str]] = None) -> None:
+    """
+    Saves the parsed state of a wrapper: classes, relations, header mappings and all indexes.
+
+    :param wrapper: The wrapper to save
+    :param file_name: Path of the snapshot file
+    :param source_files: Spreadsheets the state was parsed from. The snapshot is stale once any of them changes.
+    """
+    state = pickle.dumps({attribute: getattr(wrapper, attribute) for attribute in _STATE_ATTRIBUTES},
+                         protocol=pickle.HIGHEST_PROTOCOL)
+    indexes = io.BytesIO()
+    _IndexPickler(indexes, wrapper.entities).dump({attribute: getattr(wrapper, attribute)
+                                                   for attribute in _INDEX_ATTRIBUTES})
+    header = json.dumps({"sources": _source_stamps(source_files or []), "state_length": len(state)}).encode("utf-8")
+
+    fd, partial = tempfile.mkstemp(prefix=os.path.basename(file_name) + ".", suffix=".part",
+                                   dir=os.path.dirname(os.path.abspath(file_name)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(state)
+            f.write(indexes.getbuffer())
+        os.replace(partial, file_name)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    _logger.debug(f"Saved snapshot of {len(wrapper.entities)} classes to '{file_name}'")
+
+
+def _read_header(f) -> Optional[dict]:
+    preamble = f.read(_PREAMBLE.size)
+    if len(preamble) < _PREAMBLE.size:
+        return None
+    magic, version, header_length = _PREAMBLE.unpack(preamble)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return json.loads(f.read(header_length).decode("utf-8"))
+
+
+def is_snapshot_current(file_name: str) -> bool:
+    """
+    Checks, without loading the state, that a snapshot exists, has the current format and that none of the files it
+    was parsed from changed since.
+    """
+    if not os.path.exists(file_name):
+        return False
+    with open(file_name, 'rb') as f:
+        header = _read_header(f)
+    if header is None:
+        _logger.info(f"Snapshot '{file_name}' has an unsupported format")
+        return False
+
+    for source in header["sources"]:
+        try:
+            stat = os.stat(source["path"])
+        except FileNotFoundError:
+            return False
+        if stat.st_size != source["size"] or stat.st_mtime_ns != source["mtime_ns"]:
+            _logger.info(f"Snapshot '{file_name}' is stale: '{source['path']}' changed")
+            return False
+    return True
+
+
+def load_snapshot(file_name: str, robotcmd: str, check_sources: bool = True) -> Optional[RobotTemplateWrapper]:
+    """
+    Restores a wrapper from a snapshot. The classes, relations and header mappings are unpickled straight from the
+    file, the label, id and parent indexes only when first used. Snapshots are pickles, only load snapshots you
+    created yourself.
+
+    :param file_name: Path of the snapshot file
+    :param robotcmd: ROBOT command of the restored wrapper
+    :param check_sources: Treat the snapshot as stale if its source files changed. Disable to restore an old version,
+        e.g. to diff against.
+    :return: The restored wrapper, or None if the snapshot is missing, of another format version or stale
+    """
+    if check_sources and not is_snapshot_current(file_name):
+        return None
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, 'rb') as f:
+        header = _read_header(f)
+        if header is None:
+            return None
+        state = pickle.loads(f.read(header["state_length"]))
+        pickled_indexes = f.read()
+
+    wrapper = _RestoredTemplateWrapper(robotcmd)
+    for attribute in _STATE_ATTRIBUTES:
+        setattr(wrapper, attribute, state[attribute])
+    for attribute in _INDEX_ATTRIBUTES:
+        delattr(wrapper, attribute)
+    wrapper._pickled_indexes = pickled_indexes
+    _logger.debug(f"Restored snapshot of {len(wrapper.entities)} classes from '{file_name}'")
+    return wrapper
@@ -0,0 +1,65 @@
+import csv
+import logging
+from typing import Optional
+
+from ontoutils.compression import open_compressed, strip_compression_suffix
+
+_logger = logging.getLogger(__name__)
+
+EXPORT_SPLIT = "; "
+
+# OntologyEntity attributes holding the annotations written by the class templates, by property CURIE and label
+ENTITY_ANNOTATION_FIELDS = {"IAO:0000115": "definition",
+                            "IAO:0000118": "synonyms",
+                            "IAO:0000112": "examples",
+                            "IAO:0000119": "definition_source",
+                            "IAO:0000232": "curator_note",
+                            "IAO:0000078": "curation_status",
+                            "rdfs:comment": "comment"}
+ENTITY_ANNOTATION_LABELS = {"definition": "IAO:0000115",
+                            "alternative term": "IAO:0000118",
+                            "example of usage": "IAO:0000112",
+                            "definition source": "IAO:0000119",
+                            "curator note": "IAO:0000232",
+                            "has curation status": "IAO:0000078",
+                            "comment": "rdfs:comment"}
+
+
+def split_headers(export_csv_headers: str) -> list[str]:
+    return [h.strip() for h in export_csv_headers.split("|")]
+
+
+def sort_rows(headers: list[str], rows: list[list[str]], export_sort: Optional[str] = None) -> list[list[str]]:
+    """
+    Sorts export rows as ROBOT export does: by the '|' separated columns in `export_sort`, or by the first column.
+    A column prefixed with '*' is sorted in reverse.
+    """
+    columns = split_headers(export_sort) if export_sort else [headers[0]]
+    for column in reversed(columns):
+        reverse = column.startswith("*")
+        name = column.lstrip("*").strip()
+        if name not in headers:
+            raise Exception(f"Sort column '{name}' is not one of the export headers: {headers}")
+        index = headers.index(name)
+        rows = sorted(rows, key=lambda r: r[index], reverse=reverse)
+    return rows
+
+
+def write_export(output_file_name: str, headers: list[str], rows: list[list[str]],
+                 export_sort: Optional[str] = None) -> None:
+    """
+    Writes rows of an export table. The delimiter follows the file extension: tab for .tsv, comma otherwise. Tables
+    with a further .gz or .zst extension are compressed.
+    """
+    rows = sort_rows(headers, rows, export_sort)
+    delimiter = '\t' if strip_compression_suffix(output_file_name).endswith(".tsv") else ','
+    with open_compressed(output_file_name, 'wt', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter, quotechar='\"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    _logger.debug(f"Wrote {len(rows)} rows to '{output_file_name}'")
+
+
+def is_table_export(output_file_name: str) -> bool:
+    output_file_name = strip_compression_suffix(output_file_name)
+    return output_file_name.endswith(".csv") or output_file_name.endswith(".tsv")
@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import logging
+from typing import Optional, Union
+
+from .core import OntologyEntity
+
+_logger = logging.getLogger(__name__)
+
+SIGNATURE_FORMAT_VERSION = 2
+
+# Fields compared between versions, grouped by the kind of change they are reported as
+_DEFINITION_FIELDS = ("definition", "logical_definition", "definition_source")
+_ANNOTATION_FIELDS = ("synonyms", "examples", "comment", "curation_status", "curator_note")
+
+
+def _digest(value) -> str:
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _relation_key(name: str, relations_by_name: dict) -> str:
+    # REL columns name relations by their label, quoted if it contains spaces; relations merged from LucidChart are
+    # keyed by the same label as read from the relations sheet
+    name = name.strip().strip("'").strip().lower()
+    relation = relations_by_name.get(name)
+    return relation.id if relation is not None and relation.id else name
+
+
+def _relations_of(entity: OntologyEntity, relations_by_name: dict) -> dict[str, list[str]]:
+    relations: dict[str, set[str]] = {}
+    for rel_name, targets in (entity.relation_targets or {}).items():
+        relations.setdefault(_relation_key(rel_name, relations_by_name), set()).update(t.lower() for t in targets)
+    for rel_name, targets in (entity.relations or {}).items():
+        relations.setdefault(_relation_key(rel_name, relations_by_name), set()).update(t.name.lower() for t in targets)
+    return {key: sorted(targets) for key, targets in relations.items()}
+
+
+def entity_signature(entity: OntologyEntity, relations_by_name: Optional[dict] = None) -> dict:
+    """
+    Summarises an entity for diffing: the label and parent verbatim, all other content as short hashes, and one hash
+    over everything so unchanged entities are recognised with a single comparison.
+
+    :param relations_by_name: Relations by lowercase label, as in RobotTemplateWrapper.all_rel_names, to key the
+        relations of the entity by relation ID
+    """
+    signature = {"label": entity.name,
+                 "parent": entity.parent,
+                 "definition": _digest([getattr(entity, f) for f in _DEFINITION_FIELDS]),
+                 "annotations": _digest([getattr(entity, f) for f in _ANNOTATION_FIELDS]),
+                 "relations": _digest(_relations_of(entity, relations_by_name or {}))}
+    signature["hash"] = _digest(signature)
+    return signature
+
+
+def signatures_of(wrapper) -> dict[str, dict]:
+    """
+    :param wrapper: A RobotTemplateWrapper with classes loaded
+    :return: Entity signatures by ID
+    """
+    return {entity_id: entity_signature(entity, wrapper.all_rel_names)
+            for entity_id, entity in wrapper.all_entity_ids.items()}
+
+
+def save_signatures(wrapper, file_name: str) -> None:
+    """
+    Saves the entity signatures of a loaded wrapper so later versions can be diffed against it without the sheets.
+    """
+    with open(file_name, 'w') as f:
+        json.dump({"version": SIGNATURE_FORMAT_VERSION, "entities": signatures_of(wrapper)}, f)
+
+
+def load_signatures(file_name: str) -> dict[str, dict]:
+    with open(file_name) as f:
+        data = json.load(f)
+    if data.get("version") != SIGNATURE_FORMAT_VERSION:
+        raise Exception(f"Unsupported signature file version in '{file_name}': {data.get('version')}")
+    return data["entities"]
+
+
+class EntityChange:
+    ADDED = "added"
+    REMOVED = "removed"
+    RELABELED = "relabeled"
+    REPARENTED = "reparented"
+    REDEFINED = "redefined"
+    REANNOTATED = "reannotated"
+    RELATIONS_CHANGED = "relations_changed"
+
+    def __init__(self, entity_id: str, kinds: list[str], old: Optional[dict], new: Optional[dict]):
+        self.entity_id = entity_id
+        self.kinds = kinds
+        self.old = old
+        self.new = new
+
+    def to_dict(self) -> dict:
+        result = {"id": self.entity_id, "changes": self.kinds}
+        if self.old is not None:
+            result["old"] = {"label": self.old["label"], "parent": self.old["parent"]}
+        if self.new is not None:
+            result["new"] = {"label": self.new["label"], "parent": self.new["parent"]}
+        return result
+
+
+class TemplateDiff:
+    changes: list[EntityChange]
+
+    def __init__(self, changes: list[EntityChange]):
+        self.changes = changes
+
+    def of_kind(self, kind: str) -> list[EntityChange]:
+        return [c for c in self.changes if kind in c.kinds]
+
+    def summary(self) -> dict[str, int]:
+        counts = {}
+        for change in self.changes:
+            for kind in change.kinds:
+                counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary(), "changes": [c.to_dict() for c in self.changes]}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def __len__(self):
+        return len(self.changes)
+
+
+def diff_signatures(old: dict[str, dict], new: dict[str, dict]) -> TemplateDiff:
+    """
+    Compares two sets of entity signatures by ID in a single pass over each.
+    """
+    changes = []
+    for entity_id, old_sig in old.items():
+        new_sig = new.get(entity_id)
+        if new_sig is None:
+            changes.append(EntityChange(entity_id, [EntityChange.REMOVED], old_sig, None))
+            continue
+        if new_sig["hash"] == old_sig["hash"]:
+            continue
+
+        kinds = []
+        if new_sig["label"] != old_sig["label"]:
+            kinds.append(EntityChange.RELABELED)
+        if new_sig["parent"] != old_sig["parent"]:
+            kinds.append(EntityChange.REPARENTED)
+        if new_sig["definition"] != old_sig["definition"]:
+            kinds.append(EntityChange.REDEFINED)
+        if new_sig["annotations"] != old_sig["annotations"]:
+            kinds.append(EntityChange.REANNOTATED)
+        if new_sig["relations"] != old_sig["relations"]:
+            kinds.append(EntityChange.RELATIONS_CHANGED)
+        changes.append(EntityChange(entity_id, kinds, old_sig, new_sig))
+
+    for entity_id, new_sig in new.items():
+        if entity_id not in old:
+            changes.append(EntityChange(entity_id, [EntityChange.ADDED], None, new_sig))
+
+    return TemplateDiff(changes)
+
+
+def diff_templates(old: Union["RobotTemplateWrapper", dict[str, dict]],
+                   new: Union["RobotTemplateWrapper", dict[str, dict]]) -> TemplateDiff:
+    """
+    Diffs two versions of an ontology's classes, each given as a loaded RobotTemplateWrapper or as signatures
+    previously returned by load_signatures.
+    """
+    old_sigs = old if isinstance(old, dict) else signatures_of(old)
+    new_sigs = new if isinstance(new, dict) else signatures_of(new)
+    diff = diff_signatures(old_sigs, new_sigs)
+    _logger.debug(f"Diff of {len(old_sigs)} and {len(new_sigs)} entities: {diff.summary()}")
+    return diff
+
+
+def _load_version(file_name: str):
+    if file_name.endswith(".json"):
+        return load_signatures(file_name)
+    if file_name.endswith(".snapshot"):
+        from .snapshot import load_snapshot
+        wrapper = load_snapshot(file_name, 'robot', check_sources=False)
+        if wrapper is None:
+            raise Exception(f"Unable to read snapshot '{file_name}'")
+        return wrapper
+
+    from .RobotTemplateWrapper import RobotTemplateWrapper
+    wrapper = RobotTemplateWrapper(robotcmd='robot')
+    wrapper.add_classes_from_excel(file_name)
+    return wrapper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reports the classes changed between two versions of a class sheet")
+    parser.add_argument('old', help='Old Excel spreadsheet, saved signature (.json) or snapshot (.snapshot) file')
+    parser.add_argument('new', help='New Excel spreadsheet, saved signature (.json) or snapshot (.snapshot) file')
+    parser.add_argument('--save', '-s', help='Also save the signatures of the new version to this file')
+
+    args = parser.parse_args()
+
+    old_version = _load_version(args.old)
+    new_version = _load_version(args.new)
+    if args.save is not None:
+        if isinstance(new_version, dict):
+            parser.error('--save requires the new version to be a spreadsheet')
+        save_signatures(new_version, args.save)
+
+    print(diff_templates(old_version, new_version).to_json(indent=2))
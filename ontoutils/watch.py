@@ -0,0 +1,164 @@
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from .RobotTemplateWrapper import RobotTemplateWrapper
+from .core import OntologyEntity
+
+
+class WatchTarget:
+    excel_file_name: str
+    csv_file_name: str
+    owl_file_name: str
+    ontology_iri: str
+    dependency: Optional[str]
+
+    def __init__(self, excel_file_name: str, owl_file_name: str, ontology_iri: str, dependency: Optional[str] = None,
+                 csv_file_name: Optional[str] = None):
+        self.excel_file_name = excel_file_name
+        self.owl_file_name = owl_file_name
+        self.ontology_iri = ontology_iri
+        self.dependency = dependency
+        self.csv_file_name = csv_file_name if csv_file_name is not None else \
+            os.path.splitext(excel_file_name)[0] + ".csv"
+
+
+class BuildResult:
+    def __init__(self, target: WatchTarget):
+        self.target = target
+        self.success = False
+        self.parse_seconds = 0.0
+        self.build_seconds = 0.0
+        self.validation_errors = 0
+        self.error: Optional[str] = None
+
+    def __str__(self):
+        status = "OK" if self.success else f"FAILED ({self.error})"
+        return (f"{self.target.owl_file_name}: {status} - parsed in {self.parse_seconds:.2f}s, "
+                f"built in {self.build_seconds:.2f}s, {self.validation_errors} validation errors")
+
+
+class TemplateWatcher:
+    """
+    Watches class sheets and rebuilds their ontologies when they are saved.
+
+    The parsed classes of all sheets are kept in one RobotTemplateWrapper, so a save only reparses the changed sheet
+    and only rebuilds the ontology generated from it. Saves are debounced: a sheet is rebuilt once it has not changed
+    for `debounce` seconds.
+    """
+    _logger = logging.getLogger(__name__)
+
+    wrapper: RobotTemplateWrapper
+    '''
+    warm state with the classes of all watched sheets
+    '''
+
+    def __init__(self, robotcmd: str, targets: list[WatchTarget], iri_prefix: str, id_prefixes: list[str],
+                 debounce: float = 1.0, poll_interval: float = 0.5,
+                 on_build: Optional[Callable[[BuildResult], None]] = None):
+        self.robotcmd = robotcmd
+        self.targets = targets
+        self.iri_prefix = iri_prefix
+        self.id_prefixes = id_prefixes
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.on_build = on_build
+        self.wrapper = RobotTemplateWrapper(robotcmd)
+
+        self._entities: dict[str, list[OntologyEntity]] = {}
+        self._stamps: dict[str, Optional[tuple[int, int]]] = {}
+        self._pending: dict[str, float] = {}
+
+    @staticmethod
+    def _stamp(file_name: str) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parse(self, target: WatchTarget) -> None:
+        sheet_wrapper = RobotTemplateWrapper(self.robotcmd)
+        sheet_wrapper.header_mapping = self.wrapper.header_mapping
+        sheet_wrapper.ignored_headers = self.wrapper.ignored_headers
+        sheet_wrapper.add_classes_from_excel(target.excel_file_name, target.csv_file_name)
+        self._entities[target.excel_file_name] = sheet_wrapper.entities
+
+        # Re-indexing is cheap compared to parsing, so the indexes are rebuilt from the kept classes of all sheets
+        self.wrapper.clear_entities()
+        for t in self.targets:
+            for entity in self._entities.get(t.excel_file_name, []):
+                self.wrapper.add_entity(entity)
+
+    def rebuild(self, target: WatchTarget) -> BuildResult:
+        """
+        Reparses the sheet of `target` and regenerates its ontology.
+        """
+        result = BuildResult(target)
+        self._stamps[target.excel_file_name] = self._stamp(target.excel_file_name)
+        try:
+            start = time.perf_counter()
+            self._parse(target)
+            result.validation_errors = len(self.wrapper.validate().errors)
+            result.parse_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            returncode = self.wrapper.createOntologyFromTemplateFile(target.csv_file_name, target.dependency,
+                                                                     self.iri_prefix, self.id_prefixes,
+                                                                     target.ontology_iri, target.owl_file_name)
+            result.build_seconds = time.perf_counter() - start
+            result.success = returncode == 0
+            if not result.success:
+                result.error = f"ROBOT exited with {returncode}"
+        except Exception as e:
+            result.error = str(e)
+
+        self._logger.info(str(result))
+        if self.on_build is not None:
+            self.on_build(result)
+        return result
+
+    def poll(self) -> list[BuildResult]:
+        """
+        Checks the watched sheets once and rebuilds those that changed and have since settled.
+
+        :return: The results of the rebuilds done
+        """
+        results = []
+        now = time.monotonic()
+        for target in self.targets:
+            name = target.excel_file_name
+            stamp = self._stamp(name)
+            if stamp is None:
+                continue
+            if stamp != self._stamps.get(name):
+                # Still being written, wait for it to settle
+                self._stamps[name] = stamp
+                self._pending[name] = now
+            elif name in self._pending and now - self._pending[name] >= self.debounce:
+                del self._pending[name]
+                results.append(self.rebuild(target))
+        return results
+
+    def run(self, build_first: bool = True) -> None:
+        """
+        Watches the sheets until interrupted.
+
+        :param build_first: Build all targets once before watching
+        """
+        if build_first:
+            for target in self.targets:
+                self.rebuild(target)
+        else:
+            for target in self.targets:
+                self._stamps[target.excel_file_name] = self._stamp(target.excel_file_name)
+                self._parse(target)
+
+        self._logger.info(f"Watching {[t.excel_file_name for t in self.targets]}")
+        try:
+            while True:
+                self.poll()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            self._logger.info("Stopped watching")
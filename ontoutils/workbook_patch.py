@@ -0,0 +1,645 @@
+import html
+import logging
+import os
+import posixpath
+import re
+import shutil
+import struct
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+import zlib
+from typing import BinaryIO, Callable, Optional
+from xml.sax.saxutils import escape as xml_escape
+
+_logger = logging.getLogger(__name__)
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT = "/officeDocument"
+_SHARED_STRINGS = "/sharedStrings"
+
+# Sheet XML is machine written and regular enough to be split into rows and cells without a full parse. Only the
+# rows that are patched are taken apart, everything else is copied as it is.
+_ROW_START = re.compile(rb'<(?:\w+:)?row\b')
+_ROW = re.compile(rb'<((?:\w+:)?)row\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?row>)', re.S)
+_CELL = re.compile(rb'<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)', re.S)
+_ATTRIBUTE = re.compile(rb'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_VALUE = re.compile(rb'<(?:\w+:)?v\b[^>]*>(.*?)</(?:\w+:)?v>', re.S)
+_TEXT = re.compile(rb'<(?:\w+:)?t\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?t>)', re.S)
+_PHONETIC = re.compile(rb'<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>', re.S)
+_FORMULA = re.compile(rb'<(?:\w+:)?f\b')
+_COL = re.compile(rb'<(?:\w+:)?col\b([^>]*?)/?>')
+_CELL_REFERENCE = re.compile(r'([A-Z]+)(\d+)')
+_ROW_NUMBER = re.compile(rb'\sr\s*=\s*"[A-Z]*(\d+)"')
+_CELL_TYPE = re.compile(rb'\st\s*=\s*"(\w+)"')
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CHUNK_SIZE = 1 << 20
+
+# Zip records written by _ZipWriter, see the PKWARE APPNOTE. Archives needing zip64 are left to zipfile.
+_LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+_CENTRAL_HEADER = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHLLH")
+_ZIP32_LIMIT = 0xFFFFFFFF
+_UTF8_NAME = 0x800
+
+
+class WorkbookPatch:
+    """
+    Cell edits for rows of a sheet, addressed by the value of a key column and by column header. Edits can also be
+    computed from the current content of a row, see edit_row.
+
+    A value of None or "" clears the cell.
+    """
+    key_column: str
+    '''
+    header of the column identifying the rows
+    '''
+
+    edits: dict[str, dict[str, Optional[str]]]
+    '''
+    normalised key -> column header -> new value
+    '''
+
+    updates: dict[str, Callable[[dict[str, str]], dict[str, Optional[str]]]]
+    '''
+    normalised key -> function returning the edits of the row given the current values of its non-empty cells, both
+    by column header
+    '''
+
+    def __init__(self, key_column: str = "ID", key_normaliser: Callable[[str], str] = str.strip):
+        """
+        :param key_column: Header of the column identifying the rows
+        :param key_normaliser: Applied to the keys and to the key cells before comparing them
+        """
+        self.key_column = key_column
+        self.key_normaliser = key_normaliser
+        self.edits = {}
+        self.updates = {}
+
+    def edit(self, key: str, column: str, value: Optional[str]) -> None:
+        self.edits.setdefault(self.key_normaliser(key), {})[column] = value
+
+    def edit_row(self, key: str, update: Callable[[dict[str, str]], dict[str, Optional[str]]]) -> None:
+        """
+        Edits a row depending on its current content, e.g. to only write values that changed. Edits returned by
+        `update` take precedence over those given by edit.
+        """
+        self.updates[self.key_normaliser(key)] = update
+
+    @property
+    def keys(self) -> set[str]:
+        return set(self.edits) | set(self.updates)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class WorkbookPatchResult:
+    rows_patched: int
+    cells_written: int
+
+    missing_keys: list[str]
+    '''
+    keys of the patch not found in the key column
+    '''
+
+    missing_columns: list[str]
+    '''
+    columns of the patch not found in the header row
+    '''
+
+    skipped_cells: list[str]
+    '''
+    references of cells holding formulas, which are left untouched
+    '''
+
+    def __init__(self):
+        self.rows_patched = 0
+        self.cells_written = 0
+        self.missing_keys = []
+        self.missing_columns = []
+        self.skipped_cells = []
+
+
+def column_index(letters: str) -> int:
+    """
+    :return: The 1-based index of a column given by letters, e.g. 28 for 'AB'
+    """
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def column_letters(index: int) -> str:
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _attributes(raw: bytes) -> dict[bytes, bytes]:
+    return {m.group(1): m.group(2) if m.group(2) is not None else m.group(3) for m in _ATTRIBUTE.finditer(raw)}
+
+
+def _text(raw: bytes) -> str:
+    text = raw.decode("utf-8")
+    return html.unescape(text) if "&" in text else text
+
+
+def _rich_text(raw: bytes) -> str:
+    if b"r>" not in raw and b"rPh" not in raw:
+        # Plain text without runs, by far the most common
+        match = _TEXT.search(raw)
+        return _text(match.group(1)) if match is not None and match.group(1) is not None else ""
+    raw = _PHONETIC.sub(b"", raw)
+    return "".join(_text(m.group(1)) for m in _TEXT.finditer(raw) if m.group(1) is not None)
+
+
+def _package_part(zf: zipfile.ZipFile, source: str, rel_type: str) -> Optional[str]:
+    """
+    :return: The path of the part related to `source` by a relationship of the given type
+    """
+    directory, name = posixpath.split(source)
+    rels = posixpath.join(directory, "_rels", name + ".rels")
+    if rels not in zf.NameToInfo:
+        return None
+    for rel in ET.fromstring(zf.read(rels)).iter(_PKG_REL_NS + "Relationship"):
+        if rel.get("Type", "").endswith(rel_type):
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(directory, target))
+    return None
+
+
+def _sheet_part(zf: zipfile.ZipFile, workbook_part: str, sheet_name: Optional[str]) -> str:
+    workbook = ET.fromstring(zf.read(workbook_part))
+    sheets = list(workbook.iter(_MAIN_NS + "sheet"))
+    if sheet_name is None:
+        # The active sheet, as read by openpyxl
+        view = workbook.find(f"{_MAIN_NS}bookViews/{_MAIN_NS}workbookView")
+        sheet = sheets[int(view.get("activeTab", 0)) if view is not None else 0]
+    else:
+        matching = [s for s in sheets if s.get("name") == sheet_name]
+        if len(matching) == 0:
+            raise Exception(f"No sheet '{sheet_name}' in workbook")
+        sheet = matching[0]
+
+    rel_id = sheet.get(_DOC_REL_NS + "id")
+    directory, name = posixpath.split(workbook_part)
+    for rel in ET.fromstring(zf.read(posixpath.join(directory, "_rels", name + ".rels"))).iter(
+            _PKG_REL_NS + "Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(directory, target))
+    raise Exception(f"Sheet '{sheet.get('name')}' not found in workbook")
+
+
+def _read_shared_strings(zf: zipfile.ZipFile, part: Optional[str]) -> list[str]:
+    strings = []
+    if part is None or part not in zf.NameToInfo:
+        return strings
+    with zf.open(part) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag == _MAIN_NS + "si":
+                phonetic = {t for ph in element.iter(_MAIN_NS + "rPh") for t in ph.iter(_MAIN_NS + "t")}
+                strings.append("".join(t.text or "" for t in element.iter(_MAIN_NS + "t") if t not in phonetic))
+                element.clear()
+    return strings
+
+
+class _Cell:
+    def __init__(self, column: int, match: re.Match):
+        self.column = column
+        self.match = match
+
+    @property
+    def attributes(self) -> dict[bytes, bytes]:
+        return _attributes(self.match.group(1))
+
+    @property
+    def type(self) -> bytes:
+        cell_type = _CELL_TYPE.search(self.match.group(1))
+        return cell_type.group(1) if cell_type is not None else b"n"
+
+    @property
+    def inner(self) -> bytes:
+        return self.match.group(2) or b""
+
+
+class _SheetPatcher:
+    def __init__(self, patch: WorkbookPatch, shared_strings: list[str], result: WorkbookPatchResult):
+        self._patch = patch
+        self._shared_strings = shared_strings
+        self._result = result
+        self._headers: Optional[dict[str, int]] = None
+        self._key_column: Optional[int] = None
+        self._key_cell: Optional[re.Pattern] = None
+        self._header_of: dict[int, str] = {}
+        self._missing_columns: set[str] = set()
+        self._column_styles: list[tuple[int, int, bytes]] = []
+        self._head = b""
+        self._row_number = 0
+        self._row_open = b"<row"
+        self._row_close = b"</row>"
+        self._found: dict[str, int] = {}  # key -> number of its row
+
+    def _cell_value(self, cell: _Cell) -> Optional[str]:
+        cell_type = cell.type
+        if cell_type == b"inlineStr":
+            return _rich_text(cell.inner)
+        value = _VALUE.search(cell.inner)
+        if value is None:
+            return None
+        if cell_type == b"s":
+            return self._shared_strings[int(value.group(1))]
+        return _text(value.group(1))
+
+    def _cells(self, body: Optional[bytes]) -> list[_Cell]:
+        cells = []
+        column = 0
+        for match in _CELL.finditer(body or b""):
+            reference = _attributes(match.group(1)).get(b"r")
+            column = column_index(_CELL_REFERENCE.match(reference.decode("ascii")).group(1)) if reference else column + 1
+            cells.append(_Cell(column, match))
+        return cells
+
+    def row_values(self, body: Optional[bytes]) -> list[tuple[int, str]]:
+        """
+        :return: The column index and value of the non-empty cells of a row
+        """
+        values = [(cell.column, self._cell_value(cell)) for cell in self._cells(body)]
+        return sorted((column, value) for column, value in values if value is not None)
+
+    def _read_headers(self, body: Optional[bytes]) -> None:
+        self._headers = {}
+        for column, value in self.row_values(body):
+            if value not in self._headers:
+                self._headers[value] = column
+                self._header_of[column] = value
+
+        if self._patch.key_column not in self._headers:
+            raise Exception(f"Key column '{self._patch.key_column}' not found in the header row")
+        if any(b"r" not in cell.attributes for cell in self._cells(body)):
+            raise Exception("Sheets whose cells have no references are not supported")
+        self._key_column = self._headers[self._patch.key_column]
+        key_letters = column_letters(self._key_column).encode("ascii")
+        self._key_cell = re.compile(rb'<(?:\w+:)?c\b([^>]*?\sr="' + key_letters + rb'\d+"[^>]*?)'
+                                    rb'(?:/>|>(.*?)</(?:\w+:)?c>)', re.S)
+
+        # Default styles of columns, so that new cells look like their neighbours
+        for match in _COL.finditer(self._head):
+            attributes = _attributes(match.group(1))
+            if b"style" in attributes and b"min" in attributes and b"max" in attributes:
+                self._column_styles.append((int(attributes[b"min"]), int(attributes[b"max"]), attributes[b"style"]))
+
+    def _default_style(self, column: int, row_attributes: bytes) -> Optional[bytes]:
+        row_attributes = _attributes(row_attributes)
+        if row_attributes.get(b"customFormat") in (b"1", b"true") and b"s" in row_attributes:
+            return row_attributes[b"s"]
+        for first, last, style in self._column_styles:
+            if first <= column <= last:
+                return style
+        return None
+
+    def _cell_xml(self, prefix: bytes, reference: str, style: Optional[bytes], value: Optional[str]) -> bytes:
+        attributes = f'r="{reference}"' + (f' s="{style.decode("ascii")}"' if style is not None else '')
+        p = prefix.decode("ascii")
+        if value is None or value == "":
+            return f'<{p}c {attributes}/>'.encode("utf-8")
+        text = xml_escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+        space = ' xml:space="preserve"' if text != text.strip() else ''
+        return f'<{p}c {attributes} t="inlineStr"><{p}is><{p}t{space}>{text}</{p}t></{p}is></{p}c>'.encode("utf-8")
+
+    def _patch_row(self, match: re.Match, prefix: bytes, edits: dict[str, Optional[str]]) -> bytes:
+        body = match.group(3)
+        cells = self._cells(body)
+        by_column = {c.column: c for c in cells}
+        replacements: dict[int, bytes] = {}
+        for column_name in edits:
+            column = self._headers.get(column_name)
+            if column is None:
+                self._missing_columns.add(column_name)
+                continue
+            reference = f"{column_letters(column)}{self._row_number}"
+            cell = by_column.get(column)
+            if cell is not None and _FORMULA.search(cell.inner):
+                self._result.skipped_cells.append(reference)
+                continue
+            style = cell.attributes.get(b"s") if cell is not None else self._default_style(column, match.group(2))
+            replacements[column] = self._cell_xml(prefix, reference, style, edits[column_name])
+            self._result.cells_written += 1
+
+        if not replacements:
+            return match.group(0)
+        self._result.rows_patched += 1
+
+        parts = []
+        position = 0
+        body = body or b""
+        for cell in cells:
+            for column in sorted(c for c in replacements if c < cell.column and c not in by_column):
+                parts.append(replacements.pop(column))
+            parts.append(body[position:cell.match.start()])
+            parts.append(replacements.pop(cell.column, cell.match.group(0)))
+            position = cell.match.end()
+        parts.extend(replacements[c] for c in sorted(replacements))
+        parts.append(body[position:])
+
+        # Spans are only an optimisation hint and may no longer hold for inserted cells
+        attributes = re.sub(rb'\s+spans\s*=\s*"[^"]*"', b"", match.group(2))
+        return b"<" + prefix + b"row" + attributes + b">" + b"".join(parts) + b"</" + prefix + b"row>"
+
+    def _patch_rows(self, data: bytes) -> bytes:
+        """
+        Patches the rows in `data`, which must consist of complete rows. The key cells are searched for in all of it
+        at once, rows are only taken apart if their key is in the patch.
+        """
+        out = []
+        copied = 0
+        for match in self._key_cell.finditer(data):
+            value = self._cell_value(_Cell(self._key_column, match))
+            key = self._patch.key_normaliser(value) if value is not None else None
+            if key is None or (key not in self._patch.edits and key not in self._patch.updates):
+                continue
+
+            row = _ROW.match(data, data.rfind(self._row_open, copied, match.start()))
+            number = _ROW_NUMBER.search(row.group(2)) or _ROW_NUMBER.search(match.group(1))
+            self._row_number = int(number.group(1))
+            if key in self._found:
+                # The rows before were already written, so the whole patch is abandoned
+                raise Exception(f"Key '{key}' is in rows {self._found[key]} and {self._row_number}")
+            self._found[key] = self._row_number
+
+            edits = dict(self._patch.edits.get(key, {}))
+            if key in self._patch.updates:
+                values = {self._header_of[c]: v for c, v in self.row_values(row.group(3)) if c in self._header_of}
+                edits.update(self._patch.updates[key](values))
+            out.append(data[copied:row.start()])
+            out.append(self._patch_row(row, row.group(1), edits))
+            copied = row.end()
+        out.append(data[copied:])
+        return b"".join(out)
+
+    def copy(self, source: BinaryIO, target: BinaryIO) -> None:
+        buffer = b""
+        eof = False
+        while not eof:
+            chunk = source.read(_CHUNK_SIZE)
+            eof = len(chunk) == 0
+            buffer += chunk
+            if self._headers is None:
+                start = _ROW_START.search(buffer)
+                header = _ROW.match(buffer, start.start()) if start is not None else None
+                if header is None:
+                    if eof:
+                        raise Exception("Sheet has no header row")
+                    continue
+                self._head = buffer[:header.start()]
+                self._row_open = b"<" + header.group(1) + b"row"
+                self._row_close = b"</" + header.group(1) + b"row>"
+                self._read_headers(header.group(3))
+                target.write(buffer[:header.end()])
+                buffer = buffer[header.end():]
+
+            # A row cut off by the end of the chunk waits for the next one
+            last = buffer.rfind(self._row_close)
+            end = len(buffer) if eof else last + len(self._row_close) if last >= 0 else 0
+            target.write(self._patch_rows(buffer[:end]))
+            buffer = buffer[end:]
+
+        self._result.missing_keys = sorted(self._patch.keys - set(self._found))
+        self._result.missing_columns = sorted(self._missing_columns)
+
+
+def _member_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    copy = zipfile.ZipInfo(info.filename, info.date_time)
+    copy.compress_type = info.compress_type
+    copy.comment = info.comment
+    copy.create_system = info.create_system
+    copy.external_attr = info.external_attr
+    copy.file_size = info.file_size
+    return copy
+
+
+class _ZipEntry:
+    def __init__(self, info: zipfile.ZipInfo, flags: int, offset: int):
+        self.info = info
+        self.name = info.filename.encode("utf-8" if flags & _UTF8_NAME else "cp437")
+        self.flags = flags
+        self.offset = offset
+        self.crc = info.CRC
+        self.compress_size = info.compress_size
+        self.file_size = info.file_size
+
+
+class _MemberWriter:
+    """
+    Compresses the content of a new member as it is written, and completes its local header when closed
+    """
+
+    def __init__(self, target: BinaryIO, entry: _ZipEntry):
+        self._target = target
+        self._entry = entry
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15) \
+            if entry.info.compress_type == zipfile.ZIP_DEFLATED else None
+        entry.crc = entry.compress_size = entry.file_size = 0
+
+    def write(self, data: bytes) -> None:
+        self._entry.crc = zlib.crc32(data, self._entry.crc)
+        self._entry.file_size += len(data)
+        self._write(self._compressor.compress(data) if self._compressor is not None else data)
+
+    def _write(self, data: bytes) -> None:
+        self._entry.compress_size += len(data)
+        self._target.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is not None:
+            return
+        if self._compressor is not None:
+            self._write(self._compressor.flush())
+        if max(self._entry.compress_size, self._entry.file_size) >= _ZIP32_LIMIT:
+            raise Exception(f"'{self._entry.info.filename}' is too large for a zip without zip64")
+        end = self._target.tell()
+        self._target.seek(self._entry.offset)
+        _ZipWriter.write_local_header(self._target, self._entry)
+        self._target.seek(end)
+
+
+class _ZipWriter:
+    """
+    Writes a zip archive member by member, copying members of another archive with their compressed bytes as they
+    are. Only stored and deflated members without encryption or zip64 are supported, see _can_copy_raw.
+    """
+
+    def __init__(self, target: BinaryIO):
+        self._target = target
+        self._entries: list[_ZipEntry] = []
+
+    def _add(self, info: zipfile.ZipInfo, flags: int) -> _ZipEntry:
+        try:
+            info.filename.encode("cp437")
+        except UnicodeEncodeError:
+            flags |= _UTF8_NAME
+        entry = _ZipEntry(info, flags, self._target.tell())
+        self._entries.append(entry)
+        return entry
+
+    @staticmethod
+    def _dos_date_time(info: zipfile.ZipInfo) -> tuple[int, int]:
+        year, month, day, hour, minute, second = info.date_time
+        return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+    @staticmethod
+    def write_local_header(target: BinaryIO, entry: _ZipEntry) -> None:
+        date, time = _ZipWriter._dos_date_time(entry.info)
+        target.write(_LOCAL_HEADER.pack(b"PK\x03\x04", 20, entry.flags, entry.info.compress_type, time, date,
+                                        entry.crc, entry.compress_size, entry.file_size, len(entry.name), 0))
+        target.write(entry.name)
+
+    def copy_raw(self, source: BinaryIO, info: zipfile.ZipInfo) -> None:
+        """
+        Copies a member of the archive `source` without decompressing it
+        """
+        source.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(source.read(_LOCAL_HEADER.size))
+        if header[0] != b"PK\x03\x04":
+            raise Exception(f"Bad local header of '{info.filename}'")
+        source.seek(header[9] + header[10], os.SEEK_CUR)
+
+        # Sizes and checksum are known, a data descriptor following the source member is not copied
+        entry = self._add(info, info.flag_bits & (_UTF8_NAME | 0x6))
+        self.write_local_header(self._target, entry)
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = source.read(min(remaining, _CHUNK_SIZE))
+            if len(chunk) == 0:
+                raise Exception(f"'{info.filename}' is truncated")
+            self._target.write(chunk)
+            remaining -= len(chunk)
+
+    def open(self, info: zipfile.ZipInfo) -> _MemberWriter:
+        """
+        :return: A writer for the content of a new member, stored or deflated like `info`
+        """
+        entry = self._add(info, 0)
+        self.write_local_header(self._target, entry)
+        return _MemberWriter(self._target, entry)
+
+    def close(self) -> None:
+        start = self._target.tell()
+        for entry in self._entries:
+            date, time = self._dos_date_time(entry.info)
+            comment = entry.info.comment
+            self._target.write(_CENTRAL_HEADER.pack(
+                b"PK\x01\x02", entry.info.create_system << 8 | 20, 20, entry.flags, entry.info.compress_type, time,
+                date, entry.crc, entry.compress_size, entry.file_size, len(entry.name), 0, len(comment), 0,
+                entry.info.internal_attr, entry.info.external_attr, entry.offset))
+            self._target.write(entry.name)
+            self._target.write(comment)
+        end = self._target.tell()
+        if len(self._entries) >= 0xFFFF or end >= _ZIP32_LIMIT:
+            raise Exception("The workbook is too large for a zip without zip64")
+        self._target.write(_END_OF_CENTRAL_DIRECTORY.pack(b"PK\x05\x06", 0, 0, len(self._entries),
+                                                          len(self._entries), end - start, start, 0))
+
+
+def _can_copy_raw(infos: list[zipfile.ZipInfo]) -> bool:
+    return len(infos) < 0xFFFF and all(
+        info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) and not info.flag_bits & 0x1
+        and max(info.header_offset, info.compress_size, info.file_size) < _ZIP32_LIMIT
+        for info in infos)
+
+
+def read_sheet_headers(excel_file_name: str, sheet_name: Optional[str] = None) -> list[str]:
+    """
+    Reads the header row of a sheet without reading the rest of it.
+
+    :param sheet_name: Name of the sheet, the active sheet if None
+    :return: The non-empty headers in column order
+    """
+    with zipfile.ZipFile(excel_file_name) as zf:
+        workbook_part = _package_part(zf, "", _OFFICE_DOCUMENT) or "xl/workbook.xml"
+        shared_strings = _read_shared_strings(zf, _package_part(zf, workbook_part, _SHARED_STRINGS))
+        patcher = _SheetPatcher(WorkbookPatch(key_column=""), shared_strings, WorkbookPatchResult())
+        with zf.open(_sheet_part(zf, workbook_part, sheet_name)) as f:
+            buffer = b""
+            while True:
+                chunk = f.read(1 << 16)
+                buffer += chunk
+                start = _ROW_START.search(buffer)
+                match = _ROW.match(buffer, start.start()) if start is not None else None
+                if match is not None:
+                    return [value for _, value in patcher.row_values(match.group(3))]
+                if len(chunk) == 0:
+                    return []
+
+
+def patch_workbook(excel_file_name: str, patch: WorkbookPatch, output_file_name: Optional[str] = None,
+                   sheet_name: Optional[str] = None) -> WorkbookPatchResult:
+    """
+    Applies cell edits to an existing workbook, keeping everything else as it is, e.g. formatting, other sheets and
+    columns not in the patch.
+
+    The sheet XML is streamed row by row and only the edited cells are rewritten, as inline strings keeping their
+    style. All other parts of the workbook are copied with their compressed bytes as they are. Workbooks needing zip64
+    are written with zipfile instead, which recompresses every part. The result is written to a temporary file next
+    to the output which then atomically replaces it, so the output may be the input itself.
+
+    Cells holding formulas are not overwritten and are reported instead. If a key of the patch is found in more than
+    one row, nothing is written and an exception is raised.
+
+    :param excel_file_name: Path of the .xlsx workbook
+    :param patch: The edits
+    :param output_file_name: Path of the patched workbook, the input if None
+    :param sheet_name: Name of the sheet to patch, the active sheet if None
+    """
+    output_file_name = output_file_name if output_file_name is not None else excel_file_name
+    result = WorkbookPatchResult()
+
+    partial = tempfile.NamedTemporaryFile(prefix=os.path.basename(output_file_name) + ".", suffix=".part",
+                                          dir=os.path.dirname(os.path.abspath(output_file_name)), delete=False)
+    try:
+        with partial, zipfile.ZipFile(excel_file_name) as zin, open(excel_file_name, 'rb') as raw:
+            workbook_part = _package_part(zin, "", _OFFICE_DOCUMENT) or "xl/workbook.xml"
+            sheet_part = _sheet_part(zin, workbook_part, sheet_name)
+            shared_strings = _read_shared_strings(zin, _package_part(zin, workbook_part, _SHARED_STRINGS))
+            patcher = _SheetPatcher(patch, shared_strings, result)
+
+            if _can_copy_raw(zin.infolist()):
+                zout = _ZipWriter(partial)
+                for info in zin.infolist():
+                    if info.filename == sheet_part:
+                        with zin.open(info) as source, zout.open(info) as target:
+                            patcher.copy(source, target)
+                    else:
+                        zout.copy_raw(raw, info)
+                zout.close()
+            else:
+                with zipfile.ZipFile(partial, 'w') as zout:
+                    for info in zin.infolist():
+                        with zin.open(info) as source, zout.open(_member_info(info), 'w') as target:
+                            if info.filename == sheet_part:
+                                patcher.copy(source, target)
+                            else:
+                                shutil.copyfileobj(source, target, _CHUNK_SIZE)
+        os.replace(partial.name, output_file_name)
+    finally:
+        if os.path.exists(partial.name):
+            os.remove(partial.name)
+
+    if result.missing_columns:
+        _logger.warning(f"Columns not found in the header row of '{excel_file_name}': {result.missing_columns}")
+    if result.missing_keys:
+        _logger.warning(f"Rows not found in '{excel_file_name}': {result.missing_keys}")
+    if result.skipped_cells:
+        _logger.warning(f"Formula cells not patched in '{excel_file_name}': {result.skipped_cells}")
+    _logger.debug(f"Patched {result.cells_written} cells in {result.rows_patched} rows of '{excel_file_name}'")
+    return result
@@ -0,0 +1,141 @@
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+DEFAULT_CACHE_DIR = "temp"
+CATALOG_FILE_NAME = "catalog-v001.xml"
+
+
+class BuildWorkspace:
+    """
+    Private directory for the intermediate files of one build, so that builds can run side by side in the same
+    directory or process.
+
+    Intermediate files, e.g. the generated imports ontology, template shards and import slims, are written inside
+    the workspace. Final outputs are first written to a staging path inside the workspace too and only moved to their
+    destination by publish, once they are complete. Downloaded ontologies go to a cache directory shared by all
+    workspaces, which builds only add to and never remove.
+
+    Use as a context manager to remove the workspace once the build is done.
+    """
+    _logger = logging.getLogger(__name__)
+
+    root: str
+    '''
+    directory of the workspace
+    '''
+
+    cache_dir: str
+    '''
+    directory of the shared download cache
+    '''
+
+    catalog: Optional[str]
+    '''
+    XML catalog ROBOT resolves imports with. As ROBOT only looks for a catalog next to its input, which is now inside
+    the workspace, it is passed explicitly
+    '''
+
+    def __init__(self, base_dir: Optional[str] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                 catalog: Optional[str] = None, keep: bool = False):
+        """
+        :param base_dir: Directory the workspace is created in, the system temporary directory if None
+        :param cache_dir: Directory of the shared download cache
+        :param catalog: XML catalog for ROBOT, catalog-v001.xml in the current directory if it exists and None
+        :param keep: Keep the workspace after the build, e.g. to inspect intermediate files
+        """
+        self.root = tempfile.mkdtemp(prefix="ontoutils-build.", dir=base_dir)
+        self.cache_dir = os.path.abspath(cache_dir)
+        if catalog is None and os.path.exists(CATALOG_FILE_NAME):
+            catalog = CATALOG_FILE_NAME
+        self.catalog = os.path.abspath(catalog) if catalog is not None else None
+        self.keep = keep
+        self._staged: dict[str, str] = {}
+        self._stage_numbers = itertools.count()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Wrappers holding a workspace are pickled to pool processes
+        state = dict(self.__dict__)
+        del state['_lock']
+        del state['_stage_numbers']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._stage_numbers = itertools.count()
+
+    def __enter__(self) -> "BuildWorkspace":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def path(self, name: str) -> str:
+        """
+        :return: Path of an intermediate file in the workspace
+        """
+        return os.path.join(self.root, name)
+
+    def make_dir(self, name: str) -> str:
+        """
+        :return: Path of a new, empty directory in the workspace
+        """
+        return tempfile.mkdtemp(prefix=name + ".", dir=self.root)
+
+    def stage(self, file_name: str) -> str:
+        """
+        :param file_name: Destination of a final output
+        :return: The path the output is to be written to before it is published
+        """
+        destination = os.path.abspath(file_name)
+        with self._lock:
+            staged = self._staged.get(destination)
+            if staged is None:
+                staged = self._staged[destination] = os.path.join(
+                    self.root, f"out-{next(self._stage_numbers)}-{os.path.basename(destination)}")
+        return staged
+
+    def publish(self, file_name: str) -> None:
+        """
+        Moves a staged output to its destination, atomically replacing any previous version.
+        """
+        destination = os.path.abspath(file_name)
+        with self._lock:
+            staged = self._staged.pop(destination)
+
+        if not os.path.exists(staged):
+            raise Exception(f"Output '{file_name}' was not written")
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            os.replace(staged, destination)
+        except OSError:
+            # The workspace is on another file system, copy next to the destination first
+            fd, partial = tempfile.mkstemp(prefix=os.path.basename(destination) + ".", suffix=".part",
+                                           dir=os.path.dirname(destination))
+            os.close(fd)
+            try:
+                shutil.copyfile(staged, partial)
+                os.replace(partial, destination)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+            os.remove(staged)
+        self._logger.debug(f"Published '{file_name}'")
+
+    def catalog_options(self) -> list[str]:
+        """
+        :return: ROBOT options passing the catalog, to be given with inputs inside the workspace
+        """
+        return ['--catalog', self.catalog] if self.catalog is not None else []
+
+    def close(self) -> None:
+        if self.keep:
+            self._logger.info(f"Keeping build workspace '{self.root}'")
+        else:
+            shutil.rmtree(self.root, ignore_errors=True)
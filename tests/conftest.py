@@ -0,0 +1,45 @@
+import stat
+
+import openpyxl
+import pytest
+
+# Stands in for ROBOT: logs its arguments next to itself and writes the --output or --export file, failing for
+# outputs named *broken*
+FAKE_ROBOT = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/robot.log"
+prev=""
+for a in "$@"; do
+  if [ "$prev" = "--output" ] || [ "$prev" = "--export" ]; then
+    case "$(basename "$a")" in *broken*) exit 1;; esac
+    echo "<out/>" > "$a"
+  fi
+  prev="$a"
+done
+"""
+
+
+@pytest.fixture
+def make_workbook(tmp_path):
+    """
+    :return: A function writing rows, the first being the header, to a new workbook in tmp_path
+    """
+    def make(name: str, rows: list[list]) -> str:
+        book = openpyxl.Workbook()
+        for row in rows:
+            book.active.append(row)
+        path = str(tmp_path / name)
+        book.save(path)
+        return path
+
+    return make
+
+
+@pytest.fixture
+def fake_robot(tmp_path) -> str:
+    """
+    :return: The path of an executable standing in for ROBOT, see FAKE_ROBOT
+    """
+    robot = tmp_path / "robot"
+    robot.write_text(FAKE_ROBOT)
+    robot.chmod(robot.stat().st_mode | stat.S_IEXEC)
+    return str(robot)
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from ontoutils.RobotWrapper import RobotWrapper
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc to inspect processes")
+def test_cancel_kills_the_process_group(tmp_path):
+    pid_file = tmp_path / "pid"
+    command = f"sleep 30 & echo $! > {pid_file}; wait"
+
+    async def cancel():
+        task = asyncio.ensure_future(RobotWrapper("robot")._execute_command_async(command))
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _is_running(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _is_running(pid)
+
+
+def test_robot_processes_are_bounded(tmp_path):
+    # Fails if another copy runs at the same time
+    command = f"mkdir {tmp_path / 'lock'} || exit 1; sleep 0.1; rmdir {tmp_path / 'lock'}"
+    wrapper = RobotWrapper("robot")
+    wrapper.max_robot_processes = 1
+
+    async def run():
+        return await asyncio.gather(*[wrapper._execute_command_async(command) for _ in range(3)])
+
+    assert asyncio.run(run()) == [0, 0, 0]
+
+
+def test_gather_bounded_cancels_the_others_on_failure():
+    started = []
+    cancelled = []
+
+    async def work(i):
+        started.append(i)
+        if i == 1:
+            raise ValueError("failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(i)
+            raise
+
+    async def run():
+        return await RobotWrapper._gather_bounded([lambda i=i: work(i) for i in range(4)], 2)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+    # The last task never got a slot
+    assert started == [0, 1, 2] and cancelled == [0, 2]
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from ontoutils.builder import STAMP_FILE_NAME, BuildManifest, OntologyBuilder
+
+
+@pytest.fixture
+def project(tmp_path, make_workbook, fake_robot):
+    for name in ["upper", "middle", "lower", "other"]:
+        make_workbook(f"{name}.xlsx", [["ID", "Label", "Parent"], [f"X:{name}", name, "thing"]])
+
+    def manifest(targets: dict) -> BuildManifest:
+        return BuildManifest({"robot": fake_robot, "iri_prefix": "http://example.org/",
+                              "id_prefixes": ["X: http://example.org/X_"], "targets": targets}, str(tmp_path))
+
+    return manifest
+
+
+def _robot_outputs(tmp_path) -> list[str]:
+    log = tmp_path / "robot.log"
+    if not log.exists():
+        return []
+    # Outputs are staged in the build workspace as out-<n>-<file name>
+    return [os.path.basename(line.split("--output ")[1].split()[0]).split("-", 2)[2]
+            for line in log.read_text().splitlines()]
+
+
+CHAIN = {"lower": {"workbook": "lower.xlsx", "output": "lower.owl", "depends_on": ["middle"]},
+         "middle": {"workbook": "middle.xlsx", "output": "middle.owl", "depends_on": ["upper"]},
+         "upper": {"workbook": "upper.xlsx", "output": "upper.owl"}}
+
+
+def test_manifest_orders_dependencies_first(project):
+    manifest = project(CHAIN)
+    assert manifest.order == ["upper", "middle", "lower"]
+    assert manifest.closure(["middle"]) == {"middle", "upper"}
+
+
+def test_manifest_rejects_unknown_dependencies_and_cycles(project):
+    with pytest.raises(Exception, match="unknown target 'missing'"):
+        project({"upper": {"workbook": "upper.xlsx", "output": "upper.owl", "depends_on": ["missing"]}})
+    with pytest.raises(Exception, match="Dependency cycle between targets: \\['middle', 'upper'\\]"):
+        project({"upper": {"workbook": "upper.xlsx", "output": "upper.owl", "depends_on": ["middle"]},
+                 "middle": {"workbook": "middle.xlsx", "output": "middle.owl", "depends_on": ["upper"]},
+                 "other": {"workbook": "other.xlsx", "output": "other.owl"}})
+
+
+def test_build_runs_targets_in_dependency_order(tmp_path, project):
+    results = OntologyBuilder(project(CHAIN), max_workers=3).build()
+
+    assert results == {"upper": True, "middle": True, "lower": True}
+    assert _robot_outputs(tmp_path) == ["upper.owl", "middle.owl", "lower.owl"]
+    with open(tmp_path / STAMP_FILE_NAME) as f:
+        assert set(json.load(f)) == {"upper", "middle", "lower"}
+
+
+def test_build_skips_dependents_of_failed_target(tmp_path, project):
+    targets = {"upper": {"workbook": "upper.xlsx", "output": "broken_upper.owl"},
+               "middle": {"workbook": "middle.xlsx", "output": "middle.owl", "depends_on": ["upper"]},
+               "lower": {"workbook": "lower.xlsx", "output": "lower.owl", "depends_on": ["middle"]},
+               "other": {"workbook": "other.xlsx", "output": "other.owl"}}
+
+    results = OntologyBuilder(project(targets), max_workers=2).build()
+
+    assert results == {"upper": False, "middle": False, "lower": False, "other": True}
+    assert sorted(_robot_outputs(tmp_path)) == ["broken_upper.owl", "other.owl"]
+    assert not os.path.exists(tmp_path / "middle.owl")
+
+
+def test_build_skips_up_to_date_targets(tmp_path, project, make_workbook):
+    OntologyBuilder(project(CHAIN)).build()
+    os.remove(tmp_path / "robot.log")
+
+    assert OntologyBuilder(project(CHAIN)).build(["middle"]) == {"upper": True, "middle": True}
+    assert _robot_outputs(tmp_path) == []
+
+    # A changed sheet rebuilds its target, and the targets depending on it only if its output changed
+    make_workbook("middle.xlsx", [["ID", "Label", "Parent"], ["X:middle", "middle renamed", "thing"]])
+    OntologyBuilder(project(CHAIN)).build()
+    assert _robot_outputs(tmp_path) == ["middle.owl"]
+
+    assert OntologyBuilder(project(CHAIN), force=True).build(["upper"]) == {"upper": True}
+    assert _robot_outputs(tmp_path) == ["middle.owl", "upper.owl"]
+
+
+def test_template_csv_stays_in_the_workspace(tmp_path, project):
+    assert OntologyBuilder(project(CHAIN)).build(["upper"]) == {"upper": True}
+    assert not (tmp_path / "upper.csv").exists()
+    [command] = (tmp_path / "robot.log").read_text().splitlines()
+    assert "/ontoutils-build." in command.split("--template ")[1].split()[0]
+
+
+def test_imports_build_is_judged_by_robot(tmp_path, project, make_workbook):
+    make_workbook("external.xlsx", [["Ontology", "PURL", "Root", "IDs", "Intermediates", "Prefix"]])
+    (tmp_path / "broken_external.owl").write_text("<old/>")
+    targets = {"external": {"imports_sheet": "external.xlsx", "output": "external.owl"},
+               "broken": {"imports_sheet": "external.xlsx", "output": "broken_external.owl"}}
+
+    assert OntologyBuilder(project(targets)).build() == {"external": True, "broken": False}
+    assert (tmp_path / "external.owl").read_text() == "<out/>\n"
+    assert (tmp_path / "broken_external.owl").read_text() == "<old/>"
@@ -0,0 +1,121 @@
+import gzip
+import io
+import os
+import stat
+
+import pytest
+
+from ontoutils.RobotImportsWrapper import OntologyImport, RobotImportsWrapper
+from ontoutils.compression import GZIP, ZSTD, copy_compressed, open_compressed, partial_file, piped_path, \
+    sniff_compression
+
+CONTENT = b"<rdf:RDF/>\n" * 100
+
+
+def test_open_compressed_round_trip(tmp_path):
+    for name in ("a.owl", "a.owl.gz"):
+        with open_compressed(str(tmp_path / name), "wt", encoding="utf-8") as f:
+            f.write(CONTENT.decode())
+        with open_compressed(str(tmp_path / name), "rb") as f:
+            assert f.read() == CONTENT
+    assert sniff_compression((tmp_path / "a.owl.gz").read_bytes()) == GZIP
+
+    # Reading follows the content, not the extension
+    (tmp_path / "plain.owl.gz").write_bytes(CONTENT)
+    with open_compressed(str(tmp_path / "plain.owl.gz")) as f:
+        assert f.read() == CONTENT
+
+
+@pytest.mark.parametrize("source_compression", [None, GZIP])
+@pytest.mark.parametrize("compression", [None, GZIP])
+def test_copy_compressed(source_compression, compression):
+    source = gzip.compress(CONTENT) if source_compression == GZIP else CONTENT
+    target = io.BytesIO()
+    copy_compressed(io.BytesIO(source), target, compression)
+
+    copied = target.getvalue()
+    assert sniff_compression(copied) == compression
+    assert (gzip.decompress(copied) if compression == GZIP else copied) == CONTENT
+    if source_compression == compression:
+        assert copied == source
+
+
+def test_copy_compressed_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    target = io.BytesIO()
+    copy_compressed(io.BytesIO(gzip.compress(CONTENT)), target, ZSTD)
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(target.getvalue()) == CONTENT
+
+
+def test_partial_files_are_unique_and_keep_the_compression(tmp_path):
+    target = str(tmp_path / "a.owl.gz")
+    first, second = partial_file(target), partial_file(target)
+    assert first != second and os.path.dirname(first) == str(tmp_path)
+    assert first.endswith(".part.gz") and os.path.basename(first).startswith("a.owl.gz.")
+
+
+def test_download_cache_compression(tmp_path):
+    (tmp_path / "plain.owl").write_bytes(CONTENT)
+    (tmp_path / "packed.owl.gz").write_bytes(gzip.compress(CONTENT))
+    cache = tmp_path / "cache"
+
+    def download(cache_compression, short_name):
+        wrapper = RobotImportsWrapper("robot", cache_compression=cache_compression)
+        wrapper.imports.append(OntologyImport("X", (tmp_path / short_name).as_uri(), "X:1", [], "all", short_name,
+                                              None))
+        wrapper.download_imported_ontologies(str(cache))
+
+    download(GZIP, "plain.owl")
+    download(None, "packed.owl.gz")
+    assert gzip.decompress((cache / "plain.owl.gz").read_bytes()) == CONTENT
+    assert (cache / "packed.owl").read_bytes() == CONTENT
+
+    # A cached ontology is not downloaded again, whatever its compression
+    (tmp_path / "plain.owl").unlink()
+    download(None, "plain.owl")
+    assert sorted(p.name for p in cache.iterdir()) == ["packed.owl", "plain.owl.gz"]
+
+
+@pytest.mark.parametrize("source_compression", [None, GZIP])
+@pytest.mark.parametrize("compression", [None, GZIP])
+def test_piped_path_streams_without_writing(tmp_path, source_compression, compression):
+    source = tmp_path / ("a.owl.gz" if source_compression == GZIP else "a.owl")
+    source.write_bytes(gzip.compress(CONTENT) if source_compression == GZIP else CONTENT)
+
+    with piped_path(str(source), str(tmp_path), compression) as path:
+        assert os.path.basename(path) == ("a.owl.gz" if compression == GZIP else "a.owl")
+        if hasattr(os, "mkfifo"):
+            assert stat.S_ISFIFO(os.stat(path).st_mode)
+        with open(path, "rb") as f:
+            piped = f.read()
+    assert (gzip.decompress(piped) if compression == GZIP else piped) == CONTENT
+    assert [p.name for p in tmp_path.iterdir()] == [source.name]
+
+    # Leaving the context releases a pipe nobody opened
+    with piped_path(str(source), str(tmp_path), compression):
+        pass
+    assert [p.name for p in tmp_path.iterdir()] == [source.name]
+
+
+def test_zstd_cache_is_streamed_to_robot(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    (cache / "x.owl.zst").write_bytes(zstandard.ZstdCompressor().compress(CONTENT))
+    # Copies its --input to its --output, noting whether the input was a pipe
+    robot = tmp_path / "robot"
+    robot.write_text('#!/bin/sh\nprev=""\nfor a in "$@"; do\n'
+                     '  [ "$prev" = "--input" ] && input="$a"\n  [ "$prev" = "--output" ] && output="$a"\n'
+                     '  prev="$a"\ndone\n[ -p "$input" ] && echo "$input" > "$output.kind"\n'
+                     'cat "$input" > "$output"\n')
+    robot.chmod(robot.stat().st_mode | stat.S_IEXEC)
+
+    wrapper = RobotImportsWrapper(str(robot), cache_compression=ZSTD)
+    imp = OntologyImport("X", "http://example.org/x.owl", "X:1", ["X:2"], "all", "x.owl", None)
+    wrapper._extract_slim_ontology(imp, str(cache))
+
+    slim = wrapper._slim_file_name(imp, str(cache))
+    assert gzip.decompress(open(slim, "rb").read()) == CONTENT
+    assert open(slim + ".kind").read().strip().endswith("x.owl.gz")
+    assert sorted(p.name for p in cache.iterdir()) == sorted(["x.owl.zst", os.path.basename(slim),
+                                                               os.path.basename(slim) + ".kind"])
@@ -0,0 +1,57 @@
+from ontoutils import OntologyEntity, RobotTemplateWrapper
+
+
+def _entity(entity_id, name, parent):
+    entity = OntologyEntity()
+    entity.id = entity_id
+    entity.name = name
+    entity.parent = parent
+    entity.synonyms = []
+    return entity
+
+
+def _ids(entities):
+    return sorted(e.id for e in entities)
+
+
+def _wrapper(*entities):
+    wrapper = RobotTemplateWrapper("robot")
+    for entity in entities:
+        wrapper.add_entity(entity)
+    return wrapper
+
+
+def test_closure_queries():
+    wrapper = _wrapper(_entity("X:1", "root", "thing"),
+                       _entity("X:2", "left", "root"),
+                       _entity("X:3", "right", "root"),
+                       _entity("X:4", "left leaf", "left"))
+
+    assert wrapper.is_descendant_of("left leaf", "X:1")
+    assert not wrapper.is_descendant_of("X:3", "left")
+    assert not wrapper.is_descendant_of("X:1", "X:1")
+    assert _ids(wrapper.get_descendants("root")) == ["X:2", "X:3", "X:4"]
+    assert [e.id for e in wrapper.get_ancestors("X:4")] == ["X:2", "X:1"]
+    assert _ids(wrapper.hierarchy.children(wrapper.get_entity("X:1"))) == ["X:2", "X:3"]
+
+
+def test_additions_after_the_index_is_built():
+    wrapper = _wrapper(_entity("X:1", "root", "thing"), _entity("X:2", "child", "root"))
+    assert _ids(wrapper.get_descendants("X:1")) == ["X:2"]
+
+    # A new leaf, then a class that was an unresolved parent and a class moving existing ones under it
+    wrapper.add_entity(_entity("X:3", "grandchild", "child"))
+    wrapper.add_entity(_entity("X:4", "orphan", "later"))
+    wrapper.add_entity(_entity("X:5", "later", "child"))
+
+    assert _ids(wrapper.get_descendants("X:1")) == ["X:2", "X:3", "X:4", "X:5"]
+    assert [e.id for e in wrapper.get_ancestors("orphan")] == ["X:5", "X:2", "X:1"]
+    assert wrapper.is_descendant_of("X:4", "child")
+
+
+def test_ancestors_on_cycles_are_listed_once():
+    wrapper = _wrapper(_entity("X:1", "a", "b"), _entity("X:2", "b", "a"), _entity("X:3", "c", "a"))
+
+    assert "X:3" in _ids(wrapper.get_descendants("X:1"))
+    assert [e.id for e in wrapper.get_ancestors("X:3")] == ["X:1", "X:2"]
+    assert [e.id for e in wrapper.get_ancestors("X:1")] == ["X:2"]
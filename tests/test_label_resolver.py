@@ -0,0 +1,38 @@
+import openpyxl
+
+from ontoutils import RobotTemplateWrapper
+from ontoutils.label_resolver import LabelResolver, normalise_label
+
+
+def _wrapper(make_workbook):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent", "Synonyms"],
+                                           ["X:1", "Behaviour  change", "thing", "conduct change"],
+                                           ["X:2", "habit", "behaviour change", None],
+                                           ["X:3", "routine", "Behaviour\nchange", None]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    return wrapper
+
+
+def test_resolver_and_wrapper_agree(tmp_path, make_workbook):
+    wrapper = _wrapper(make_workbook)
+    resolver = LabelResolver.from_wrapper(wrapper)
+
+    for reference in ("behaviour change", " Behaviour\tchange ", "CONDUCT CHANGE"):
+        assert resolver.resolve(reference) is wrapper.get_entity(reference)
+    assert [i.value for i in wrapper.validate().issues] == ["thing"]
+    assert list(wrapper.suggest_unresolved_references()) == ["thing"]
+
+    output = str(tmp_path / "written.xlsx")
+    wrapper.write_spreadsheet(output, "ID")
+    rows = {row[0]: row for row in openpyxl.load_workbook(output).active.iter_rows(min_row=2, values_only=True)}
+    assert rows["X:2"][2] == rows["X:3"][2] == "Behaviour  change"
+
+
+def test_suggestions_for_near_misses(make_workbook):
+    resolver = LabelResolver.from_wrapper(_wrapper(make_workbook))
+
+    assert resolver.resolve("behavior change") is None
+    [best, *_] = resolver.suggest("behavior change")
+    assert best.label == normalise_label("Behaviour change") and best.entity.id == "X:1"
+    assert resolver.suggest("zzz") == []
@@ -0,0 +1,63 @@
+from ontoutils.lucid_chart import Entity, Relation
+from ontoutils.lucid_graph import CausalGraph
+
+
+def _graph(*edges, rel_type="influences"):
+    entities = {}
+    relations = []
+    for source, target in edges:
+        for name in (source, target):
+            entities.setdefault(name, Entity(name, name))
+        relations.append(Relation(entities[source], rel_type, entities[target]))
+    return CausalGraph(entities, relations)
+
+
+def _ids(entities):
+    return [e.id for e in entities]
+
+
+def test_start_entity_on_cycle_is_reachable():
+    graph = _graph(("a", "b"), ("b", "c"), ("c", "a"), ("c", "d"))
+
+    assert _ids(graph.downstream("a")) == ["b", "c", "a", "d"]
+    assert _ids(graph.upstream("a")) == ["c", "b", "a"]
+
+
+def test_start_entity_not_on_cycle_is_excluded():
+    graph = _graph(("a", "b"), ("b", "c"), ("x", "a"))
+
+    assert _ids(graph.downstream("a")) == ["b", "c"]
+    assert _ids(graph.reachable(["a", "x"])) == ["b", "a", "c"]
+    assert _ids(graph.downstream("c")) == []
+
+
+def test_relation_types_and_paths():
+    graph = _graph(("a", "b"), ("b", "c"))
+    graph_with_other = CausalGraph({e.id: e for e in graph.entities},
+                                   [Relation(graph.entities[0], "influences", graph.entities[1]),
+                                    Relation(graph.entities[1], "prevents", graph.entities[2])])
+
+    assert _ids(graph_with_other.downstream("a", ["influences"])) == ["b"]
+    assert _ids(graph.shortest_path("a", "c")) == ["a", "b", "c"]
+    assert graph.shortest_path("c", "a") is None
+
+
+def test_strongly_connected_components():
+    graph = _graph(("a", "b"), ("b", "a"), ("b", "c"))
+
+    components = sorted(sorted(_ids(c)) for c in graph.strongly_connected_components())
+    assert components == [["a", "b"], ["c"]]
+
+
+def test_transitive_closure():
+    graph = _graph(("a", "b"), ("b", "a"), ("b", "c"), ("c", "d"), ("x", "c"))
+    closure = graph.transitive_closure()
+
+    assert sorted(_ids(closure.reachable("a"))) == ["a", "b", "c", "d"]
+    assert _ids(closure.reachable("c")) == ["d"]
+    assert _ids(closure.reachable("d")) == []
+    for source in ("a", "b", "c", "d", "x"):
+        for target in ("a", "b", "c", "d", "x"):
+            expected = target in _ids(graph.downstream(source))
+            assert closure.is_reachable(source, target) == expected
+            assert graph.is_reachable(source, target) == expected
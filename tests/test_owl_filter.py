@@ -0,0 +1,95 @@
+import gzip
+
+import pytest
+
+from ontoutils.RobotImportsWrapper import RobotImportsWrapper
+from ontoutils.owl_filter import NotRdfXml, read_term_file, remove_annotation_properties
+from ontoutils.owl_reader import read_ontology
+
+ONTOLOGY = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:obo="http://purl.obolibrary.org/obo/"
+     xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:AnnotationProperty rdf:about="http://purl.obolibrary.org/obo/IAO_0000117">
+        <rdfs:label>term editor</rdfs:label>
+    </owl:AnnotationProperty>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/TEST_1">
+        <rdfs:label>one</rdfs:label>
+        <obo:IAO_0000117>someone</obo:IAO_0000117>
+        <rdfs:comment>kept</rdfs:comment>
+    </owl:Class>
+    <owl:Axiom>
+        <owl:annotatedSource rdf:resource="http://purl.obolibrary.org/obo/TEST_1"/>
+        <owl:annotatedProperty rdf:resource="http://purl.obolibrary.org/obo/IAO_0000117"/>
+        <owl:annotatedTarget>someone</owl:annotatedTarget>
+        <obo:IAO_0000117>someone else</obo:IAO_0000117>
+        <rdfs:comment>about the editor</rdfs:comment>
+    </owl:Axiom>
+    <owl:Axiom>
+        <owl:annotatedSource rdf:resource="http://purl.obolibrary.org/obo/TEST_1"/>
+        <owl:annotatedProperty rdf:resource="http://www.w3.org/2000/01/rdf-schema#comment"/>
+        <owl:annotatedTarget>kept</owl:annotatedTarget>
+        <obo:IAO_0000117>on a kept axiom</obo:IAO_0000117>
+    </owl:Axiom>
+</rdf:RDF>
+'''
+
+EDITOR = "http://purl.obolibrary.org/obo/IAO_0000117"
+COMMENT = "http://www.w3.org/2000/01/rdf-schema#comment"
+
+
+def test_removed_annotations_are_counted_once(tmp_path):
+    source = tmp_path / "test.owl"
+    source.write_text(ONTOLOGY)
+    output = tmp_path / "filtered.owl.gz"
+
+    # The editor annotation on TEST_1, the label of the property, the axiom about the editor annotation (with the
+    # annotation inside it) and the editor annotation on the kept axiom
+    assert remove_annotation_properties(str(source), [EDITOR], str(output)) == 4
+
+    with gzip.open(output, "rt") as f:
+        filtered = f.read()
+    assert "someone" not in filtered and "term editor" not in filtered and "on a kept axiom" not in filtered
+    document = read_ontology(str(output))
+    assert document.resources["http://purl.obolibrary.org/obo/TEST_1"].annotations[COMMENT] == ["kept"]
+    assert document.resources[EDITOR].annotations == {}
+
+
+def test_term_file(tmp_path):
+    terms = tmp_path / "terms.txt"
+    terms.write_text("# metadata\nIAO:0000117 term editor\n\nrdfs:comment\n")
+    assert read_term_file(str(terms)) == {EDITOR, COMMENT}
+
+
+OWL_XML = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" ontologyIRI="http://example.org/test.owl">
+    <AnnotationAssertion>
+        <AnnotationProperty IRI="http://purl.obolibrary.org/obo/IAO_0000117"/>
+        <IRI>http://purl.obolibrary.org/obo/TEST_1</IRI>
+        <Literal>someone</Literal>
+    </AnnotationAssertion>
+</Ontology>
+'''
+
+
+def test_owl_xml_is_left_to_robot(tmp_path, fake_robot):
+    source = tmp_path / "test.owl"
+    source.write_text(OWL_XML)
+    with pytest.raises(NotRdfXml):
+        remove_annotation_properties(str(source), [EDITOR])
+    assert source.read_text() == OWL_XML and sorted(p.name for p in tmp_path.iterdir()) == ["robot", "test.owl"]
+
+    terms = tmp_path / "terms.txt"
+    terms.write_text("IAO:0000117\n")
+    RobotImportsWrapper(fake_robot).removeProblemMetadata(None, str(source), str(terms))
+    [command] = (tmp_path / "robot.log").read_text().splitlines()
+    assert command.startswith(f"remove --input {source} --term-file {terms}")
+
+
+def test_failed_filter_leaves_no_partial_file(tmp_path):
+    source = tmp_path / "test.owl.gz"
+    source.write_bytes(gzip.compress(ONTOLOGY[:200].encode()))
+    with pytest.raises(Exception):
+        remove_annotation_properties(str(source), [EDITOR])
+    assert [p.name for p in tmp_path.iterdir()] == ["test.owl.gz"]
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from ontoutils.owl_reader import read_ontology
+from ontoutils.owl_to_obo import UnsupportedConstruct, convert_to_obo
+
+OWL_HEADER = '''<?xml version="1.0"?>
+<rdf:RDF xmlns="http://purl.obolibrary.org/obo/test.owl#"
+     xmlns:obo="http://purl.obolibrary.org/obo/"
+     xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:Ontology rdf:about="http://purl.obolibrary.org/obo/test.owl"/>
+'''
+
+
+def _write_owl(tmp_path, body: str) -> str:
+    path = tmp_path / "test.owl"
+    path.write_text(OWL_HEADER + body + "</rdf:RDF>\n", encoding="utf-8")
+    return str(path)
+
+
+def _stanzas(obo_file_name) -> list[list[str]]:
+    with open(obo_file_name, encoding="utf-8") as f:
+        return [block.splitlines() for block in f.read().split("\n\n")[1:]]
+
+
+def test_values_are_escaped(tmp_path):
+    owl = _write_owl(tmp_path, '''
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/TEST_1">
+        <rdfs:label>a \\ b ! c</rdfs:label>
+        <rdfs:comment>line one
+line two</rdfs:comment>
+        <obo:IAO_0000115>the "quoted" one</obo:IAO_0000115>
+    </owl:Class>
+''')
+    obo = str(tmp_path / "test.obo")
+    assert convert_to_obo(owl, obo) == 1
+
+    [stanza] = _stanzas(obo)
+    assert stanza == ["[Term]",
+                      "id: TEST:1",
+                      "name: a \\\\ b \\! c",
+                      'def: "the \\"quoted\\" one" []',
+                      "comment: line one\\nline two"]
+
+
+def test_repeated_descriptions_are_merged(tmp_path):
+    owl = _write_owl(tmp_path, '''
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/TEST_1">
+        <rdfs:label>one</rdfs:label>
+    </owl:Class>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/TEST_2">
+        <rdfs:label>two</rdfs:label>
+    </owl:Class>
+    <rdf:Description rdf:about="http://purl.obolibrary.org/obo/TEST_1">
+        <rdfs:subClassOf rdf:resource="http://purl.obolibrary.org/obo/TEST_2"/>
+        <rdfs:label>one</rdfs:label>
+    </rdf:Description>
+''')
+    obo = str(tmp_path / "test.obo")
+    graph = str(tmp_path / "test.json")
+    assert convert_to_obo(owl, obo, graph) == 2
+
+    stanzas = _stanzas(obo)
+    assert [s[1] for s in stanzas] == ["id: TEST:2", "id: TEST:1"]
+    assert stanzas[1] == ["[Term]", "id: TEST:1", "name: one", "is_a: TEST:2"]
+    with open(graph) as f:
+        nodes = json.load(f)["graphs"][0]["nodes"]
+    assert sorted(n["id"] for n in nodes) == ["http://purl.obolibrary.org/obo/TEST_1",
+                                              "http://purl.obolibrary.org/obo/TEST_2"]
+    assert read_ontology(owl).resources["http://purl.obolibrary.org/obo/TEST_1"].annotations[
+               "http://www.w3.org/2000/01/rdf-schema#label"] == ["one"]
+
+
+def test_unsupported_construct_keeps_output(tmp_path):
+    obo = tmp_path / "test.obo"
+    obo.write_text("previous")
+    owl = _write_owl(tmp_path, '''
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/TEST_1">
+        <owl:equivalentClass><owl:Class/></owl:equivalentClass>
+    </owl:Class>
+''')
+    with pytest.raises(UnsupportedConstruct):
+        convert_to_obo(owl, str(obo))
+    assert obo.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir() if ".part" in p.name] == []
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from ontoutils import RobotTemplateWrapper
+from ontoutils.snapshot import is_snapshot_current, load_snapshot, save_snapshot
+
+
+def test_snapshot_round_trip(tmp_path, make_workbook):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent", "Definition"],
+                                           ["X:1", "thing a", "thing", "first"],
+                                           ["X:2", "thing b", "thing a", "second"]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    snapshot = str(tmp_path / "classes.snapshot")
+    save_snapshot(wrapper, snapshot, [sheet])
+
+    assert is_snapshot_current(snapshot)
+    restored = load_snapshot(snapshot, "robot")
+    assert [e.id for e in restored.entities] == ["X:1", "X:2"]
+    assert restored.get_entity("thing b").definition == "second"
+    assert restored.get_ancestors("X:2")[0].id == "X:1"
+
+
+def test_changed_source_makes_snapshot_stale(tmp_path, make_workbook):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent"], ["X:1", "thing a", "thing"]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    snapshot = str(tmp_path / "classes.snapshot")
+    save_snapshot(wrapper, snapshot, [sheet])
+
+    stat = os.stat(sheet)
+    os.utime(sheet, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_snapshot(snapshot, "robot") is None
+    assert load_snapshot(snapshot, "robot", check_sources=False) is not None
+
+
+def test_indexes_are_restored_on_first_use(tmp_path, make_workbook):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent"], ["X:1", "thing a", "thing"],
+                                           ["X:2", "thing b", "thing a"]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    snapshot = str(tmp_path / "classes.snapshot")
+    save_snapshot(wrapper, snapshot, [sheet])
+
+    restored = load_snapshot(snapshot, "robot")
+    assert "all_entity_ids" not in vars(restored)
+    assert restored.all_entity_ids["X:2"] is restored.entities[1]
+    assert restored.all_entity_names["thing a"] is restored.entities[0]
+    assert restored.parents_to_children == wrapper.parents_to_children
+
+
+def test_failed_save_leaves_no_partial_file(tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        save_snapshot(RobotTemplateWrapper("robot"), str(tmp_path / "classes.snapshot"))
+    assert list(tmp_path.iterdir()) == []
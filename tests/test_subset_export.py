@@ -0,0 +1,71 @@
+import csv
+import gzip
+
+import pytest
+
+from ontoutils import OntologyRelation, RobotSubsetWrapper, RobotTemplateWrapper
+from ontoutils.subset_export import sort_rows
+
+
+def _wrapper(make_workbook):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent", "Definition", "Synonyms", "Curation status"],
+                                           ["X:1", "behaviour", "thing", "Doing", None, None],
+                                           ["X:2", "habit", "behaviour", "Settled", "custom;wont", None],
+                                           ["X:3", "routine", "habit", None, None, None],
+                                           ["X:4", "ritual", "habit", None, None, None],
+                                           ["X:5", "act", "behaviour", None, None, None],
+                                           ["X:6", "gesture", "act", None, None, None],
+                                           ["X:7", "old", "behaviour", None, None, "Obsolete"]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    return wrapper
+
+
+@pytest.mark.parametrize("intermediates, expected", [
+    ("all", [["X:1", "behaviour", ""], ["X:2", "habit", "behaviour"], ["X:3", "routine", "habit"],
+             ["X:4", "ritual", "habit"], ["X:5", "act", "behaviour"], ["X:6", "gesture", "act"]]),
+    ("minimal", [["X:1", "behaviour", ""], ["X:2", "habit", "behaviour"], ["X:3", "routine", "habit"],
+                 ["X:4", "ritual", "habit"], ["X:6", "gesture", "behaviour"]]),
+    ("none", [["X:1", "behaviour", ""], ["X:3", "routine", "behaviour"], ["X:4", "ritual", "behaviour"],
+              ["X:6", "gesture", "behaviour"]])])
+def test_subset_intermediates(tmp_path, make_workbook, intermediates, expected):
+    output = str(tmp_path / "subset.csv")
+    RobotSubsetWrapper("robot").create_subset_from_entities(_wrapper(make_workbook), output, "Behaviour",
+                                                            "ID|LABEL|SubClass Of", intermediates=intermediates)
+    with open(output, newline='') as f:
+        assert list(csv.reader(f)) == [["ID", "LABEL", "SubClass Of"], *expected]
+
+
+def test_subset_annotations_compressed(tmp_path, make_workbook):
+    output = str(tmp_path / "subset.tsv.gz")
+    RobotSubsetWrapper("robot").create_subset_from_entities(_wrapper(make_workbook), output, "X:2",
+                                                            "LABEL|definition|Synonyms|IRI", export_sort="*LABEL",
+                                                            id_prefix='"X: http://example.org/X_"')
+    with gzip.open(output, "rt", newline='') as f:
+        assert list(csv.reader(f, delimiter="\t")) == [
+            ["LABEL", "definition", "Synonyms", "IRI"],
+            ["routine", "", "", "http://example.org/X_3"],
+            ["ritual", "", "", "http://example.org/X_4"],
+            ["habit", "Settled", "custom; wont", "http://example.org/X_2"]]
+
+
+def test_subset_rejects_unknown_columns(tmp_path, make_workbook):
+    with pytest.raises(Exception, match="Unable to export column 'colour'"):
+        RobotSubsetWrapper("robot").create_subset_from_entities(_wrapper(make_workbook), str(tmp_path / "s.csv"),
+                                                                "X:1", "ID|colour")
+    with pytest.raises(Exception, match="Sort column 'colour'"):
+        sort_rows(["ID"], [["X:1"]], "colour")
+
+
+def test_related_targets_are_listed_once(tmp_path, make_workbook):
+    wrapper = _wrapper(make_workbook)
+    relation = OntologyRelation("BFO:0000051", "has part")
+    wrapper.all_rel_names["has part"] = relation
+    habit = wrapper.get_entity("X:2")
+    habit.relation_targets = {"'has part'": ["Routine", "ritual", "routine"]}
+    habit.relations = {"has part": [wrapper.get_entity("X:3"), wrapper.get_entity("X:6")]}
+
+    output = str(tmp_path / "subset.csv")
+    RobotSubsetWrapper("robot").create_subset_from_entities(wrapper, output, "X:2", "LABEL|has part")
+    with open(output, newline='') as f:
+        assert list(csv.reader(f))[1] == ["habit", "routine; gesture; ritual"]
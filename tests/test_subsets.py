@@ -0,0 +1,74 @@
+import csv
+
+from ontoutils import RobotSubsetWrapper
+from ontoutils.RobotSubsetWrapper import SubsetSpec
+
+ID_PREFIX = '"X: http://example.org/X_"'
+
+ONTOLOGY = """<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xmlns:obo="http://purl.obolibrary.org/obo/">
+    <owl:Ontology rdf:about="http://example.org/x.owl"/>
+    <owl:AnnotationProperty rdf:about="http://purl.obolibrary.org/obo/IAO_0000115">
+        <rdfs:label>definition</rdfs:label>
+    </owl:AnnotationProperty>
+    <owl:Class rdf:about="http://example.org/X_1">
+        <rdfs:label>behaviour</rdfs:label>
+        <rdfs:subClassOf rdf:resource="http://example.org/X_0"/>
+    </owl:Class>
+    <owl:Class rdf:about="http://example.org/X_3">
+        <rdfs:label>routine</rdfs:label>
+        <rdfs:subClassOf rdf:resource="http://example.org/X_2"/>
+        <rdfs:subClassOf rdf:resource="http://example.org/X_1"/>
+        <obo:IAO_0000115>A repeated habit</obo:IAO_0000115>
+    </owl:Class>
+    <owl:Class rdf:about="http://example.org/X_2">
+        <rdfs:label>habit</rdfs:label>
+        <rdfs:subClassOf rdf:resource="http://example.org/X_1"/>
+    </owl:Class>
+    <rdf:Description rdf:about="http://example.org/X_2">
+        <obo:IAO_0000115>A settled tendency</obo:IAO_0000115>
+    </rdf:Description>
+</rdf:RDF>
+"""
+
+
+def _read_table(file_name, delimiter=","):
+    with open(file_name, newline='') as f:
+        return list(csv.reader(f, delimiter=delimiter))
+
+
+def test_batch_subsets_from_one_load(tmp_path, fake_robot):
+    ontology = tmp_path / "x.owl"
+    ontology.write_text(ONTOLOGY)
+    specs = [SubsetSpec("X:1", str(tmp_path / "behaviour.csv"), "ID|LABEL|SubClass Of|definition"),
+             SubsetSpec("X:2", str(tmp_path / "habit.tsv"), "LABEL|IAO:0000115", export_sort="*LABEL"),
+             SubsetSpec("X:2", str(tmp_path / "habit.owl"))]
+
+    RobotSubsetWrapper(fake_robot).create_subsets_from(str(ontology), specs, ID_PREFIX, max_workers=2)
+
+    assert _read_table(tmp_path / "behaviour.csv") == [["ID", "LABEL", "SubClass Of", "definition"],
+                                                       ["X:1", "behaviour", "", ""],
+                                                       ["X:2", "habit", "behaviour", "A settled tendency"],
+                                                       ["X:3", "routine", "habit; behaviour", "A repeated habit"]]
+    assert _read_table(tmp_path / "habit.tsv", "\t") == [["LABEL", "IAO:0000115"],
+                                                         ["routine", "A repeated habit"],
+                                                         ["habit", "A settled tendency"]]
+    # Only the OWL subset needs ROBOT
+    [command] = (tmp_path / "robot.log").read_text().splitlines()
+    assert "--branch-from-term X:2" in command and command.endswith(str(tmp_path / "habit.owl"))
+
+
+def test_batch_subsets_fall_back_to_robot_for_imports(tmp_path, fake_robot):
+    ontology = tmp_path / "x.owl"
+    ontology.write_text(ONTOLOGY.replace('<owl:Ontology rdf:about="http://example.org/x.owl"/>',
+                                         '<owl:Ontology rdf:about="http://example.org/x.owl">'
+                                         '<owl:imports rdf:resource="http://example.org/y.owl"/></owl:Ontology>'))
+
+    RobotSubsetWrapper(fake_robot).create_subsets_from(
+        str(ontology), [SubsetSpec("X:1", str(tmp_path / "behaviour.csv"), "ID|LABEL")], ID_PREFIX)
+
+    [command] = (tmp_path / "robot.log").read_text().splitlines()
+    assert "--header ID|LABEL" in command and "--export " + str(tmp_path / "behaviour.csv") in command
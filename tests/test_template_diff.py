@@ -0,0 +1,50 @@
+from ontoutils import OntologyEntity, OntologyRelation, RobotTemplateWrapper
+from ontoutils.template_diff import EntityChange, diff_templates, entity_signature
+
+
+def _entity(entity_id, name, parent="thing"):
+    entity = OntologyEntity()
+    entity.id = entity_id
+    entity.name = name
+    entity.parent = parent
+    entity.synonyms = []
+    return entity
+
+
+def _wrapper(*entities):
+    wrapper = RobotTemplateWrapper("robot")
+    for entity in entities:
+        wrapper.add_entity(entity)
+    relation = OntologyRelation("BFO:0000051", "has part")
+    wrapper.all_rel_names["has part"] = relation
+    wrapper.all_rel_ids[relation.id] = relation
+    return wrapper
+
+
+def test_relations_from_columns_and_lucidchart_are_one_relation():
+    part = _entity("X:2", "part")
+    from_sheet = _entity("X:1", "whole")
+    from_sheet.relation_targets = {"'has part'": ["part"]}
+    merged = _entity("X:1", "whole")
+    merged.relation_targets = {"'has part'": ["Part"]}
+    merged.relations = {"has part": [part]}
+
+    assert len(diff_templates(_wrapper(from_sheet, part), _wrapper(merged, part))) == 0
+
+    changed = _entity("X:1", "whole")
+    changed.relation_targets = {"'has part'": ["part"]}
+    changed.relations = {"has part": [_entity("X:3", "other part")]}
+    [change] = diff_templates(_wrapper(from_sheet, part), _wrapper(changed, part)).changes
+    assert change.kinds == [EntityChange.RELATIONS_CHANGED]
+
+
+def test_changes_are_classified():
+    old = _wrapper(_entity("X:1", "one"), _entity("X:2", "two"), _entity("X:3", "three"))
+    relabeled = _entity("X:1", "one renamed")
+    reparented = _entity("X:2", "two", parent="one")
+    new = _wrapper(relabeled, reparented, _entity("X:4", "four"))
+
+    changes = {c.entity_id: c.kinds for c in diff_templates(old, new).changes}
+    assert changes == {"X:1": [EntityChange.RELABELED], "X:2": [EntityChange.REPARENTED],
+                       "X:3": [EntityChange.REMOVED], "X:4": [EntityChange.ADDED]}
+    assert entity_signature(relabeled)["hash"] != entity_signature(_entity("X:1", "one"))["hash"]
@@ -0,0 +1,94 @@
+import csv
+import glob
+import os
+
+from ontoutils import RobotTemplateWrapper
+
+ID_PREFIXES = ['"X: http://example.org/X_"']
+
+
+def _template(tmp_path, make_workbook, fake_robot, count):
+    sheet = make_workbook("classes.xlsx", [["ID", "Name", "Parent"],
+                                           *[[f"X:{i}", f"class {i} & co", "thing"] for i in range(count)]])
+    wrapper = RobotTemplateWrapper(fake_robot)
+    csv_file_name = str(tmp_path / "classes.csv")
+    wrapper.add_classes_from_excel(sheet, csv_file_name)
+    return wrapper, csv_file_name
+
+
+def _robot_commands(tmp_path):
+    return (tmp_path / "robot.log").read_text().splitlines()
+
+
+def test_shards_cover_all_rows_once(tmp_path, make_workbook, fake_robot):
+    wrapper, csv_file_name = _template(tmp_path, make_workbook, fake_robot, 5)
+    wrapper.cleanup = False
+    output = str(tmp_path / "classes.owl")
+
+    assert wrapper.createOntologyFromTemplateFile(csv_file_name, None, "http://example.org/", ID_PREFIXES,
+                                                  "http://example.org/classes.owl", output, shards=2) == 0
+
+    [work_dir] = glob.glob(str(tmp_path / "classes.owl.shards.*"))
+    shard_rows = []
+    for shard in ("shard-0.csv", "shard-1.csv"):
+        with open(os.path.join(work_dir, shard), newline='') as f:
+            shard_rows.append([row[0] for row in list(csv.reader(f))[2:]])
+    assert shard_rows == [["X:0", "X:1", "X:2"], ["X:3", "X:4"]]
+
+    with open(os.path.join(work_dir, "labels.csv"), newline='') as f:
+        label_rows = list(csv.reader(f))
+    assert label_rows[:2] == [["ID", "Name"], ["ID", "LABEL"]]
+    assert label_rows[2:] == [[f"X:{i}", f"class {i} & co"] for i in range(5)]
+
+    label_command, *shard_commands, merge_command = _robot_commands(tmp_path)
+    assert label_command.endswith("--output " + os.path.join(work_dir, "labels.owl"))
+    assert len(shard_commands) == 2 and all("--input " + os.path.join(work_dir, "labels.owl") in c
+                                            for c in shard_commands)
+    assert merge_command.endswith("--ontology-iri http://example.org/classes.owl --output " + output)
+    assert os.path.exists(output)
+
+
+def _options(command, *names):
+    words = command.split()
+    return [(w, words[i + 1]) for i, w in enumerate(words) if w in names]
+
+
+def test_sharded_build_uses_the_options_of_the_unsharded_build(tmp_path, make_workbook, fake_robot):
+    wrapper, csv_file_name = _template(tmp_path, make_workbook, fake_robot, 4)
+    wrapper.cleanup = False
+    prefixes = ['"X: http://example.org/X_"', '"Y: http://example.org/Y_"']
+    for shards in (1, 2):
+        assert wrapper.createOntologyFromTemplateFile(csv_file_name, "a.owl,b.owl", "http://example.org/", prefixes,
+                                                      "http://example.org/classes.owl",
+                                                      str(tmp_path / f"classes-{shards}.owl"), shards=shards,
+                                                      dependencyFileName=str(tmp_path / "imports.owl")) == 0
+
+    [work_dir] = glob.glob(str(tmp_path / "classes-2.owl.shards.*"))
+    single, label_command, *shard_commands, merge_command = _robot_commands(tmp_path)
+    # ROBOT expands the IDs of every row with the same prefixes
+    for command in (single, label_command, *shard_commands):
+        assert "--prefix X: http://example.org/X_ --prefix Y: http://example.org/Y_ " in command
+    assert _options(merge_command, "--ontology-iri") == _options(single, "--ontology-iri")
+    # The same dependencies are merged into the output
+    assert (tmp_path / "imports.owl").read_text() == open(os.path.join(work_dir, "imports.owl")).read()
+    assert "--collapse-import-closure false" in single and "--collapse-import-closure false" in merge_command
+
+
+def test_small_templates_are_not_sharded(tmp_path, make_workbook, fake_robot):
+    wrapper, csv_file_name = _template(tmp_path, make_workbook, fake_robot, 1)
+
+    assert wrapper.createOntologyFromTemplateFile(csv_file_name, None, "http://example.org/", ID_PREFIXES,
+                                                  "http://example.org/classes.owl",
+                                                  str(tmp_path / "classes.owl"), shards=4) == 0
+    [command] = _robot_commands(tmp_path)
+    assert command.split()[0:2] == ["template", "--template"]
+
+
+def test_failed_merge_leaves_no_output(tmp_path, make_workbook, fake_robot):
+    wrapper, csv_file_name = _template(tmp_path, make_workbook, fake_robot, 4)
+    output = str(tmp_path / "broken.owl")
+
+    assert wrapper.createOntologyFromTemplateFile(csv_file_name, None, "http://example.org/", ID_PREFIXES,
+                                                  "http://example.org/broken.owl", output, shards=2) == 1
+    assert not os.path.exists(output)
+    assert glob.glob(str(tmp_path / "broken.owl.shards.*")) == []
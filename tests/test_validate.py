@@ -0,0 +1,43 @@
+from ontoutils import RobotTemplateWrapper
+from ontoutils.core import IssueType, Severity
+
+
+def _validate(make_workbook, rows):
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(make_workbook("classes.xlsx", [["ID", "Name", "Parent", "Synonyms",
+                                                                   "Curation status"], *rows]))
+    return wrapper.validate()
+
+
+def test_consistent_sheet_has_no_issues(make_workbook):
+    report = _validate(make_workbook, [["X:1", "behaviour", "thing", None, None],
+                                       ["X:2", "habit", "behaviour", "routine", None]])
+
+    assert [i.issue_type for i in report] == [IssueType.DANGLING_PARENT]
+    assert not report.has_errors and len(report.warnings) == 1
+
+
+def test_reports_duplicates_and_collisions(make_workbook):
+    report = _validate(make_workbook, [["X:1", "behaviour", "thing", "conduct", None],
+                                       ["X:1", "habit", "behaviour", "Behaviour", None],
+                                       ["X:3", "Habit", "behaviour", "conduct", None]])
+
+    assert [i.value for i in report.by_type(IssueType.DUPLICATE_ID)] == ["X:1"]
+    assert [i.value for i in report.by_type(IssueType.DUPLICATE_LABEL)] == ["Habit"]
+    assert sorted(i.value for i in report.by_type(IssueType.LABEL_SYNONYM_COLLISION)) == ["behaviour", "conduct"]
+    assert report.has_errors
+
+
+def test_reports_cycles_once_and_obsolete_parents(make_workbook):
+    report = _validate(make_workbook, [["X:1", "a", "c", None, None],
+                                       ["X:2", "b", "a", None, None],
+                                       ["X:3", "c", "b", None, None],
+                                       ["X:4", "d", "c", None, None],
+                                       ["X:5", "old", "thing", None, "Obsolete"],
+                                       ["X:6", "new", "old", None, None]])
+
+    [cycle] = report.by_type(IssueType.CYCLE)
+    assert sorted(cycle.related) == ["X:1", "X:2", "X:3"] and cycle.severity == Severity.ERROR
+    [obsolete] = report.by_type(IssueType.OBSOLETE_PARENT)
+    assert obsolete.entity_id == "X:6" and obsolete.related == ["X:5"]
+    assert report.to_dict()["errors"] == 2
@@ -0,0 +1,44 @@
+import os
+
+from ontoutils.watch import TemplateWatcher, WatchTarget
+
+
+def _touch_later(file_name):
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_poll_rebuilds_only_the_saved_sheet(tmp_path, make_workbook, fake_robot):
+    upper = make_workbook("upper.xlsx", [["ID", "Name", "Parent"], ["X:1", "behaviour", "thing"]])
+    lower = make_workbook("lower.xlsx", [["ID", "Name", "Parent"], ["X:2", "habit", "behaviour"]])
+    targets = [WatchTarget(upper, str(tmp_path / "upper.owl"), "http://example.org/upper.owl"),
+               WatchTarget(lower, str(tmp_path / "lower.owl"), "http://example.org/lower.owl")]
+    built = []
+    watcher = TemplateWatcher(fake_robot, targets, "http://example.org/", ['"X: http://example.org/X_"'],
+                              debounce=0, on_build=built.append)
+
+    for target in targets:
+        assert watcher.rebuild(target).success
+    assert watcher.poll() == []
+
+    make_workbook("upper.xlsx", [["ID", "Name", "Parent"], ["X:1", "behaviour change", "thing"]])
+    _touch_later(upper)
+    assert watcher.poll() == []  # waits for the save to settle
+    [result] = watcher.poll()
+
+    assert result.success and result.target is targets[0] and result.validation_errors == 0
+    assert [r.target for r in built] == [targets[0], targets[1], targets[0]]
+    assert sorted(e.name for e in watcher.wrapper.entities) == ["behaviour change", "habit"]
+    assert "behaviour" not in watcher.wrapper.all_entity_names
+    assert len((tmp_path / "robot.log").read_text().splitlines()) == 3
+
+
+def test_rebuild_reports_failures(tmp_path, make_workbook, fake_robot):
+    sheet = make_workbook("upper.xlsx", [["ID", "Name", "Parent"], ["X:1", "behaviour", "thing"]])
+    watcher = TemplateWatcher(fake_robot, [], "http://example.org/", [])
+
+    result = watcher.rebuild(WatchTarget(sheet, str(tmp_path / "broken.owl"), "http://example.org/broken.owl"))
+    assert not result.success and result.error == "ROBOT exited with 1"
+
+    result = watcher.rebuild(WatchTarget(str(tmp_path / "missing.xlsx"), str(tmp_path / "m.owl"), "http://e.org/m"))
+    assert not result.success and "missing.xlsx" in result.error
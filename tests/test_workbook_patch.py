@@ -0,0 +1,177 @@
+import zipfile
+
+import openpyxl
+import pytest
+from openpyxl.styles import Font
+
+from ontoutils import RobotTemplateWrapper
+from ontoutils.workbook_patch import WorkbookPatch, column_index, column_letters, patch_workbook, read_sheet_headers
+
+HEADER = ["ID", "Name", "Parent", "Definition", "Synonyms", "REL 'has part'", "Curator extra"]
+
+
+@pytest.fixture
+def class_sheet(make_workbook):
+    return make_workbook("classes.xlsx", [HEADER,
+                                          ["X:1", "whole (rt)", "entity [BFO:1]", "first", "a;b", "part [X:2]", "x"],
+                                          ["X:2", "part", "entity / other", "second", None, None, "y"],
+                                          ["X:3", "other", "whole", "third", None, None, "z"]])
+
+
+def _rows(file_name):
+    sheet = openpyxl.load_workbook(file_name).active
+    return {row[0]: row for row in sheet.iter_rows(min_row=2, values_only=True)}
+
+
+def test_cells_are_patched_in_place(tmp_path, make_workbook):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(["ID", "Name", "Total"])
+    sheet.append(["X:1", "one", "=1+1"])
+    sheet.append(["X:2", "two", None])
+    sheet["B3"].font = Font(bold=True)
+    book.create_sheet("Other").append(["untouched"])
+    source = str(tmp_path / "book.xlsx")
+    book.save(source)
+
+    patch = WorkbookPatch()
+    patch.edit("X:1", "Total", "2")
+    patch.edit("X:2", "Name", " two\nlines ")
+    patch.edit("X:2", "Total", "new cell")
+    patch.edit("X:9", "Name", "missing")
+    patch.edit("X:1", "Unknown", "missing")
+    output = str(tmp_path / "patched.xlsx")
+    result = patch_workbook(source, patch, output)
+
+    assert (result.rows_patched, result.cells_written) == (1, 2)
+    assert result.skipped_cells == ["C2"]
+    assert result.missing_keys == ["X:9"] and result.missing_columns == ["Unknown"]
+
+    patched = openpyxl.load_workbook(output)
+    assert [[c.value for c in row] for row in patched.active.iter_rows()] == \
+           [["ID", "Name", "Total"], ["X:1", "one", "=1+1"], ["X:2", " two\nlines ", "new cell"]]
+    assert patched.active["B3"].font.bold
+    with zipfile.ZipFile(source) as before, zipfile.ZipFile(output) as after:
+        assert before.namelist() == after.namelist()
+        changed = [n for n in before.namelist() if before.read(n) != after.read(n)]
+    assert changed == ["xl/worksheets/sheet1.xml"]
+    assert read_sheet_headers(output) == ["ID", "Name", "Total"]
+
+
+def test_duplicate_keys_are_not_patched(tmp_path, make_workbook):
+    source = make_workbook("dup.xlsx", [["ID", "Name"], ["X:3", "a"], ["X:4", "b"], ["X:3", "c"]])
+    with open(source, "rb") as f:
+        before = f.read()
+
+    patch = WorkbookPatch()
+    patch.edit("X:3", "Name", "changed")
+    with pytest.raises(Exception, match="X:3"):
+        patch_workbook(source, patch)
+    with open(source, "rb") as f:
+        assert f.read() == before
+    assert [p.name for p in tmp_path.iterdir() if ".part" in p.name] == []
+
+    # Duplicates of keys that are not patched do not matter
+    patch = WorkbookPatch()
+    patch.edit("X:4", "Name", "changed")
+    assert patch_workbook(source, patch).rows_patched == 1
+    assert _rows(source)["X:4"][1] == "changed"
+
+
+def test_large_sheet(tmp_path, make_workbook):
+    source = make_workbook("large.xlsx", [["ID", "Name"]] + [[f"X:{i}", f"class {i}"] for i in range(20000)])
+    patch = WorkbookPatch()
+    for i in range(0, 20000, 997):
+        patch.edit(f"X:{i}", "Name", f"fixed {i}")
+    result = patch_workbook(source, patch)
+
+    assert result.rows_patched == 21 and result.missing_keys == []
+    rows = _rows(source)
+    assert rows["X:997"][1] == "fixed 997" and rows["X:998"][1] == "class 998" and rows["X:19940"][1] == "fixed 19940"
+
+
+def test_column_letters():
+    assert [column_letters(i) for i in (1, 26, 27, 703)] == ["A", "Z", "AA", "AAA"]
+    assert all(column_index(column_letters(i)) == i for i in range(1, 1000))
+
+
+def test_unchanged_fields_keep_their_cell_text(tmp_path, class_sheet):
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(class_sheet)
+    whole = wrapper.get_entity("X:1")
+    assert (whole.parent, whole.synonyms, whole.relation_targets) == ("entity", ["rt", "a", "b"], {"'has part'": ["part"]})
+
+    whole.definition = "changed"
+    wrapper.get_entity("X:2").definition = "second"
+    output = str(tmp_path / "patched.xlsx")
+    result = wrapper.patch_spreadsheet(class_sheet, wrapper.entities,
+                                       ["name", "parent", "definition", "synonyms", "relation_targets"],
+                                       output_file_name=output)
+
+    assert (result.rows_patched, result.cells_written) == (1, 1)
+    rows = _rows(output)
+    assert rows["X:1"] == ("X:1", "whole (rt)", "entity [BFO:1]", "changed", "a;b", "part [X:2]", "x")
+    assert rows["X:2"] == ("X:2", "part", "entity / other", "second", None, None, "y")
+
+
+def test_changed_fields_are_written(tmp_path, class_sheet):
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(class_sheet)
+    whole = wrapper.get_entity("X:1")
+    whole.name = "complete whole"
+    whole.parent = "object"
+    whole.synonyms = ["rt", "a", "c"]
+    whole.relation_targets = {"'has part'": ["part", "other"]}
+    other = wrapper.get_entity("X:3")
+    other.definition = None
+
+    wrapper.patch_spreadsheet(class_sheet, [whole, other],
+                              ["name", "parent", "definition", "synonyms", "relation_targets"])
+
+    rows = _rows(class_sheet)
+    assert rows["X:1"] == ("X:1", "complete whole (rt)", "object", "first", "a;c", "part;other", "x")
+    assert rows["X:3"] == ("X:3", "other", "whole", None, None, None, "z")
+
+
+def test_ids_are_written_by_label(tmp_path, make_workbook):
+    sheet = make_workbook("new.xlsx", [["ID", "Label (synonym)", "Parent"],
+                                       [None, "fresh  class (fc)", "thing"],
+                                       ["X:1", "known", "thing"]])
+    wrapper = RobotTemplateWrapper("robot")
+    wrapper.add_classes_from_excel(sheet)
+    wrapper.get_entity("fresh class").id = "X:2"
+
+    result = wrapper.patch_spreadsheet(sheet, wrapper.entities, ["id"], key_column="Label (synonym)")
+
+    assert result.cells_written == 1
+    assert [r[:2] for r in _rows(sheet).values()] == [("X:2", "fresh  class (fc)"), ("X:1", "known")]
+
+
+def _raw_members(file_name):
+    with zipfile.ZipFile(file_name) as zf, open(file_name, 'rb') as f:
+        members = {}
+        for info in zf.infolist():
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = int.from_bytes(f.read(2), "little"), int.from_bytes(f.read(2), "little")
+            f.seek(name_length + extra_length, 1)
+            members[info.filename] = (info.compress_type, f.read(info.compress_size))
+        assert zf.testzip() is None
+    return members
+
+
+@pytest.mark.parametrize("copy_raw", [True, False])
+def test_untouched_parts_keep_their_compressed_bytes(tmp_path, class_sheet, monkeypatch, copy_raw):
+    if not copy_raw:
+        monkeypatch.setattr("ontoutils.workbook_patch._can_copy_raw", lambda infos: False)
+    patch = WorkbookPatch()
+    patch.edit("X:2", "Definition", "changed")
+    output = str(tmp_path / "patched.xlsx")
+    patch_workbook(class_sheet, patch, output)
+
+    before, after = _raw_members(class_sheet), _raw_members(output)
+    assert list(before) == list(after)
+    changed = [name for name in before if before[name] != after[name]]
+    if copy_raw:
+        assert changed == ["xl/worksheets/sheet1.xml"]
+    assert _rows(output)["X:2"][3] == "changed" and _rows(output)["X:1"] == _rows(class_sheet)["X:1"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(["classes.xlsx", "patched.xlsx"])
@@ -0,0 +1,56 @@
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ontoutils import RobotTemplateWrapper
+from ontoutils.core import DEFAULT_HEADER_MAPPINGS, DEFAULT_HEADERS_TO_IGNORE, get_annotation_mapping
+from ontoutils.workspace import BuildWorkspace
+
+
+def _csv_header(file_name):
+    with open(file_name, newline='') as f:
+        return next(csv.reader(f))
+
+
+def test_concurrent_workspaces_do_not_share_headers(tmp_path, make_workbook):
+    defaults = (dict(DEFAULT_HEADER_MAPPINGS), list(DEFAULT_HEADERS_TO_IGNORE))
+    sheet_a = make_workbook("a.xlsx", [["ID", "Name", "Parent", "Notes", "REL 'has part'"],
+                                       ["A:1", "a", "thing", "ignored", "b"]])
+    sheet_b = make_workbook("b.xlsx", [["ID", "Name", "Parent", "Notes"],
+                                       ["B:1", "b", "thing", "kept"]])
+
+    def build(sheet, customise):
+        with BuildWorkspace(base_dir=str(tmp_path)) as workspace:
+            wrapper = RobotTemplateWrapper("robot", workspace)
+            customise(wrapper)
+            csv_file_name = workspace.path("template.csv")
+            wrapper.add_classes_from_excel(sheet, csv_file_name)
+            return wrapper, _csv_header(csv_file_name), workspace.root
+
+    def map_notes(wrapper):
+        wrapper.header_mapping["Notes"] = get_annotation_mapping("Notes", "rdfs:comment")
+
+    with ThreadPoolExecutor(2) as executor:
+        future_a = executor.submit(build, sheet_a, lambda w: None)
+        future_b = executor.submit(build, sheet_b, map_notes)
+        wrapper_a, header_a, root_a = future_a.result()
+        wrapper_b, header_b, root_b = future_b.result()
+
+    assert header_a == ["ID", "Name", "Parent", "REL 'has part'"]
+    assert header_b == ["ID", "Name", "Parent", "Notes"]
+    assert "REL 'has part'" not in wrapper_b.header_mapping
+    assert "Notes" in wrapper_a.ignored_headers and "Notes" not in wrapper_b.ignored_headers
+    assert (dict(DEFAULT_HEADER_MAPPINGS), list(DEFAULT_HEADERS_TO_IGNORE)) == defaults
+    assert root_a != root_b and not os.path.exists(root_a) and not os.path.exists(root_b)
+
+
+def test_publish_replaces_destination(tmp_path):
+    destination = str(tmp_path / "out" / "result.owl")
+    with BuildWorkspace(base_dir=str(tmp_path)) as workspace:
+        staged = workspace.stage(destination)
+        assert os.path.dirname(staged) == workspace.root
+        with open(staged, "w") as f:
+            f.write("new")
+        workspace.publish(destination)
+    with open(destination) as f:
+        assert f.read() == "new"